@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+import argparse
+import contextlib
+import io
+import traceback
+
+import gamedata
+from battle_parse import analytics
+from battle_parse import batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Add the battles in verbose logs to the card usage analytics and query them.')
+    parser.add_argument('paths', nargs='*', help='log files, directories of logs, or glob patterns to add')
+    parser.add_argument('-s', '--scenario', default=None, help='only count battles of this scenario')
+    parser.add_argument('-p', '--player', default=None, help='only count cards played by this player')
+    parser.add_argument('-c', '--card', action='append', default=[], help='card to report the average damage of (repeatable)')
+    parser.add_argument('-n', type=int, default=10, help='number of cards to list (default: 10)')
+    args = parser.parse_args()
+
+    game = gamedata.load()
+    stats = analytics.load()
+
+    filenames = batch.find_logs(args.paths)
+    if filenames:
+        num_added = 0
+        for filename in filenames:
+            try:
+                # Reconstruction prints what it ignores, which would drown out the results
+                with contextlib.redirect_stdout(io.StringIO()):
+                    num_added += stats.add_log(game, filename)
+            except Exception:
+                # One bad log shouldn't stop the rest
+                print(f'{filename}: FAILED\n{traceback.format_exc()}')
+        analytics.save(stats)
+        print(f'Added {num_added} battles from {len(filenames)} logs')
+
+    print(f'{len(stats.sources)} battles\n')
+
+    print('Most played cards:')
+    for card_id, count in stats.most_played(args.n, args.scenario, args.player):
+        print(f'{count:>8} {game.cards_by_id[card_id].name}')
+
+    print('\nBest blocks:')
+    rates = stats.block_success_rates(game)
+    for card_id, rate in sorted(rates.items(), key=lambda e: -e[1])[:args.n]:
+        print(f'{rate:>8.1%} {game.cards_by_id[card_id].name}')
+
+    for card_name in args.card:
+        card = game.get_card(card_name)
+        damage = stats.average_damage(card.id, args.scenario)
+        print(f'\n{card.name}: ' + ('never played' if damage is None else f'{damage:.2f} damage per play'))
+
+
+if __name__ == '__main__':
+    main()
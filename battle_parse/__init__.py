@@ -1,5 +1,13 @@
+from . import analytics
+from . import batch
+from . import board
+from . import deck
+from . import index
+from . import infer
 from . import model
 from . import reconstruct
+from . import replay
+from . import store
 
 
-__all__ = ['model', 'reconstruct']
+__all__ = ['analytics', 'batch', 'board', 'deck', 'index', 'infer', 'model', 'reconstruct', 'replay', 'store']
@@ -0,0 +1,344 @@
+# This file gathers the events of many battles into one columnar table per kind of event, indexed by card, scenario
+# and player, so questions about how cards are used can be answered across every battle at once
+
+import array
+import collections
+import os.path
+
+import cache
+import gamedata
+from . import event
+from . import index
+from . import reconstruct
+from . import store
+
+
+FILEPATH = os.path.join(cache.BASE_DIRPATH, 'analytics.pickle')
+
+# Card ID of rows that aren't about any card
+NO_CARD = -1
+
+# Event classes by the name they're defined as in battle_parse.event (tables are keyed by name, so they pickle)
+_event_kind_names = {
+    value: name for name, value in vars(event).items()
+    if isinstance(value, type) and issubclass(value, (event.Message, event.Extension))
+}
+
+# Fields of events that name the actor, group or player they're about
+_NAME_FIELDS = ('actor_name', 'group_name', 'player_name')
+
+# Causes of trait and terrain triggers that react to a card already being played (e.g. armor reducing its damage),
+# rather than having effects of their own
+_REACTION_CAUSES = ('Action', 'PreDamage')
+
+
+# Columns of one kind of event, across battles
+class Table:
+    def __init__(self, fields):
+        self.fields = fields
+
+        # Field => value of each row (card types are stored as their card IDs)
+        self.columns = {field: [] for field in fields}
+
+        # Battle index of each row, card ID each row is about and name of the player each row is about ('' if unknown)
+        self.battles = array.array('I')
+        self.cards = array.array('i')
+        self.players = []
+
+        # Card ID => rows about the card
+        self.rows_by_card = {}
+
+        # Battle index => (first row, end row), since the rows of a battle are added together
+        self.battle_rows = {}
+
+    def append(self, battle_index, card_id, player_name, values):
+        row = len(self.battles)
+        for field, value in zip(self.fields, values):
+            if isinstance(value, gamedata.CardType):
+                value = value.id
+            self.columns[field].append(value)
+
+        self.battles.append(battle_index)
+        self.cards.append(card_id)
+        self.players.append(player_name)
+        self.rows_by_card.setdefault(card_id, array.array('I')).append(row)
+
+        first_row, _ = self.battle_rows.get(battle_index, (row, row))
+        self.battle_rows[battle_index] = first_row, row + 1
+
+    def remove_battle(self, battle_index):
+        if battle_index not in self.battle_rows:
+            return
+
+        first_row, end_row = self.battle_rows.pop(battle_index)
+        for column in self.columns.values():
+            del column[first_row:end_row]
+        del self.battles[first_row:end_row]
+        del self.cards[first_row:end_row]
+        del self.players[first_row:end_row]
+
+        # Rows after the battle's move up
+        num_rows = end_row - first_row
+        self.rows_by_card = {}
+        for row, card_id in enumerate(self.cards):
+            self.rows_by_card.setdefault(card_id, array.array('I')).append(row)
+        self.battle_rows = {
+            i: (first, end) if first < first_row else (first - num_rows, end - num_rows)
+            for i, (first, end) in self.battle_rows.items()
+        }
+
+    def column(self, field):
+        return self.columns[field]
+
+    def __len__(self):
+        return len(self.battles)
+
+
+# Events of many battles, with the scenario and players of each battle
+class Analytics:
+    def __init__(self):
+        # Battle index => (scenario name, player names), or None once removed
+        self.battles = []
+
+        # Scenario name or player name => indices of its battles
+        self.battles_by_scenario = {}
+        self.battles_by_player = {}
+
+        # Event class name => table of its events
+        self.tables = {}
+
+        # Store key of the bytes of each battle added from a log => its battle index, so none is added twice (logs are
+        # rewritten at the same path every session, so neither the path nor the position identify a battle)
+        self.sources = {}
+
+        # (log path, start of the battle in the log) => (store key, size in bytes) of the battle last added from there,
+        # to replace a battle that was still being played when it was added
+        self.source_ranges = {}
+
+    def add_battle(self, battle, events):
+        """
+        Add the events of a battle. Events that follow a card play (e.g. damage and heals) are about the card played,
+        and those that follow a trait or terrain triggering on its own (e.g. at the start of a turn) are about the trait
+        or terrain card, until the next card play, trigger, turn or round.
+        """
+
+        battle_index = len(self.battles)
+        player_names = tuple(player.name for player in battle.players)
+        self.battles.append((battle.scenario_name, player_names))
+        self.battles_by_scenario.setdefault(battle.scenario_name, array.array('I')).append(battle_index)
+        for player_name in player_names:
+            self.battles_by_player.setdefault(player_name, array.array('I')).append(battle_index)
+
+        # Player name by the name of each of their groups and actors
+        player_name_of = {}
+        for player in battle.players:
+            for group in player.groups:
+                player_name_of[group.name] = player.name
+                for actor in group.actors:
+                    player_name_of.setdefault(actor.name, player.name)
+
+        # Card ID the events that follow are about
+        context_card = NO_CARD
+        for e in events:
+            kind = type(e)
+            kind_name = _event_kind_names.get(kind)
+            if kind_name is None:
+                continue
+
+            if kind is event.MsgCardPlay:
+                context_card = e.card_type.id
+            elif kind in (event.MsgTriggerTrait, event.MsgTriggerTerrain):
+                if e.cause not in _REACTION_CAUSES and e.card_type is not None:
+                    context_card = e.card_type.id
+            elif kind in (event.MsgStartRound, event.MsgPlayerTurn):
+                context_card = NO_CARD
+
+            card_type = getattr(e, 'card_type', None)
+            card_id = context_card if card_type is None else card_type.id
+
+            player_name = ''
+            if 'player_index' in kind.fields and e.player_index is not None and 0 <= e.player_index < len(player_names):
+                player_name = player_names[e.player_index]
+            else:
+                for field in _NAME_FIELDS:
+                    if field in kind.fields:
+                        name = getattr(e, field)
+                        if isinstance(name, str):
+                            player_name = player_name_of.get(name, '')
+                        break
+
+            table = self.tables.get(kind_name)
+            if table is None:
+                table = self.tables[kind_name] = Table(kind.fields)
+            table.append(battle_index, card_id, player_name, [getattr(e, field) for field in kind.fields])
+
+        return battle_index
+
+    def remove_battle(self, battle_index):
+        """
+        Remove the events of a battle (its index isn't reused).
+        """
+
+        scenario_name, player_names = self.battles[battle_index]
+        self.battles[battle_index] = None
+        self.battles_by_scenario[scenario_name].remove(battle_index)
+        for player_name in player_names:
+            self.battles_by_player[player_name].remove(battle_index)
+        for table in self.tables.values():
+            table.remove_battle(battle_index)
+
+    def add_log(self, game, filename):
+        """
+        Add the message events of every battle in a log that hasn't been added yet, and return how many were added.
+
+        A battle that has grown since it was added (because it was still being played) replaces what was added of it.
+        """
+
+        num_added = 0
+        for indexed_battle in index.load(filename):
+            data = index.read(filename, indexed_battle)
+            key = store.key(data)
+            if key in self.sources:
+                continue
+
+            _, msg_events, battle = reconstruct.extract_indexed_battle_streams(game, filename, indexed_battle)
+            if battle is None:
+                continue
+
+            location = os.path.abspath(filename), indexed_battle['start']
+            previous = self.source_ranges.get(location)
+            if previous is not None:
+                previous_key, previous_size = previous
+                if previous_key in self.sources and store.key(data[:previous_size]) == previous_key:
+                    self.remove_battle(self.sources.pop(previous_key))
+
+            self.sources[key] = self.add_battle(battle, msg_events)
+            self.source_ranges[location] = key, len(data)
+            num_added += 1
+
+        return num_added
+
+    def table(self, kind):
+        return self.tables.get(_event_kind_names[kind])
+
+    def rows(self, kind, card_id=None, scenario=None, player=None):
+        """
+        Return the rows of a kind of event, optionally only those about a card, in battles of a scenario, and about a
+        player.
+        """
+
+        table = self.table(kind)
+        if table is None:
+            return []
+
+        if card_id is not None:
+            rows = table.rows_by_card.get(card_id, ())
+        else:
+            rows = range(len(table))
+
+        if scenario is not None:
+            battle_indices = self.battles_by_scenario.get(scenario, ())
+            if card_id is None:
+                rows = [
+                    row for battle_index in battle_indices if battle_index in table.battle_rows
+                    for row in range(*table.battle_rows[battle_index])
+                ]
+            else:
+                battle_indices = set(battle_indices)
+                rows = [row for row in rows if table.battles[row] in battle_indices]
+
+        if player is not None:
+            players = table.players
+            rows = [row for row in rows if players[row] == player]
+
+        return rows
+
+    def play_counts(self, scenario=None, player=None):
+        """
+        Return a Counter of card ID => times played.
+        """
+
+        table = self.table(event.MsgCardPlay)
+        if table is None:
+            return collections.Counter()
+
+        cards = table.cards
+        if scenario is None and player is None:
+            return collections.Counter(cards)
+        return collections.Counter(cards[row] for row in self.rows(event.MsgCardPlay, scenario=scenario, player=player))
+
+    def most_played(self, n=10, scenario=None, player=None):
+        """
+        Return the n most played (card ID, times played).
+        """
+
+        return self.play_counts(scenario, player).most_common(n)
+
+    def average_damage(self, card_id, scenario=None):
+        """
+        Return the average damage dealt by each play of a card (None if it was never played).
+        """
+
+        num_plays = len(self.rows(event.MsgCardPlay, card_id, scenario))
+        if num_plays == 0:
+            return None
+
+        damage_table = self.table(event.MsgDamage)
+        if damage_table is None:
+            return 0
+
+        hp = damage_table.column('hp')
+        return sum(hp[row] for row in self.rows(event.MsgDamage, card_id, scenario)) / num_plays
+
+    def success_rates(self, kinds=(event.MsgTriggerInHand, event.MsgTriggerTrait, event.MsgTriggerTerrain), card_ids=None):
+        """
+        Return {card ID: fraction of its triggers that succeeded} over kinds of trigger events.
+        """
+
+        successes = collections.Counter()
+        totals = collections.Counter()
+        for kind in kinds:
+            table = self.table(kind)
+            if table is None:
+                continue
+
+            success = table.column('success')
+            for card_id, rows in table.rows_by_card.items():
+                if card_ids is not None and card_id not in card_ids:
+                    continue
+                totals[card_id] += len(rows)
+                successes[card_id] += sum(1 for row in rows if success[row])
+
+        return {card_id: successes[card_id] / total for card_id, total in totals.items()}
+
+    def block_success_rates(self, game):
+        """
+        Return {card ID: fraction of its triggers that succeeded} for block cards.
+        """
+
+        block_card_ids = {card.id for card in game.cards if card.is_block}
+        return self.success_rates(kinds=(event.MsgTriggerInHand,), card_ids=block_card_ids)
+
+
+def load():
+    """
+    Return the analytics saved at FILEPATH, or new analytics if there are none.
+    """
+
+    analytics_cache = cache.Cache(FILEPATH, format=cache.Format.PICKLE)
+    try:
+        analytics_cache.load()
+    except FileNotFoundError:
+        return Analytics()
+
+    # Analytics saved before battles were identified by their contents can't tell which battles they hold
+    if not isinstance(analytics_cache.data.sources, dict):
+        return Analytics()
+    return analytics_cache.data
+
+
+def save(analytics):
+    os.makedirs(os.path.dirname(FILEPATH), exist_ok=True)
+    analytics_cache = cache.Cache(FILEPATH, format=cache.Format.PICKLE)
+    analytics_cache.data = analytics
+    analytics_cache.save()
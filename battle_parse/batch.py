@@ -0,0 +1,155 @@
+# This file reconstructs the battles in many logs at once, spreading the logs across a pool of worker processes
+
+import contextlib
+import glob
+import io
+import multiprocessing
+import os
+import os.path
+import time
+import traceback
+
+import gamedata
+from . import index
+from . import reconstruct
+
+
+# Game data of each worker process
+_game = None
+
+
+def _init_worker():
+    global _game
+    _game = gamedata.load()
+
+
+# Bytes read from the start of a file to tell whether it's a verbose log
+LOG_HEADER_SIZE = 2**16
+
+
+def is_log(filename):
+    """
+    Return whether a file looks like a verbose log: one with an extension request or response near its start.
+    """
+
+    try:
+        with open(filename, 'rb') as f:
+            header = f.read(LOG_HEADER_SIZE)
+    except OSError:
+        return False
+    return index.EXTENSION_MARKER_REGEX.search(header) is not None
+
+
+def find_logs(paths, exclude=()):
+    """
+    Expand directories (recursively) and glob patterns into a sorted list of log files, leaving out any file under the
+    excluded directories (such as where the events are written, when it's inside a directory of logs).
+    """
+
+    excluded = [os.path.realpath(dirpath) for dirpath in exclude]
+
+    def is_excluded(path):
+        path = os.path.realpath(path)
+        return any(path == dirpath or path.startswith(dirpath + os.sep) for dirpath in excluded)
+
+    filenames = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, names in os.walk(path):
+                dirnames[:] = [name for name in dirnames if not is_excluded(os.path.join(dirpath, name))]
+                filenames.update(os.path.join(dirpath, name) for name in names)
+        else:
+            filenames.update(f for f in glob.glob(path, recursive=True) if os.path.isfile(f))
+
+    # Skip the battle indexes saved next to logs, and anything else that isn't a log
+    return sorted(
+        f for f in filenames
+        if not f.endswith(index.index_filepath('')) and not is_excluded(f) and is_log(f)
+    )
+
+
+def reconstruct_log(game, filename):
+    """
+    Return an (indexed battle, events) pair for each battle in a log.
+    """
+
+    result = []
+    for battle in index.load(filename):
+        events, _ = reconstruct.extract_indexed_battle_events(game, filename, battle)
+        result.append((battle, events or []))
+    return result
+
+
+def _write_events(filepath, battle, events):
+    with open(filepath, 'w') as f:
+        f.write(f'# Scenario: {battle["scenario"]}\n')
+        f.write(f'# Players: {", ".join(battle["players"])}\n')
+        for event in events:
+            f.write(f'{event}\n')
+
+
+def _run_file(job):
+    filename, output_prefix = job
+
+    start_time = time.monotonic()
+    num_battles = num_events = 0
+    error = None
+    try:
+        os.makedirs(os.path.dirname(output_prefix) or '.', exist_ok=True)
+
+        # Reconstruction prints what it ignores, which would drown out the progress of the batch
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = reconstruct_log(_game, filename)
+
+        for i, (battle, events) in enumerate(results):
+            _write_events(f'{output_prefix}.{i}.txt', battle, events)
+            num_battles += 1
+            num_events += len(events)
+    except Exception:
+        # One bad log shouldn't stop the rest
+        error = traceback.format_exc()
+
+    return filename, num_battles, num_events, os.path.getsize(filename), time.monotonic() - start_time, error
+
+
+def run(filenames, output_dirpath, processes=None):
+    """
+    Reconstruct every battle in the logs in parallel, writing the events of battle i of a log to
+    <output_dirpath>/<log path>.<i>.txt (log paths relative to the directory they all share).
+
+    Return the filenames of the logs that failed.
+    """
+
+    if not filenames:
+        print('No logs to reconstruct')
+        return []
+
+    base_dirpath = os.path.commonpath([os.path.dirname(os.path.abspath(f)) for f in filenames])
+    jobs = [
+        (f, os.path.join(output_dirpath, os.path.relpath(os.path.abspath(f), base_dirpath)))
+        for f in filenames
+    ]
+    print(f'Reconstructing {len(jobs)} logs')
+
+    start_time = time.monotonic()
+    total_battles = total_events = total_bytes = 0
+    failed = []
+    with multiprocessing.Pool(processes, initializer=_init_worker) as pool:
+        for i, result in enumerate(pool.imap_unordered(_run_file, jobs), 1):
+            filename, num_battles, num_events, num_bytes, seconds, error = result
+            total_bytes += num_bytes
+            if error is not None:
+                failed.append(filename)
+                print(f'[{i}/{len(jobs)}] {filename}: FAILED after {seconds:.1f}s\n{error}')
+                continue
+
+            total_battles += num_battles
+            total_events += num_events
+            print(f'[{i}/{len(jobs)}] {filename}: {num_battles} battles, {num_events} events in {seconds:.1f}s')
+
+    seconds = time.monotonic() - start_time
+    print(
+        f'Reconstructed {total_battles} battles ({total_events} events) from {len(jobs) - len(failed)}/{len(jobs)} logs '
+        f'in {seconds:.1f}s: {len(jobs) / seconds:.1f} logs/s, {total_bytes / seconds / 2**20:.1f} MiB/s'
+    )
+    return failed
@@ -0,0 +1,176 @@
+# This file answers movement and range questions about a battle's board from grids precomputed once per board
+
+import array
+import heapq
+
+import cache
+
+
+# Move points it costs to enter a square of each terrain (squares of any other terrain can't be entered)
+TERRAIN_COSTS = {
+    'Open': 1,
+    'Difficult': 2,
+    'Victory': 1,
+}
+
+# Distance to a square that can't be reached
+UNREACHABLE = 0xffff
+
+# Distance maps kept per board map, and board maps kept at once
+DISTANCE_MAP_CACHE_SIZE = 256
+BOARD_MAP_CACHE_SIZE = 4
+
+
+def chebyshev(x1, y1, x2, y2):
+    return max(abs(x1 - x2), abs(y1 - y2))
+
+
+# Terrain costs and neighbors of every square of a board, in grids indexed by y * w + x, with cached distance maps
+class BoardMap:
+    def __init__(self, board):
+        self.board = board
+        self.w = board.w
+        self.h = board.h
+
+        # Square index => move points to enter it (0 if it can't be entered, including where there's no square)
+        self.costs = array.array('B', bytes(self.w * self.h))
+        for (x, y), square in board.square_at.items():
+            self.costs[self.index(x, y)] = TERRAIN_COSTS.get(square.terrain, 0)
+
+        # Square index => indices of the orthogonally adjacent squares that can be entered
+        self.neighbors = []
+        for y in range(self.h):
+            for x in range(self.w):
+                self.neighbors.append(tuple(
+                    self.index(nx, ny)
+                    for nx, ny in ((x, y - 1), (x + 1, y), (x, y + 1), (x - 1, y))
+                    if 0 <= nx < self.w and 0 <= ny < self.h and self.costs[self.index(nx, ny)]
+                ))
+
+        # (square index, blocked square indices) => distance map
+        self._distance_maps = cache.LRUCache(DISTANCE_MAP_CACHE_SIZE)
+
+    def index(self, x, y):
+        return y * self.w + x
+
+    def position(self, i):
+        return i % self.w, i // self.w
+
+    def is_passable(self, x, y):
+        return 0 <= x < self.w and 0 <= y < self.h and self.costs[self.index(x, y)] != 0
+
+    def distance_map(self, x, y, blocked=frozenset()):
+        """
+        Return the move points it costs to reach every square from (x, y), moving orthogonally and never entering a
+        blocked square index, as a grid indexed by y * w + x (UNREACHABLE where it can't be reached). Maps are computed
+        once per start and set of blocked squares.
+        """
+
+        start = self.index(x, y)
+        key = start, blocked
+        distances = self._distance_maps.get(key)
+        if distances is not None:
+            return distances
+
+        costs = self.costs
+        neighbors = self.neighbors
+        distances = array.array('H', [UNREACHABLE]) * (self.w * self.h)
+        distances[start] = 0
+        queue = [(0, start)]
+        while queue:
+            distance, i = heapq.heappop(queue)
+            if distance > distances[i]:
+                continue
+            for j in neighbors[i]:
+                if j in blocked:
+                    continue
+                d = distance + costs[j]
+                if d < distances[j]:
+                    distances[j] = d
+                    heapq.heappush(queue, (d, j))
+
+        self._distance_maps.put(key, distances)
+        return distances
+
+    def distance(self, x1, y1, x2, y2, blocked=frozenset()):
+        return self.distance_map(x1, y1, blocked)[self.index(x2, y2)]
+
+    def reachable(self, x, y, moves, blocked=frozenset(), occupied=frozenset()):
+        """
+        Return the squares (x, y) that can be moved to from (x, y) with a number of move points, passing through but not
+        stopping on occupied square indices.
+        """
+
+        distances = self.distance_map(x, y, blocked)
+        start = self.index(x, y)
+        return [
+            self.position(i) for i, distance in enumerate(distances)
+            if distance <= moves and i != start and i not in occupied
+        ]
+
+    def in_range(self, x, y, r):
+        """
+        Return the squares (x, y) of the board within range r of (x, y), counting diagonal steps as 1.
+        """
+
+        return [
+            (sx, sy)
+            for sy in range(max(y - r, 0), min(y + r + 1, self.h))
+            for sx in range(max(x - r, 0), min(x + r + 1, self.w))
+            if (sx, sy) in self.board.square_at
+        ]
+
+    def adjacent(self, x, y):
+        return [square for square in self.in_range(x, y, 1) if square != (x, y)]
+
+    def actor_blockers(self, actor):
+        """
+        Return (blocked, occupied) square indices for moving an actor: living enemies can't be moved through, and no
+        living actor's square can be stopped on.
+        """
+
+        blocked = set()
+        occupied = set()
+        player = actor.group.player
+        for other_player in player.battle.players:
+            for group in other_player.groups:
+                for other in group.actors:
+                    if other is actor or other.x is None or not other.alive:
+                        continue
+
+                    i = self.index(other.x, other.y)
+                    occupied.add(i)
+                    if other_player is not player:
+                        blocked.add(i)
+
+        return frozenset(blocked), frozenset(occupied)
+
+    def actor_moves(self, actor, moves):
+        """
+        Return the squares (x, y) an actor can move to with a number of move points.
+        """
+
+        blocked, occupied = self.actor_blockers(actor)
+        return self.reachable(actor.x, actor.y, moves, blocked, occupied)
+
+    def targets_in_range(self, actor, r, actors):
+        """
+        Return the living actors among actors within range r of an actor.
+        """
+
+        return [
+            target for target in actors
+            if target.x is not None and target.alive and chebyshev(actor.x, actor.y, target.x, target.y) <= r
+        ]
+
+
+# Board => board map, for the few most recent boards
+_board_maps = cache.LRUCache(BOARD_MAP_CACHE_SIZE)
+
+
+def board_map(board):
+    cached = _board_maps.get(board)
+    if cached is None:
+        cached = BoardMap(board)
+        _board_maps.put(board, cached)
+    return cached
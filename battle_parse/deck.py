@@ -0,0 +1,215 @@
+# This file tracks what could be left in each group's deck during a battle, and the odds of each card being drawn next
+
+import collections
+
+from .event import *
+from . import infer
+
+
+# What could be left in one group's deck, from every card seen leaving it so far
+class GroupDeck:
+    def __init__(self, group, frame):
+        self.group = group
+        self.frame = frame
+
+        # Card ID => expected copies in the whole deck (exact for known items, averaged over the possible items otherwise)
+        self.expected = collections.Counter()
+
+        # Bitset of the possible items of each slot that expected was last summed from
+        self.masks = list(frame.candidates)
+        for mask in self.masks:
+            self.expected.update(frame.index.expected_cards(mask))
+
+        # Card ID => expected copies among the cards not seen yet (the draw deck and any hidden cards in hand)
+        self.remaining = collections.Counter(self.expected)
+
+        # Card ID => seen cards in hand and in the discard deck
+        self.known_hand = collections.Counter()
+        self.discarded = collections.Counter()
+
+        self.hidden_hand = 0
+        self.draw_size = len(group.draw_deck)
+
+        for card in group.hand:
+            if card.is_hidden():
+                self.hidden_hand += 1
+            else:
+                self.known_hand[card.type.id] += 1
+                self.remaining[card.type.id] -= 1
+
+        for card in group.discard_deck:
+            if not card.is_hidden():
+                self.discarded[card.type.id] += 1
+                self.remaining[card.type.id] -= 1
+
+    @property
+    def num_unseen(self):
+        return self.draw_size + self.hidden_hand
+
+    def probability(self, card_type):
+        """
+        Return the probability that the next card drawn is of a card type.
+        """
+
+        if self.num_unseen <= 0:
+            return 0
+        return max(self.remaining[card_type.id], 0) / self.num_unseen
+
+    def probabilities(self):
+        """
+        Return {card ID: probability} that the next card drawn is of each card type that could still be drawn.
+        """
+
+        if self.num_unseen <= 0:
+            return {}
+        return {card_id: n / self.num_unseen for card_id, n in self.remaining.items() if n > 0}
+
+    # Update expected and remaining by the slots whose possible items have narrowed since they were last summed
+    def sync(self):
+        for slot_index, mask in enumerate(self.frame.candidates):
+            old_mask = self.masks[slot_index]
+            if mask == old_mask:
+                continue
+
+            for card_id, n in self.frame.index.expected_cards(old_mask).items():
+                self.expected[card_id] -= n
+                self.remaining[card_id] -= n
+            for card_id, n in self.frame.index.expected_cards(mask).items():
+                self.expected[card_id] += n
+                self.remaining[card_id] += n
+            self.masks[slot_index] = mask
+
+    def holds(self, card_type):
+        """
+        Return whether a card type could be in the deck: cards that no item the group could hold has (e.g. the move card
+        each group gets every round) were created during the battle.
+        """
+
+        card_mask = self.frame.index.card_masks.get(card_type.id, 0)
+        return any(mask & card_mask for mask in self.frame.candidates)
+
+    def draw(self, card_type=None):
+        if card_type is not None and not self.holds(card_type):
+            return
+
+        self.draw_size -= 1
+        if card_type is None:
+            self.hidden_hand += 1
+        else:
+            self.known_hand[card_type.id] += 1
+            self.remaining[card_type.id] -= 1
+
+    def discard(self, card_type):
+        if not self.holds(card_type):
+            return
+
+        if self.known_hand[card_type.id] > 0:
+            self.known_hand[card_type.id] -= 1
+        else:
+            # A hidden card, seen for the first time as it leaves the hand
+            self.hidden_hand = max(self.hidden_hand - 1, 0)
+            self.remaining[card_type.id] -= 1
+
+        self.discarded[card_type.id] += 1
+
+    def reshuffle(self, num_cards):
+        for card_id, n in self.discarded.items():
+            self.remaining[card_id] += n
+        self.discarded.clear()
+        self.draw_size += num_cards
+
+    def __str__(self):
+        game = self.group.player.battle.game
+        return '\n'.join(
+            '{:.1%} {}'.format(p, game.cards_by_id[card_id].name)
+            for card_id, p in sorted(self.probabilities().items(), key=lambda e: -e[1])
+        )
+
+
+# What could be left in the deck of every group in a battle, updated by each event as it's extracted (extension and
+# message events change separate counts, so the two streams can be fed in either order, but extension events must be
+# fed after the battle has applied them, for the items to be inferred from the right cards)
+class DeckTracker:
+    def __init__(self, battle, inference=None):
+        self.battle = battle
+        self.inference = inference if inference is not None else infer.ItemInference(battle)
+
+        # (player index, group index) => deck of the group
+        self.decks = {}
+
+        # Group or actor name => deck of the group (messages name one or the other)
+        self.decks_by_name = {}
+
+        for key, frame in self.inference.frames.items():
+            player_index, group_index = key
+            group = battle.players[player_index].groups[group_index]
+            if group.draw_deck is None or group.hand is None or group.discard_deck is None:
+                continue
+
+            deck = GroupDeck(group, frame)
+            self.decks[key] = deck
+            self.decks_by_name[group.name] = deck
+            for actor in group.actors:
+                self.decks_by_name.setdefault(actor.name, deck)
+
+        # Changes to make for each kind of event (others don't change any deck)
+        self.handlers = {
+            ExCardReveal: self._reveal,
+            MsgCardDraw: self._draw,
+            MsgHiddenDraw: self._hidden_draw,
+            MsgCardPlay: self._play,
+            MsgDiscard: self._discard,
+            MsgReshuffle: self._reshuffle,
+        }
+
+    def deck(self, player_index, group_index):
+        return self.decks[player_index, group_index]
+
+    def update(self, event):
+        """
+        Update the decks by an event.
+
+        Cards created during the battle are left out of the decks, but otherwise a card is out of the draw deck from
+        the moment it's played: traits still attached count as discarded (so they're counted back in when the discard
+        deck is reshuffled), and a card returned to hand after being played is counted as discarded again when it's
+        played again.
+        """
+
+        handler = self.handlers.get(type(event))
+        if handler is not None:
+            handler(event)
+
+    # Revealed cards only narrow the items (the cards themselves are counted as they're drawn, played or discarded)
+    def _reveal(self, e):
+        self.inference.update(e)
+        if e.original_player_index is None or e.original_player_index == -1:
+            return
+
+        deck = self.decks.get((e.original_player_index, e.original_group_index))
+        if deck is not None:
+            deck.sync()
+
+    def _draw(self, m):
+        deck = self.decks_by_name.get(m.group_name)
+        if deck is not None:
+            deck.draw(m.card_type)
+
+    def _hidden_draw(self, m):
+        deck = self.decks_by_name.get(m.group_name)
+        if deck is not None:
+            deck.draw()
+
+    def _play(self, m):
+        deck = self.decks_by_name.get(m.actor_name)
+        if deck is not None:
+            deck.discard(m.card_type)
+
+    def _discard(self, m):
+        deck = self.decks_by_name.get(m.group_name)
+        if deck is not None:
+            deck.discard(m.card_type)
+
+    def _reshuffle(self, m):
+        deck = self.decks_by_name.get(m.group_name)
+        if deck is not None:
+            deck.reshuffle(m.num_cards)
@@ -1,5 +1,7 @@
 # Logged battle events
 
+import array
+
 
 # Helper function to display time
 def display_seconds(sec):
@@ -8,37 +10,33 @@ def display_seconds(sec):
     h, m = divmod(m, 60)
     return '{:02}:{:02}:{:02}'.format(h, m, s)
 
-# Populate params via args
-def populate(obj, params, args, kwargs):
-    expected = len(params)
-    given = len(args) + len(kwargs)
-    if expected != given:
-        raise TypeError('Expected {} arguments ({} given)'.format(expected, given))
-    
-    for param, arg in zip(params, args):
-        setattr(obj, param, arg)
-
-    remaining = set(params[len(args):])
-    for kw, arg in kwargs.items():
-        try:
-            remaining.remove(kw)
-        except KeyError:
-            raise TypeError("Unexpected keyword argument '{}'".format(kw))
-        setattr(obj, kw, arg)
+# Generate an __init__ that sets each field from the argument of the same name, as plain assignments (much faster
+# than setting them in a loop)
+def build_init(fields):
+    lines = ['def __init__(self{}):'.format(''.join(', ' + field for field in fields))]
+    lines.extend('    self.{0} = {0}'.format(field) for field in fields)
+    if not fields:
+        lines.append('    pass')
+
+    namespace = {}
+    exec('\n'.join(lines), namespace)
+    return namespace['__init__']
 
 # Superclass for message events
+# Events only store their fields in slots (the name and fields of each kind of event are class attributes)
 class Message:
-    def __init__(self, name):
-        self.name = name
+    __slots__ = ()
+    name = None
+    fields = ()
 
     def __str__(self):
         return '[{}]'.format(self.name)
 
 # Superclass for extension events
 class Extension:
-    def __init__(self, name, player_turn):
-        self.name = name
-        self.player_turn = player_turn
+    __slots__ = ('player_turn',)
+    name = None
+    fields = ('player_turn',)
 
     def __str__(self):
         turn = ' '
@@ -48,20 +46,12 @@ class Extension:
 
 # Superclass for trigger extension events
 class TriggerExtension(Extension):
-    def __init__(self,
-        name,
-        player_turn,
-        die_roll,
-        required_roll,
-        hard_to_block,
-        easy_to_block
-    ):
-        super().__init__('Trigger ' + name, player_turn)
-        self.die_roll = die_roll
-        self.required_roll = required_roll
-        self.hard_to_block = hard_to_block
-        self.easy_to_block = easy_to_block
-        self.success = die_roll + easy_to_block - hard_to_block >= required_roll
+    __slots__ = ('die_roll', 'required_roll', 'hard_to_block', 'easy_to_block')
+    fields = Extension.fields + __slots__
+
+    @property
+    def success(self):
+        return self.die_roll + self.easy_to_block - self.hard_to_block >= self.required_roll
 
     def __str__(self):
         trigger = 'Failed to trigger'
@@ -72,9 +62,9 @@ class TriggerExtension(Extension):
 # Factory for message events
 def build_msg(name, *params, describe=None):
     class _MsgCustom(Message):
-        def __init__(self, *args, **kwargs):
-            super().__init__(name)
-            populate(self, params, args, kwargs)
+        __slots__ = params
+        fields = params
+        __init__ = build_init(fields)
 
         def __str__(self):
             description = ''
@@ -82,44 +72,31 @@ def build_msg(name, *params, describe=None):
                 description = ' ' + describe(m=self)
             return super().__str__() + description
 
+    _MsgCustom.name = name
     return _MsgCustom
 
 # Factory for extension events
 def build_ex(name, *params, describe=None):
     class _ExCustom(Extension):
-        def __init__(self, player_turn, *args, **kwargs):
-            super().__init__(name, player_turn)
-            populate(self, params, args, kwargs)
+        __slots__ = params
+        fields = Extension.fields + params
+        __init__ = build_init(fields)
 
         def __str__(self):
             description = ''
             if describe is not None:
                 description = ' ' + describe(e=self)
             return super().__str__() + description
-    
+
+    _ExCustom.name = name
     return _ExCustom
 
 # Factory for trigger extension events
 def build_trigger_ex(location, *params, describe=None):
     class _CustomExTrigger(TriggerExtension):
-        def __init__(self,
-            player_turn,
-            die_roll,
-            required_roll,
-            hard_to_block,
-            easy_to_block,
-            *args,
-            **kwargs,
-        ):
-            super().__init__(
-                location,
-                player_turn,
-                die_roll,
-                required_roll,
-                hard_to_block,
-                easy_to_block,
-            )
-            populate(self, params, args, kwargs)
+        __slots__ = params
+        fields = TriggerExtension.fields + params
+        __init__ = build_init(fields)
 
         def __str__(self):
             description = ''
@@ -127,8 +104,67 @@ def build_trigger_ex(location, *params, describe=None):
                 description = ' ' + describe(e=self)
             return super().__str__() + description
 
+    _CustomExTrigger.name = 'Trigger ' + location
     return _CustomExTrigger
 
+# Struct-of-arrays table of a battle's events, with one column per field instead of one object per event
+class EventTable:
+    def __init__(self, events=()):
+        # Kinds (event classes) in order of first appearance, and the index into kinds of each row
+        self.kinds = []
+        self.kind_indices = array.array('H')
+        self._kind_index = {}
+
+        # Values of each field by row (None for rows whose kind doesn't have the field). Columns are only padded up to
+        # the current row when read or appended to
+        self.columns = {}
+
+        self.extend(events)
+
+    def append(self, event):
+        kind = type(event)
+        kind_index = self._kind_index.get(kind)
+        if kind_index is None:
+            kind_index = self._kind_index[kind] = len(self.kinds)
+            self.kinds.append(kind)
+
+        row = len(self.kind_indices)
+        self.kind_indices.append(kind_index)
+        for field in kind.fields:
+            column = self.columns.setdefault(field, [])
+            if len(column) < row:
+                column.extend([None] * (row - len(column)))
+            column.append(getattr(event, field))
+
+    def extend(self, events):
+        for event in events:
+            self.append(event)
+
+    def column(self, field):
+        column = self.columns.get(field, [])
+        if len(column) < len(self):
+            column.extend([None] * (len(self) - len(column)))
+        return column
+
+    def rows(self, kind):
+        """
+        Return the indices of the rows of a kind of event.
+        """
+
+        kind_index = self._kind_index.get(kind)
+        return [i for i, k in enumerate(self.kind_indices) if k == kind_index]
+
+    def __getitem__(self, row):
+        kind = self.kinds[self.kind_indices[row]]
+        return kind(*[self.columns[field][row] for field in kind.fields])
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+    def __len__(self):
+        return len(self.kind_indices)
+
 # Message events
 MsgStartGame = build_msg('Start Game')
 
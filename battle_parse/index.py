@@ -0,0 +1,104 @@
+# This file indexes the battles in a verbose log by byte range, so any of them can be loaded without reading the rest
+
+import mmap
+import os
+import re
+
+import cache
+
+
+# Start of the extension that begins each battle
+JOINBATTLE_MARKER = b'Received extension response: joinbattle'
+
+# Lines that start the next extension, and so end the joinbattle extension
+EXTENSION_MARKER_REGEX = re.compile(rb'Received extension response:|Sending zone extension request:')
+
+SCENARIO_NAME_REGEX = re.compile(rb'\(utf_string\) scenarioName: ([^\r\n]*)')
+PLAYER_NAME_REGEX = re.compile(rb'\(utf_string\) playerName: ([^\r\n]*)')
+
+
+def index_filepath(filename):
+    return filename + '.battles.json'
+
+
+def _decode(value):
+    return value.decode('utf-8', errors='replace')
+
+
+def scan(filename):
+    """
+    Scan a log once and return a list of battles in the order they appear, as dicts with the byte range of the battle
+    ('start' and 'end'), its 'scenario' name, and its 'players' by name.
+
+    Each battle runs from its joinbattle to the next one, or to the end of the log.
+    """
+
+    with open(filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            # Find the start of each line that begins a battle
+            starts = []
+            pos = data.find(JOINBATTLE_MARKER)
+            while pos != -1:
+                end = pos + len(JOINBATTLE_MARKER)
+                if end == len(data) or data[end:end + 1] in b'\r\n':
+                    starts.append(data.rfind(b'\n', 0, pos) + 1)
+                pos = data.find(JOINBATTLE_MARKER, end)
+
+            battles = []
+            for i, start in enumerate(starts):
+                end = starts[i + 1] if i + 1 < len(starts) else len(data)
+
+                # Names are only read from the joinbattle extension itself
+                match = EXTENSION_MARKER_REGEX.search(data, start + len(JOINBATTLE_MARKER), end)
+                joinbattle_end = match.start() if match else end
+
+                match = SCENARIO_NAME_REGEX.search(data, start, joinbattle_end)
+                battles.append({
+                    'start': start,
+                    'end': end,
+                    'scenario': _decode(match.group(1)) if match else '',
+                    'players': [_decode(m.group(1)) for m in PLAYER_NAME_REGEX.finditer(data, start, joinbattle_end)],
+                })
+
+    return battles
+
+
+def load(filename):
+    """
+    Return the battles in a log (see scan), from the index saved next to it if the log hasn't changed since.
+    """
+
+    stat = os.stat(filename)
+    index_cache = cache.Cache(index_filepath(filename), format=cache.Format.JSON)
+    try:
+        index_cache.reload()
+    except (FileNotFoundError, ValueError):
+        pass
+    else:
+        if index_cache.data.get('size') == stat.st_size and index_cache.data.get('mtime') == stat.st_mtime_ns:
+            return index_cache.data['battles']
+
+    index_cache.data = {
+        'size': stat.st_size,
+        'mtime': stat.st_mtime_ns,
+        'battles': scan(filename),
+    }
+    try:
+        index_cache.save()
+    except OSError:
+        pass  # The log may be somewhere read-only; the index is only an optimization
+
+    return index_cache.data['battles']
+
+
+def read(filename, battle):
+    """
+    Read the bytes of an indexed battle from its log.
+    """
+
+    with open(filename, 'rb') as f:
+        f.seek(battle['start'])
+        return f.read(battle['end'] - battle['start'])
@@ -0,0 +1,260 @@
+# This file infers which items a group could be holding in each of its item slots, from the cards it has revealed
+
+import collections
+
+import cache
+from .event import *
+
+
+# Items that could be in a slot are kept as a bitset over gamedata item IDs (bit i set <=> item with ID i is possible)
+def _bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _count_bits(mask):
+    return bin(mask).count('1')
+
+
+# Bitsets of the items that fit each slot type and that contain each card, and each item's copies of each card
+class ItemIndex:
+    def __init__(self, game):
+        self.items_by_id = game.items_by_id
+
+        # Slot type => bitset of the items that fit it
+        self.slot_masks = collections.defaultdict(int)
+
+        # Card ID => bitset of the items that contain the card
+        self.card_masks = collections.defaultdict(int)
+
+        # Item ID => card ID => copies of the card in the item
+        self.card_counts = {}
+
+        for item in game.items_by_id.values():
+            bit = 1 << item.id
+            self.slot_masks[item.slot_type] |= bit
+
+            counts = collections.Counter(card.id for card in item.cards)
+            self.card_counts[item.id] = counts
+            for card_id in counts:
+                self.card_masks[card_id] |= bit
+
+        # Bitset => expected copies of each card in one of its items, chosen uniformly
+        self._expected_cards = {}
+
+    def items(self, mask):
+        return [self.items_by_id[item_id] for item_id in _bits(mask)]
+
+    def expected_cards(self, mask):
+        """
+        Return {card ID: expected copies} in an item chosen uniformly from a bitset.
+        """
+
+        if mask not in self._expected_cards:
+            expected = collections.Counter()
+            item_ids = list(_bits(mask))
+            for item_id in item_ids:
+                expected.update(self.card_counts[item_id])
+            self._expected_cards[mask] = {card_id: n / len(item_ids) for card_id, n in expected.items()}
+        return self._expected_cards[mask]
+
+
+# (game, game data version) => item index, so a game reloaded in place isn't served its old items
+ITEM_INDEX_CACHE_SIZE = 4
+_item_indexes = cache.LRUCache(ITEM_INDEX_CACHE_SIZE)
+
+
+def item_index(game):
+    key = game, game.version
+    index = _item_indexes.get(key)
+    if index is None:
+        index = ItemIndex(game)
+        _item_indexes.put(key, index)
+    return index
+
+
+# Items that could be in each slot of one group's item frame
+class FrameInference:
+    def __init__(self, index, slot_types):
+        self.index = index
+        self.slot_types = slot_types
+
+        # Slot index => bitset of the items that could be in it
+        self.candidates = [index.slot_masks[slot_type] for slot_type in slot_types]
+
+        # Slot index => card ID => cards revealed from the slot's item so far (once the item is known)
+        self.revealed = [collections.Counter() for _ in slot_types]
+
+        # Battle card => index of the slot it was revealed from (None if that's still ambiguous), so a card revealed
+        # again (drawn, peeked at, played, drawn again after a reshuffle) isn't counted again
+        self.slot_of_card = {}
+
+        # Bitsets of the items that could hold each card revealed from an unknown item, not yet narrowed to one slot
+        self.unplaced = []
+
+    def is_known(self, slot_index):
+        return _count_bits(self.candidates[slot_index]) == 1
+
+    def item(self, slot_index):
+        """
+        Return the item in a slot, or None if it isn't known yet.
+        """
+
+        if not self.is_known(slot_index):
+            return None
+        return self.index.items_by_id[self.candidates[slot_index].bit_length() - 1]
+
+    def possibilities(self, slot_index):
+        return self.index.items(self.candidates[slot_index])
+
+    def likelihoods(self, slot_index, weight=None):
+        """
+        Return {item: probability} over the items that could be in a slot. Every possible item is equally likely unless
+        weight (item => relative weight) is given.
+        """
+
+        items = self.possibilities(slot_index)
+        weights = [1 if weight is None else weight(item) for item in items]
+        total = sum(weights)
+        if total == 0:
+            return {}
+        return {item: w / total for item, w in zip(items, weights)}
+
+    def expected_cards(self, slot_index):
+        return self.index.expected_cards(self.candidates[slot_index])
+
+    def reveal(self, card_type, item_type=None, card=None):
+        """
+        Narrow the items that could be in each slot by a card revealed from the group's items, and return the index of
+        the slot it came from (or None if that's still ambiguous). The item it came from may be unknown.
+
+        Copies of a card beyond what one item holds mean another slot holds the item too, but only if they're different
+        cards: card is the battle card revealed, so that revealing it again narrows nothing more. Without it, a reveal
+        only says that some slot holds the item.
+        """
+
+        if card is not None and card in self.slot_of_card:
+            return self.slot_of_card[card]
+
+        if item_type is None:
+            slot_index = self._reveal_unknown(card_type)
+        else:
+            slot_index = self._reveal_known(card_type, item_type, card is not None)
+
+        if card is not None:
+            self.slot_of_card[card] = slot_index
+        return slot_index
+
+    def _reveal_known(self, card_type, item_type, is_new_copy):
+        bit = 1 << item_type.id
+        copies = self.index.card_counts.get(item_type.id, {}).get(card_type.id, 0)
+
+        # A slot already known to hold the item, with a copy of the card not yet revealed
+        for slot_index, mask in enumerate(self.candidates):
+            if mask == bit and (not is_new_copy or self.revealed[slot_index][card_type.id] < copies):
+                self.revealed[slot_index][card_type.id] += 1
+                return slot_index
+
+        # Otherwise the first slot that could hold the item (as ItemFrame.mark does)
+        for slot_index, mask in enumerate(self.candidates):
+            if mask & bit and mask != bit:
+                self.candidates[slot_index] = bit
+                self.revealed[slot_index][card_type.id] += 1
+                self._propagate()
+                return slot_index
+
+        # More copies than the group's items hold: some card was taken for a new one (the events don't follow every
+        # card in and out of hands), so it's put down to a slot already holding the item
+        for slot_index, mask in enumerate(self.candidates):
+            if mask == bit:
+                return slot_index
+
+        raise ValueError('Cannot place "{}" from "{}" in any slot of {}'.format(
+            card_type.name, item_type.name, self.slot_types))
+
+    def _reveal_unknown(self, card_type):
+        mask = self.index.card_masks[card_type.id]
+        if not any(candidates & mask for candidates in self.candidates):
+            raise ValueError('No slot of {} could hold "{}"'.format(self.slot_types, card_type.name))
+
+        self.unplaced.append(mask)
+        return self._propagate(mask)
+
+    # Narrow any slot that is the only one able to hold a card revealed from an unknown item, until nothing changes
+    def _propagate(self, mask=None):
+        placed_slot_index = None
+        changed = True
+        while changed:
+            changed = False
+            for card_mask in list(self.unplaced):
+                slot_indices = [i for i, candidates in enumerate(self.candidates) if candidates & card_mask]
+                if len(slot_indices) != 1:
+                    continue
+
+                slot_index = slot_indices[0]
+                self.unplaced.remove(card_mask)
+                if card_mask is mask:
+                    placed_slot_index = slot_index
+                if self.candidates[slot_index] & ~card_mask:
+                    self.candidates[slot_index] &= card_mask
+                    changed = True
+
+        return placed_slot_index
+
+    def __str__(self):
+        return ', '.join(
+            str(self.item(i)) if self.is_known(i) else '{} ({} possible)'.format(slot_type, _count_bits(mask))
+            for i, (slot_type, mask) in enumerate(zip(self.slot_types, self.candidates))
+        )
+
+
+# Items that could be in the item frame of every group in a battle, narrowed as events reveal cards
+class ItemInference:
+    def __init__(self, battle):
+        self.battle = battle
+        self.index = item_index(battle.game)
+
+        # (player index, group index) => inference for the group's item frame
+        self.frames = {}
+        for player in battle.players:
+            for group in player.groups:
+                if group.archetype is None:
+                    continue
+
+                frame = FrameInference(self.index, group.archetype.slot_types)
+                self.frames[player.index, group.index] = frame
+
+                # Start from the items the battle already knows
+                for slot_index, slot in enumerate(group.item_frame.slots):
+                    if not slot.is_empty():
+                        frame.candidates[slot_index] = 1 << slot.item.type.id
+
+    def frame(self, player_index, group_index):
+        return self.frames[player_index, group_index]
+
+    def update(self, event):
+        """
+        Narrow the items by an event, once the battle has applied it (so the card revealed is the one in the battle's
+        hand, and a card revealed again isn't taken for another copy).
+        """
+
+        if type(event) is not ExCardReveal:
+            return
+
+        # Only cards that came from a group's items (not created during the battle) tell anything about them
+        if event.original_player_index is None or event.original_player_index == -1:
+            return
+
+        try:
+            item_type = self.battle.game.get_item(event.origin)
+        except KeyError:
+            item_type = None
+
+        card = None
+        hand = self.battle.players[event.player_index].groups[event.group_index].hand
+        if hand is not None and event.card_index < len(hand) and hand[event.card_index].type is event.card_type:
+            card = hand[event.card_index]
+
+        self.frame(event.original_player_index, event.original_group_index).reveal(event.card_type, item_type, card)
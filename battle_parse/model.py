@@ -1,9 +1,22 @@
 import enum
 
-import gamedata
 from .event import *
 
 
+# Copy a list held by a model object, for a snapshot (the elements themselves are shared)
+def _copy_list(list_):
+    return None if list_ is None else list(list_)
+
+
+# Restore a list held by a model object in place, so that anything else holding it sees the change too (the saved list
+# is copied, so that the snapshot can be restored again)
+def _restore_list(list_, saved):
+    if list_ is None or saved is None:
+        return _copy_list(saved)
+    list_[:] = saved
+    return list_
+
+
 # Card instance during a battle (type may be hidden)
 class Card:
     def __init__(self):
@@ -30,7 +43,7 @@ class Card:
             True) and
         True)
 
-    def reveal(self, card_type, origin):
+    def reveal(self, game, card_type, origin):
         if not self.is_hidden() and (self.type != card_type or self.origin != origin):
             raise ValueError('Cannot reveal "{}" from "{}" as "{}" from "{}"'.format(
                 self.type, self.origin, card_type, origin))
@@ -39,13 +52,19 @@ class Card:
         self.origin = origin
         
         try:
-            self.item_type = gamedata.get_item(origin)
+            self.item_type = game.get_item(origin)
         except KeyError:
             self.item_type = None
 
     def is_hidden(self):
         return self.type is None
 
+    def snapshot(self):
+        return self.type, self.origin, self.item_type, self.created, self.original_group, self.visible
+
+    def restore(self, state):
+        self.type, self.origin, self.item_type, self.created, self.original_group, self.visible = state
+
     def __str__(self):
         return '?' if self.type is None else self.type.name
 
@@ -66,6 +85,13 @@ class Item:
         self.type = type_
         self.marked = [False] * len(type_.cards)
 
+    def snapshot(self):
+        return self.type, _copy_list(self.marked)
+
+    def restore(self, state):
+        self.type, marked = state
+        self.marked = _restore_list(self.marked, marked)
+
     def try_mark(self, card):
         for i, card_type in enumerate(self.type.cards):
             if self.marked[i] is card:
@@ -117,6 +143,13 @@ class ItemSlot:
     def remove_item(self):
         self.item = Item(self.num_cards)
 
+    def snapshot(self):
+        return self.item, self.item.snapshot()
+
+    def restore(self, state):
+        self.item, item_state = state
+        self.item.restore(item_state)
+
     def is_empty(self):
         return self.item.is_hidden()
 
@@ -155,6 +188,15 @@ class ItemFrame:
         self.slot_types = archetype.slot_types
         self.slots = [ItemSlot(slot_type) for slot_type in self.slot_types]
 
+    def snapshot(self):
+        return None if self.slots is None else [slot.snapshot() for slot in self.slots]
+
+    def restore(self, state):
+        if state is None:
+            return
+        for slot, slot_state in zip(self.slots, state):
+            slot.restore(slot_state)
+
     def mark(self, card):
         for slot in self.slots:
             if slot.item.type == card.item_type and slot.item.try_mark(card):
@@ -226,6 +268,18 @@ class Actor:
     def build(self):
         pass
 
+    def snapshot(self):
+        return (
+            self.max_hp, self.hp, self.ap,
+            _copy_list(self.attachments), _copy_list(self.attachment_durations),
+            self.x, self.y, self.fx, self.fy,
+        )
+
+    def restore(self, state):
+        self.max_hp, self.hp, self.ap, attachments, attachment_durations, self.x, self.y, self.fx, self.fy = state
+        self.attachments = _restore_list(self.attachments, attachments)
+        self.attachment_durations = _restore_list(self.attachment_durations, attachment_durations)
+
 # Actor group during a battle (name, figure, archetype, item frame)
 class Group:
     def __init__(self):
@@ -293,6 +347,22 @@ class Group:
         self.archetype = archetype
         self.item_frame.set_archetype(archetype)
 
+    def snapshot(self):
+        return (
+            _copy_list(self.hand), _copy_list(self.draw_deck), _copy_list(self.discard_deck),
+            self.item_frame.snapshot(),
+            [actor.snapshot() for actor in self.actors],
+        )
+
+    def restore(self, state):
+        hand, draw_deck, discard_deck, item_frame_state, actor_states = state
+        self.hand = _restore_list(self.hand, hand)
+        self.draw_deck = _restore_list(self.draw_deck, draw_deck)
+        self.discard_deck = _restore_list(self.discard_deck, discard_deck)
+        self.item_frame.restore(item_frame_state)
+        for actor, actor_state in zip(self.actors, actor_states):
+            actor.restore(actor_state)
+
     def reshuffle(self):
         self.draw_deck.extend(self.discard_deck)
         self.discard_deck.clear()
@@ -306,9 +376,57 @@ class Group:
         self.discard_deck.append(card)
 
     def draw(self):
-        card = self.draw_deck.pop()
+        # The discard deck is shuffled back in when the draw deck runs out
+        if not self.draw_deck:
+            self.reshuffle()
+
+        card = self.draw_deck.pop() if self.draw_deck else self.player.battle.new_card()
         self.hand.insert(0, card)
 
+    def hand_card(self, card_index, created=False):
+        """
+        Return the card at an index of the hand. Cards the events never said entered the hand (e.g. the enemy's draws,
+        which don't say which group drew) are drawn hidden until the index exists, the last one new if it was created.
+        """
+
+        while len(self.hand) < card_index:
+            self.draw()
+
+        if card_index == len(self.hand):
+            if created:
+                self.hand.append(self.player.battle.new_card())
+            else:
+                self.draw()
+                self.hand.append(self.hand.pop(0))
+
+        return self.hand[card_index]
+
+    def replace_hand_card(self, card_index, card_type, origin, created=False):
+        """
+        Return a card of a type to stand in for a known card of another type at an index of the hand. A created card
+        (e.g. the move card each group gets every round) is new and pushes the known card aside. Otherwise the draw deck
+        is shuffled, so the card drawn wasn't necessarily the one on top: it's swapped with a card of the type (or a
+        hidden one) from the draw deck.
+        """
+
+        if created:
+            card = self.player.battle.new_card()
+            self.hand.insert(card_index, card)
+            return card
+
+        for matches in (
+            lambda c: c.type == card_type and c.origin == origin,
+            lambda c: c.is_hidden(),
+        ):
+            for i, card in enumerate(self.draw_deck):
+                if matches(card):
+                    self.draw_deck[i], self.hand[card_index] = self.hand[card_index], card
+                    return card
+
+        card = self.player.battle.new_card()
+        self.hand[card_index] = card
+        return card
+
     def __str__(self):
         return '{} ({} {})\nEquipment: {}'.format(
             '?' if self.name is None else self.name,
@@ -371,6 +489,14 @@ class Player:
         for group in self.groups:
             group.build()
 
+    def snapshot(self):
+        return self.stars, self.drawing_group, self.cards_drawn, [group.snapshot() for group in self.groups]
+
+    def restore(self, state):
+        self.stars, self.drawing_group, self.cards_drawn, group_states = state
+        for group, group_state in zip(self.groups, group_states):
+            group.restore(group_state)
+
 
 # Board square during a battle
 class Square:
@@ -396,6 +522,12 @@ class Square:
         self.x = x
         self.y = y
 
+    def snapshot(self):
+        return self.attachment, self.duration
+
+    def restore(self, state):
+        self.attachment, self.duration = state
+
 
 # Board doodad during a battle (static; doodads stay the same throughout the battle)
 class Doodad:
@@ -483,9 +615,26 @@ class Board:
         return '\n'.join(map(row, range(self.h)))
 
 
+# Functions that apply each kind of event to a battle, by event class (kinds without one don't change the battle)
+EVENT_HANDLERS = {}
+
+
+# Register a function as the handler of kinds of events, called as handler(battle, event)
+def handles(*kinds):
+    def register(handler):
+        for kind in kinds:
+            EVENT_HANDLERS[kind] = handler
+        return handler
+
+    return register
+
+
 # Battle (board, players, actors, cards, items, etc.)
 class Battle:
-    def __init__(self):
+    def __init__(self, game):
+        # Game data that card, item and archetype names refer to
+        self.game = game
+
         # Info
         self.scenario_name = None
         self.display_name = None
@@ -510,6 +659,9 @@ class Battle:
         self.user = None
         self.enemy = None
 
+        # Debug: print each event and the hand it affects as it's applied
+        self.trace = False
+
     def add_player(self, player):
         player.battle = self
         player.index = len(self.players)
@@ -522,10 +674,49 @@ class Battle:
         else:
             obj_at[idx] = self.add_player(Player())
 
+    # Add a hidden card that wasn't among the battle's objects (e.g. created during the battle)
+    def new_card(self):
+        card = Card()
+        card.visible = False
+        self.cards.append(card)
+        return card
+
     def set_user(self, user_index):
         self.user = self.players[user_index]
         self.enemy = self.players[1 - user_index]
 
+    def snapshot(self):
+        """
+        Return a structural copy of the battle's state: the state of every player (down to the contents of hands and
+        decks), square and card, with the objects themselves shared.
+        """
+
+        return (
+            self.current_turn, self.current_round, self.game_over, self.user, self.enemy,
+            [player.snapshot() for player in self.players],
+            [square.snapshot() for square in self.board.squares],
+            [(card, card.snapshot()) for card in self.cards],
+        )
+
+    def restore(self, state):
+        """
+        Return the battle to a snapshot of its state.
+        """
+
+        (
+            self.current_turn, self.current_round, self.game_over, self.user, self.enemy,
+            player_states, square_states, card_states,
+        ) = state
+        for player, player_state in zip(self.players, player_states):
+            player.restore(player_state)
+        for square, square_state in zip(self.board.squares, square_states):
+            square.restore(square_state)
+
+        # Cards are added as they enter the battle, so the snapshot's cards may not be the ones held now
+        self.cards[:] = [card for card, _ in card_states]
+        for card, card_state in card_states:
+            card.restore(card_state)
+
     def is_described(self):
         return (
             self.scenario_name is not None and
@@ -560,18 +751,31 @@ class Battle:
 
             card.original_group.item_frame.mark(card)
 
-        for player in self.players:
-            for group in player.groups:
-                print(group)
-                print()
+        if self.trace:
+            for player in self.players:
+                for group in player.groups:
+                    print(group)
+                    print()
 
-    def reveal_card(self, event):
+    @handles(ExCardDraw)
+    def draw_card(self, event):
         player = self.players[event.player_index]
         group = player.groups[event.group_index]
-        card = group.hand[event.card_index]
-        card.reveal(event.card_type, event.origin)
+        group.draw()
 
-        if event.original_player_index != -1:
+    @handles(ExCardReveal)
+    def reveal_card(self, event):
+        player = self.players[event.player_index]
+        group = player.groups[event.group_index]
+        created = event.original_player_index == -1
+        card = group.hand_card(event.card_index, created)
+        if not card.is_hidden() and (card.type != event.card_type or card.origin != event.origin):
+            card = group.replace_hand_card(event.card_index, event.card_type, event.origin, created)
+        card.reveal(self.game, event.card_type, event.origin)
+
+        if created:
+            card.created = True
+        elif event.original_player_index is not None:
             if card.item_type is None:
                 raise KeyError('Unknown item "{}"'.format(card.origin))
             
@@ -579,89 +783,62 @@ class Battle:
             original_group = original_player.groups[event.original_group_index]
             original_group.item_frame.mark(card)
 
-    def update(self, event):  # TODO
-        try:
-            print(event)
-            print('    : Hand before =', self.players[event.player_index].groups[event.group_index].hand)
-        except:
-            pass
-
-        if isinstance(event, ExCardReveal):
-            self.reveal_card(event)
-                
-        elif isinstance(event, ExCardDraw):
-            pass
-        
-        elif isinstance(event, ExCardDiscard):
-            pass
-        
-        elif isinstance(event, ExCardPlay):
-            player = self.players[event.player_index]
-            group = player.groups[event.group_index]
-            card = group.hand[event.card_index]
+    @handles(ExCardPlay)
+    def play_card(self, event):
+        player = self.players[event.player_index]
+        group = player.groups[event.group_index]
+        card = group.hand_card(event.card_index, event.original_player_index == -1)
 
-            # TODO: What if Unstoppable Chop is blocked and returned to hand?
-            # TODO: DiscardToOpponentComponent => Wait for genRand to determine where to travel to
-            group.discard(event.card_index)
+        # TODO: What if Unstoppable Chop is blocked and returned to hand?
+        # TODO: DiscardToOpponentComponent => Wait for genRand to determine where to travel to
+        group.discard(event.card_index)
 
-            for param, value in card.type.components.items():
-                if param == 'DrawOnResolveComponent':
+        for param, value in card.type.components.items():
+            if param == 'DrawOnResolveComponent':
+                # The user's draws are events of their own
+                if player is not self.user:
                     group.draw()
-                else:
-                    print('Ignored component: {} = {}'.format(param, value))
-        
-        elif isinstance(event, ExMustTrait):
-            pass
-        
-        elif isinstance(event, ExNoTraits):
-            pass
-        
-        elif isinstance(event, ExMustDiscard):
-            pass
-        
-        elif isinstance(event, ExNoDiscards):
-            pass
-        
-        elif isinstance(event, ExHandPeek):
-            pass
-        
-        elif isinstance(event, ExDeckPeek):
-            pass
-        
-        elif isinstance(event, ExTriggerInHand):
-            pass
-        
-        elif isinstance(event, ExTriggerTrait):
-            pass
-        
-        elif isinstance(event, ExTriggerTerrain):
-            pass
-        
-        elif isinstance(event, ExSelectTarget):
-            pass
-        
-        elif isinstance(event, ExSelectSquare):
-            pass
-        
-        elif isinstance(event, ExRNG):
-            pass
-        
-        elif isinstance(event, ExRespawn):
-            pass
-        
-        elif isinstance(event, ExStartTimer):
-            pass
-        
-        elif isinstance(event, ExPauseTimer):
-            pass
-        
-        elif isinstance(event, ExPass):
-            pass
-        
-        elif isinstance(event, ExResign):
-            pass
+            elif self.trace:
+                print('Ignored component: {} = {}'.format(param, value))
 
+    @handles(ExCardDiscard)
+    def discard_card(self, event):
+        # The group that must discard isn't known if the extension that says so was missed
+        if event.player_index is None or event.player_index == -1:
+            return
+
+        player = self.players[event.player_index]
+        group = player.groups[event.group_index]
+        card = group.hand_card(event.card_index)
+        if card.is_hidden():
+            # The card still leaves the hand, as an unknown card in the discard deck (like the hidden cards draws take)
+            group.discard_deck.append(group.hand.pop(event.card_index))
+            return
+        group.discard(event.card_index)
+
+    # TODO: Handle triggers, selections, respawns, etc.
+    def update(self, event):
+        """
+        Apply an event to the battle. Extension events don't say everything that happens to hands (the user's own plays
+        and discards, the enemy's draws and discards from blocks only show up in messages), so hands are kept
+        consistent with what the events do say, but may hold cards that have since left them.
+        """
+
+        handler = EVENT_HANDLERS.get(type(event))
+        if self.trace:
+            self._trace_update(event, handler)
+        elif handler is not None:
+            handler(self, event)
+
+    def _trace_hand(self, label, event):
         try:
-            print('    : Hand after  =', self.players[event.player_index].groups[event.group_index].hand)
-        except:
+            print(label, self.players[event.player_index].groups[event.group_index].hand)
+        except (AttributeError, IndexError, TypeError):
             pass
+
+    def _trace_update(self, event, handler):
+        print(event)
+        self._trace_hand('    : Hand before =', event)
+        if handler is not None:
+            handler(self, event)
+        self._trace_hand('    : Hand after  =', event)
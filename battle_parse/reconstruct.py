@@ -1,19 +1,23 @@
 # This file extracts information and a list of battle events from verbose battle logs
 
 from tkinter import Tk
+import functools
+import io
+import os
 import re
 
-import gamedata
 from util import log_parse
 from .event import *
+from . import index
 from . import model
+from . import store
 
 
 # Load objects into battle
 # TODO: Support player with multiple participants (party)
 # TODO: Support quick draw (?)
-def load_battle_objects(objs):
-    battle = model.Battle()
+def load_battle_objects(game, objs):
+    battle = model.Battle(game)
     board = battle.board
     obj_at = {}
 
@@ -141,7 +145,7 @@ def load_battle_objects(objs):
             group.display_name = obj['displayName']
             archetype_name = '{} {}'.format(obj['race'], obj['characterClass'])
             group.set_archetype(
-                archetype=gamedata.get_archetype(archetype_name),
+                archetype=game.get_archetype(archetype_name),
             )
             group.base_ap = obj['actionPoints']
             group.draws_per_actor = obj['drawsPerActor']
@@ -212,7 +216,8 @@ def load_battle_objects(objs):
             card.visible = obj['visibleToAll']
             if 'type' in obj:
                 card.reveal(
-                    card_type=gamedata.get_card(obj['type']),
+                    game,
+                    card_type=game.get_card(obj['type']),
                     origin=obj['origin'],
                 )
                 if 'owner' in obj:
@@ -231,20 +236,29 @@ def load_battle_objects(objs):
     return battle
 
 
-# Extract extension events
-def extension_events(battle, extensions):
-    def reveal_cards(player_turn, peeks, action=None):
+# Extract extension events, one extension at a time
+class ExtensionEventExtractor:
+    def __init__(self, battle):
+        self.battle = battle
+        self.player_turn = -1
+        self.must_discard = [-1, -1]
+
+    def _reveal_cards(self, events, player_turn, peeks, action=None):
         for peek in peeks:
-            events.append(ExCardReveal(
+            reveal = ExCardReveal(
                 player_turn,
                 player_index=peek['owner'],
                 group_index=peek['group'],
                 card_index=peek['card'],
                 original_player_index=peek['cownerp'],
                 original_group_index=peek['cownerg'],
-                card_type=gamedata.get_card(peek['type']),
+                card_type=self.battle.game.get_card(peek['type']),
                 origin=peek['origin'],
-            ))
+            )
+
+            # A drawn card is revealed where it lands in the hand, so it must be drawn first
+            if action is not ExCardDraw:
+                events.append(reveal)
 
             if action is not None:
                 events.append(action(
@@ -255,16 +269,18 @@ def extension_events(battle, extensions):
                     original_player_index=peek['cownerp'],
                     original_group_index=peek['cownerg'],
                 ))
-    
-    events = []
-    player_turn = -1
-    must_discard = [-1, -1]
-    for ex in extensions:
+
+            if action is ExCardDraw:
+                events.append(reveal)
+
+    def feed(self, ex):
+        events = []
+
         ex_name = ex.get('_NAME')
         event_type = ex.get('type')
 
         if ex_name != 'battleTimer' and (ex_name != 'battle' or event_type == 'done'):
-            continue
+            return events
 
         if ex_name == 'battleTimer':
             player_index = ex['playerIndex']
@@ -272,7 +288,7 @@ def extension_events(battle, extensions):
             remaining = ex['timeRemaining']
 
             if start:
-                player_turn = player_index
+                self.player_turn = player_index
                 events.append(ExStartTimer(
                     -1,
                     player_index,
@@ -280,7 +296,7 @@ def extension_events(battle, extensions):
                 ))
                 
             else:
-                player_turn = -1
+                self.player_turn = -1
                 events.append(ExPauseTimer(
                     -1,
                     player_index,
@@ -289,37 +305,40 @@ def extension_events(battle, extensions):
 
         elif event_type == 'deckPeeksSent':
             events.append(ExDeckPeek(
-                player_turn,
+                self.player_turn,
             ))
 
         elif event_type == 'handPeeksSent':
             events.append(ExHandPeek(
-                player_turn,
+                self.player_turn,
             ))
 
         elif event_type == 'deckPeeks':
             # If user is still unknown, use this deckPeeks to determine who it is
-            if battle.user is None:
-                battle.set_user(
+            if self.battle.user is None:
+                self.battle.set_user(
                     user_index=ex['SENDID'][0],
                 )
 
             # For every card in the peeks array, extract its info and append an event for it
-            reveal_cards(
-                player_turn,
+            self._reveal_cards(
+                events,
+                self.player_turn,
                 peeks=ex['DP']['peeks'],
                 action=ExCardDraw,
             )
 
         elif event_type == 'handPeeks':
-            reveal_cards(
-                player_turn,
+            self._reveal_cards(
+                events,
+                self.player_turn,
                 peeks=ex['HP']['peeks'],
             )
 
         elif event_type == 'action':
-            reveal_cards(
-                player_turn,
+            self._reveal_cards(
+                events,
+                self.player_turn,
                 peeks=ex['HP']['peeks'],
                 action=ExCardPlay,
             )
@@ -329,14 +348,14 @@ def extension_events(battle, extensions):
                 ys = ex['TARYS']
                 for x, y in zip(xs, ys):
                     events.append(ExSelectSquare(
-                        player_turn,
+                        self.player_turn,
                         square=[x, y],
                         facing=None,
                     ))
 
             elif 'TARP' in ex:
                 events.append(ExSelectTarget(
-                    player_turn,
+                    self.player_turn,
                     target_player_indices=ex['TARP'],
                     target_group_indices=ex['TARG'],
                     target_actor_indices=ex['TARA'],
@@ -345,8 +364,9 @@ def extension_events(battle, extensions):
         elif event_type == 'selectCard':
             # Reveal hidden card
             if 'HP' in ex:
-                reveal_cards(
-                    player_turn,
+                self._reveal_cards(
+                    events,
+                    self.player_turn,
                     peeks=ex['HP']['peeks'],
                     action=ExCardDiscard,
                 )
@@ -354,10 +374,12 @@ def extension_events(battle, extensions):
             # Discard visible card
             else:
                 events.append(ExCardDiscard(
-                    player_turn,
-                    player_index=must_discard[0],
-                    group_index=must_discard[1],
+                    self.player_turn,
+                    player_index=self.must_discard[0],
+                    group_index=self.must_discard[1],
                     card_index=ex['sel'],
+                    original_player_index=None,  # TODO: Look up the visible card's original group
+                    original_group_index=None,
                 ))
 
         # elif event_type == 'selectCards':
@@ -375,33 +397,33 @@ def extension_events(battle, extensions):
             # TODO: ex['DISCC']?
             
             events.append(ExMustDiscard(
-                player_turn,
+                self.player_turn,
                 player_index,
                 group_index,
             ))
             
             # Remember who must discard
-            must_discard = [player_index, group_index]
+            self.must_discard = [player_index, group_index]
 
         elif event_type == 'noMoreDiscards':
             events.append(ExNoDiscards(
-                player_turn,
+                self.player_turn,
             ))
 
         elif event_type == 'hasTrait':
             events.append(ExMustTrait(
-                player_turn,
+                self.player_turn,
                 player_index=ex['PUI'],
             ))
 
         elif event_type == 'noMoreTraits':
             events.append(ExNoTraits(
-                player_turn,
+                self.player_turn,
             ))
 
         elif event_type == 'respawn':
             events.append(ExRespawn(
-                player_turn,
+                self.player_turn,
                 player_indices=ex['TARP'],
                 group_indices=ex['TARG'],
                 actor_indices=ex['TARA'],
@@ -414,7 +436,7 @@ def extension_events(battle, extensions):
             
             if location == 0:
                 events.append(ExTriggerInHand(
-                    player_turn,
+                    self.player_turn,
                     die_roll=ex['TROLL'],
                     required_roll=ex['TTHRESH'],
                     hard_to_block=ex['TPEN'],
@@ -426,7 +448,7 @@ def extension_events(battle, extensions):
 
             elif location == 1:
                 events.append(ExTriggerTrait(
-                    player_turn,
+                    self.player_turn,
                     die_roll=ex['TROLL'],
                     required_roll=ex['TTHRESH'],
                     hard_to_block=ex['TPEN'],
@@ -437,7 +459,7 @@ def extension_events(battle, extensions):
 
             elif location == 2:
                 events.append(ExTriggerTerrain(
-                    player_turn,
+                    self.player_turn,
                     die_roll=ex['TROLL'],
                     required_roll=ex['TTHRESH'],
                     hard_to_block=ex['TPEN'],
@@ -447,7 +469,7 @@ def extension_events(battle, extensions):
 
         elif event_type == 'target':
             events.append(ExSelectTarget(
-                player_turn,
+                self.player_turn,
                 target_player_indices=ex['TARP'],
                 target_group_indices=ex['TARG'],
                 target_actor_indices=ex['TARA'],
@@ -455,70 +477,298 @@ def extension_events(battle, extensions):
 
         elif event_type == 'selectSquare':
             events.append(ExSelectSquare(
-                player_turn,
+                self.player_turn,
                 square=[ex['TARX'], ex['TARY']],
                 facing=[ex['TARFX'], ex['TARFY']],
             ))
 
         elif event_type == 'genRand':
             events.append(ExRNG(
-                player_turn,
+                self.player_turn,
                 rands=ex['RAND'],
             ))
 
         elif event_type == 'pass':
             events.append(ExPass(
-                player_turn,
+                self.player_turn,
             ))
 
         elif event_type == 'forceLoss':
             events.append(ExResign(
-                player_turn,
+                self.player_turn,
             ))
 
         else:
             print('Ignored:', ex)
 
-    return events
+        return events
 
 
-# Extract message events
+def extension_events(battle, extensions):
+    extractor = ExtensionEventExtractor(battle)
+    return [event for ex in extensions for event in extractor.feed(ex)]
+
+
+# Classifies Msg strings by routing each to the one pattern that can match it, whatever the number of message kinds:
+#   - by its first word, for messages that start with literal text;
+#   - by the word after the player, group or actor name it starts with;
+#   - by its last word.
+# Each route is tried in turn until one matches (so at most three patterns are tried).
+class MessageClassifier:
+    def __init__(self, player_names, group_names, actor_names):
+        player_name = '({})'.format('|'.join(re.escape(name) for name in player_names))
+        group_name = '({})'.format('|'.join(re.escape(name) for name in group_names))
+        actor_name = '({})'.format('|'.join(re.escape(name) for name in actor_names))
+
+        # Each table maps a word to a message kind and its pattern
+        self.by_first_word = {
+            'Starting': ('start_round', r'Starting round (\d+)'),
+            'Turn': ('end_round', r'Turn Complete'),
+            'Scoring': ('scoring_phase', r'Scoring Phase: initiated'),
+            'Discard': ('discard_phase', r'Discard Phase: initiated'),
+            'Re-shuffling': ('reshuffle', r"Re-shuffling (\d+) cards from {}'s discard into deck\.".format(group_name)),
+            'Can': ('failed_draw', r"Can not draw for {}\. Deck is empty even after discard reshuffle\.".format(group_name)),
+            'Participant': ('must_target', r'Participant {} must select targets'.format(player_name)),
+            # Traits attach to actors, and terrain to squares
+            'Attaching': ('attach', r'Attaching (.+) to (?:{}|\((\d+), (\d+)\))'.format(actor_name)),
+            'Detaching': ('detach_trait', r'Detaching and discarding (.+) from {}'.format(actor_name)),
+            'The': ('active_player', r'The active player is now {}'.format(player_name)),
+            'Action:': ('cancelling', r'Action: (.+) is invalid - cancelling'),
+            'SeeverSelectCardsCommand::': ('autoselect', r'SeeverSelectCardsCommand:: selected card (.+)'),
+        }
+        self.by_name_word = {
+            'was': ('defeat', r'{} was defeated'.format(player_name)),
+            'drew': ('draw', r'{} drew (.+) for {}'.format(player_name, group_name)),
+            'must': ('must_trait', r'{} must play a Trait'.format(player_name)),
+            'passed.': ('passed', r'{} passed\.'.format(player_name)),
+            'ended': ('ended_round', r'{} ended the round.'.format(player_name)),
+            'took': ('damage', r'{} took (\d+) damage'.format(actor_name)),
+            'healed': ('heal', r'{} healed (\d+)'.format(actor_name)),
+            'died': ('die', r'{} died'.format(actor_name)),
+            ',': ('block', r'{}, health = (\d+) \(pi:(\d+), gi:(\d+), ai:(\d+)\)  blocks (.+)'.format(actor_name)),
+        }
+        self.by_last_word = {
+            'cancelled.': ('cancelled', r'(.+) was cancelled\.'),
+        }
+        for table in (self.by_first_word, self.by_name_word, self.by_last_word):
+            for word, (kind, pattern) in table.items():
+                table[word] = kind, re.compile(pattern)
+
+        # Longest names first, so that a name isn't cut short by another that starts the same way
+        names = sorted(set(player_names) | set(group_names) | set(actor_names), key=len, reverse=True)
+        self.name = re.compile(r'(?:{})(?=[ ,])'.format('|'.join(re.escape(name) for name in names)))
+
+    @staticmethod
+    def _try(table, word, msg):
+        if word not in table:
+            return None
+        kind, pattern = table[word]
+        match = pattern.fullmatch(msg)
+        return None if match is None else (kind, match.groups())
+
+    def classify(self, msg):
+        """
+        Return the (kind, groups) of a Msg string, or None if it's not recognized.
+        """
+
+        result = self._try(self.by_first_word, msg.partition(' ')[0], msg)
+        if result is not None:
+            return result
+
+        match = self.name.match(msg)
+        if match is not None:
+            rest = msg[match.end():]
+            word = ',' if rest[0] == ',' else rest[1:].partition(' ')[0]
+            result = self._try(self.by_name_word, word, msg)
+            if result is not None:
+                return result
+
+        return self._try(self.by_last_word, msg.rpartition(' ')[2], msg)
+
+
+# The classifier for a battle roster, compiled once and shared by every battle between the same characters
+@functools.lru_cache(maxsize=64)
+def message_classifier(player_names, group_names, actor_names):
+    return MessageClassifier(player_names, group_names, actor_names)
+
+
+# Extract message events, one message at a time
 # TODO: Active Player = No Traits
-def message_events(battle, messages):
-    events = []
-
-    players = battle.players
-    groups = [g for p in players for g in p.groups]
-    actors = [a for g in groups for a in g.actors]
-    player_name = '({})'.format('|'.join(re.escape(p.name) for p in players))
-    group_name = '({})'.format('|'.join(re.escape(g.name) for g in groups))
-    actor_name = '({})'.format('|'.join(re.escape(a.name) for a in actors))
-
-    start_round = re.compile(r'Starting round (\d+)')
-    end_round = re.compile(r'Turn Complete')
-    scoring_phase = re.compile(r'Scoring Phase: initiated')
-    discard_phase = re.compile(r'Discard Phase: initiated')
-    defeat = re.compile(r'{} was defeated'.format(player_name))
-    draw = re.compile(r'{} drew (.+) for {}'.format(player_name, group_name))
-    reshuffle = re.compile(r"Re-shuffling (\d+) cards from {}'s discard into deck\.".format(group_name))
-    failed_draw = re.compile(r"Can not draw for {}\. Deck is empty even after discard reshuffle\.".format(group_name))
-    must_trait = re.compile(r'{} must play a Trait'.format(player_name))
-    must_target = re.compile(r'Participant {} must select targets'.format(player_name))
-    attach_trait = re.compile(r'Attaching (.+) to {}'.format(actor_name))
-    detach_trait = re.compile(r'Detaching and discarding (.+) from {}'.format(actor_name))
-    attach_terrain = re.compile(r'Attaching (.+) to \((\d+), (\d+)\)')
-    active_player = re.compile(r'The active player is now {}'.format(player_name))
-    passed = re.compile(r'{} passed\.'.format(player_name))
-    ended_round = re.compile(r'{} ended the round.'.format(player_name))
-    cancelling = re.compile(r'Action: (.+) is invalid - cancelling')
-    cancelled = re.compile(r'(.+) was cancelled\.')
-    damage = re.compile(r'{} took (\d+) damage'.format(actor_name))
-    heal = re.compile(r'{} healed (\d+)'.format(actor_name))
-    die = re.compile(r'{} died'.format(actor_name))
-    block = re.compile(r'{}, health = (\d+) \(pi:(\d+), gi:(\d+), ai:(\d+)\)  blocks (.+)'.format(actor_name))
-    autoselect = re.compile(r'SeeverSelectCardsCommand:: selected card (.+)')
-
-    for m in messages:
+class MessageEventExtractor:
+    def __init__(self, battle):
+        self.battle = battle
+
+        players = battle.players
+        groups = [g for p in players for g in p.groups]
+        actors = [a for g in groups for a in g.actors]
+        self.classifier = message_classifier(
+            tuple(p.name for p in players),
+            tuple(g.name for g in groups),
+            tuple(a.name for a in actors),
+        )
+
+        # Events to add for each kind of Msg string, given the groups of its match
+        self.msg_handlers = {
+            'start_round': self._start_round,
+            'end_round': self._end_round,
+            'scoring_phase': self._scoring_phase,
+            'discard_phase': self._discard_phase,
+            'defeat': self._defeat,
+            'draw': self._draw,
+            'reshuffle': self._reshuffle,
+            'failed_draw': self._failed_draw,
+            'must_trait': self._must_trait,
+            'must_target': self._must_target,
+            'attach': self._attach,
+            'detach_trait': self._detach_trait,
+            'active_player': self._active_player,
+            'passed': self._passed,
+            'ended_round': self._passed,
+            'cancelling': self._cancelling,
+            'cancelled': self._cancelled,
+            'damage': self._damage,
+            'heal': self._heal,
+            'die': self._die,
+            'block': self._block,
+            'autoselect': self._autoselect,
+        }
+
+    def _start_round(self, match):
+        return [MsgStartRound(
+            game_round=int(match[0]),
+        )]
+
+    def _end_round(self, match):
+        return [MsgEndRound()]
+
+    def _scoring_phase(self, match):
+        return [MsgScoringPhase()]
+
+    def _discard_phase(self, match):
+        return [MsgDiscardPhase()]
+
+    def _defeat(self, match):
+        return [MsgDefeat(
+            player_name=match[0],
+        )]
+
+    def _draw(self, match):
+        if match[1] == 'a card':
+            return [MsgHiddenDraw(
+                player_name=match[0],
+                group_name=match[2],
+            )]
+
+        return [MsgCardDraw(
+            player_name=match[0],
+            group_name=match[2],
+            card_type=self.battle.game.get_card(match[1]),
+        )]
+
+    def _reshuffle(self, match):
+        return [MsgReshuffle(
+            group_name=match[1],
+            num_cards=int(match[0]),
+        )]
+
+    def _failed_draw(self, match):
+        return [MsgFailedDraw(
+            group_name=match[0],
+        )]
+
+    def _must_trait(self, match):
+        return [MsgMustTrait(
+            player_name=match[0],
+        )]
+
+    def _must_target(self, match):
+        return [MsgMustTarget(
+            player_name=match[0],
+        )]
+
+    def _attach(self, match):
+        if match[1] is not None:
+            return [MsgAttachTrait(
+                actor_name=match[1],
+                card_type=self.battle.game.get_card(match[0]),
+            )]
+
+        return [MsgAttachTerrain(
+            square=[int(match[2]), int(match[3])],
+            card_type=self.battle.game.get_card(match[0]),
+        )]
+
+    def _detach_trait(self, match):
+        return [MsgDetachTrait(
+            actor_name=match[1],
+            card_type=self.battle.game.get_card(match[0]),
+        )]
+
+    def _active_player(self, match):
+        return [MsgPlayerTurn(
+            player_name=match[0],
+        )]
+
+    def _passed(self, match):
+        return [MsgPass(
+            player_name=match[0],
+        )]
+
+    def _cancelling(self, match):
+        return [MsgCancelAction(
+            card_type=self.battle.game.get_card(match[0]),
+        )]
+
+    def _cancelled(self, match):
+        return [MsgStopCard(
+            card_type=self.battle.game.get_card(match[0]),
+        )]
+
+    def _damage(self, match):
+        return [MsgDamage(
+            actor_name=match[0],
+            hp=int(match[1]),
+        )]
+
+    def _heal(self, match):
+        return [MsgHeal(
+            actor_name=match[0],
+            hp=int(match[1]),
+        )]
+
+    def _die(self, match):
+        return [MsgDeath(
+            actor_name=match[0],
+        )]
+
+    def _block(self, match):
+        player_index = int(match[2])
+        group_index = int(match[3])
+        actor_index = int(match[4])
+
+        return [
+            MsgBlock(
+                player_index,
+                group_index,
+                actor_index,
+                card_type=self.battle.game.get_card(match[5]),
+            ),
+            MsgHealth(
+                player_index,
+                group_index,
+                actor_index,
+                hp=int(match[1]),
+            ),
+        ]
+
+    def _autoselect(self, match):
+        return [MsgAutoselect(
+            card_type=self.battle.game.get_card(match[0]),
+        )]
+
+    def feed(self, m):
+        events = []
+
         event = m.get('Event')
         msg = m.get('Msg')
 
@@ -547,7 +797,7 @@ def message_events(battle, messages):
                 
                 events.append(MsgCardPlay(
                     actor_name=m['Instigator'],
-                    card_type=gamedata.get_card(m['Action']),
+                    card_type=self.battle.game.get_card(m['Action']),
                     target_names=target_names,
                 ))
 
@@ -572,7 +822,7 @@ def message_events(battle, messages):
                     
                 events.append(msg(
                     actor_name=m['TriggeringActor'],
-                    card_type=gamedata.get_card(m['Trigger']),
+                    card_type=self.battle.game.get_card(m['Trigger']),
                     target=m['AffectedActors'],  # TODO: This might fail when there are multiple targets?
                     success=event.endswith('Succeed'),
                     cause=m['TriggerType'],
@@ -586,7 +836,7 @@ def message_events(battle, messages):
             elif event == 'Discard':
                 events.append(MsgDiscard(
                     group_name=m['Group'],
-                    card_type=gamedata.get_card(m['Card']),
+                    card_type=self.battle.game.get_card(m['Card']),
                 ))
 
             elif event == 'SelectCardRequired':
@@ -602,7 +852,7 @@ def message_events(battle, messages):
                 print(m)
                 events.append(MsgSelect(
                     player_name=m['Participant'],
-                    card_type=gamedata.get_card(m['Selection']),
+                    card_type=self.battle.game.get_card(m['Selection']),
                 ))
 
             elif event == 'AttachmentExpired':
@@ -614,7 +864,7 @@ def message_events(battle, messages):
                     
                 events.append(msg(
                     loc,
-                    card_type=gamedata.get_card(m['Attachment']),
+                    card_type=self.battle.game.get_card(m['Attachment']),
                 ))
 
             elif event == 'startTimer':
@@ -633,164 +883,10 @@ def message_events(battle, messages):
                 print('Ignored:', m)
 
         elif msg is not None:
-            if start_round.fullmatch(msg):
-                match = start_round.fullmatch(msg).groups()
-                events.append(MsgStartRound(
-                    game_round=int(match[0]),
-                ))
-
-            elif end_round.fullmatch(msg):
-                events.append(MsgEndRound())
-
-            elif scoring_phase.fullmatch(msg):
-                events.append(MsgScoringPhase())
-
-            elif discard_phase.fullmatch(msg):
-                events.append(MsgDiscardPhase())
-
-            elif defeat.fullmatch(msg):
-                match = defeat.fullmatch(msg).groups()
-                events.append(MsgDefeat(
-                    player_name=match[0],
-                ))
-
-            elif draw.fullmatch(msg):
-                match = draw.fullmatch(msg).groups()
-                
-                if match[1] == 'a card':
-                    events.append(MsgHiddenDraw(
-                        player_name=match[0],
-                        group_name=match[2],
-                    ))
-                    
-                else:
-                    events.append(MsgCardDraw(
-                        player_name=match[0],
-                        group_name=match[2],
-                        card_type=gamedata.get_card(match[1]),
-                    ))
-
-            elif reshuffle.fullmatch(msg):
-                match = reshuffle.fullmatch(msg).groups()
-                events.append(MsgReshuffle(
-                    group_name=match[1],
-                    num_cards=int(match[0]),
-                ))
-
-            elif failed_draw.fullmatch(msg):
-                match = failed_draw.fullmatch(msg).groups()
-                events.append(MsgFailedDraw(
-                    group_name=match[0],
-                ))
-
-            elif must_trait.fullmatch(msg):
-                match = must_trait.fullmatch(msg).groups()
-                events.append(MsgMustTrait(
-                    player_name=match[0],
-                ))
-
-            elif must_target.fullmatch(msg):
-                match = must_target.fullmatch(msg).groups()
-                events.append(MsgMustTarget(
-                    player_name=match[0],
-                ))
-
-            elif attach_trait.fullmatch(msg):
-                match = attach_trait.fullmatch(msg).groups()
-                events.append(MsgAttachTrait(
-                    actor_name=match[1],
-                    card_type=gamedata.get_card(match[0]),
-                ))
-
-            elif detach_trait.fullmatch(msg):
-                match = detach_trait.fullmatch(msg).groups()
-                events.append(MsgDetachTrait(
-                    actor_name=match[1],
-                    card_type=gamedata.get_card(match[0]),
-                ))
-
-            elif attach_terrain.fullmatch(msg):
-                match = attach_terrain.fullmatch(msg).groups()
-                events.append(MsgAttachTerrain(
-                    square=[int(match[1]), int(match[2])],
-                    card_type=gamedata.get_card(match[0]),
-                ))
-
-            elif active_player.fullmatch(msg):
-                match = active_player.fullmatch(msg).groups()
-                events.append(MsgPlayerTurn(
-                    player_name=match[0],
-                ))
-
-            elif passed.fullmatch(msg):
-                match = passed.fullmatch(msg).groups()
-                events.append(MsgPass(
-                    player_name=match[0],
-                ))
-
-            elif ended_round.fullmatch(msg):
-                match = ended_round.fullmatch(msg).groups()
-                events.append(MsgPass(
-                    player_name=match[0],
-                ))
-
-            elif cancelling.fullmatch(msg):
-                match = cancelling.fullmatch(msg).groups()
-                events.append(MsgCancelAction(
-                    card_type=gamedata.get_card(match[0]),
-                ))
-
-            elif cancelled.fullmatch(msg):
-                match = cancelled.fullmatch(msg).groups()
-                events.append(MsgStopCard(
-                    card_type=gamedata.get_card(match[0]),
-                ))
-
-            elif damage.fullmatch(msg):
-                match = damage.fullmatch(msg).groups()
-                events.append(MsgDamage(
-                    actor_name=match[0],
-                    hp=int(match[1]),
-                ))
-
-            elif heal.fullmatch(msg):
-                match = heal.fullmatch(msg).groups()
-                events.append(MsgHeal(
-                    actor_name=match[0],
-                    hp=int(match[1]),
-                ))
-
-            elif die.fullmatch(msg):
-                match = die.fullmatch(msg).groups()
-                events.append(MsgDeath(
-                    actor_name=match[0],
-                ))
-
-            elif block.fullmatch(msg):
-                match = block.fullmatch(msg).groups()
-                player_index = int(match[2])
-                group_index = int(match[3])
-                actor_index = int(match[4])
-                
-                events.append(MsgBlock(
-                    player_index,
-                    group_index,
-                    actor_index,
-                    card_type=gamedata.get_card(match[5]),
-                ))
-                
-                events.append(MsgHealth(
-                    player_index,
-                    group_index,
-                    actor_index,
-                    hp=int(match[1]),
-                ))
-
-            elif autoselect.fullmatch(msg):
-                match = autoselect.fullmatch(msg).groups()
-                events.append(MsgAutoselect(
-                    card_type=gamedata.get_card(match[0]),
-                ))
+            result = self.classifier.classify(msg)
+            if result is not None:
+                kind, match = result
+                events.extend(self.msg_handlers[kind](match))
 
             else:
                 print('Ignored:', m)
@@ -798,7 +894,12 @@ def message_events(battle, messages):
         else:
             print('Ignored:', m)
 
-    return events
+        return events
+
+
+def message_events(battle, messages):
+    extractor = MessageEventExtractor(battle)
+    return [event for m in messages for event in extractor.feed(m)]
 
 
 # Form higher-level events
@@ -815,8 +916,8 @@ def refine_events(battle, ex_events, msg_events):
 
 
 # Use the log text to construct a sequence of events that can be fed into a Battle
-def load_battle(filename=None):
-    # Load log contents into memory
+def load_battle(game, filename=None):
+    # Open log contents as a stream
     if filename is None:
         root = Tk()
         root.withdraw()
@@ -824,25 +925,56 @@ def load_battle(filename=None):
             log = root.clipboard_get()
         except:
             return None, None
+        stream = io.StringIO(log)
     else:
-        with open(filename) as f:
-            log = f.read()
-
-    # Find the most recent joinbattle
-    log_lines = log.splitlines()
-    try:
-        first_line_index = len(log_lines) - 1 - log_lines[::-1].index('Received extension response: joinbattle')
-    except:
+        stream = open(filename)
+
+    return load_battle_stream(game, stream)
+
+
+# Load a battle by its position in the log's battle index (the most recent by default), reading only its byte range
+def load_indexed_battle(game, filename, i=-1):
+    battles = index.load(filename)
+    if not battles:
         print('Failed to find joinbattle')
         return None, None
 
-    # Parse battle logs
-    extensions, messages = log_parse.parse_battle('\n'.join(log_lines[first_line_index:]))
-    joinbattle, extensions = extensions[0], extensions[1:]
+    events, battle = extract_indexed_battle_events(game, filename, battles[i])
+    return apply_events(battle, events)
+
+
+# Parse battle logs from a stream in one pass, keeping only the joinbattle, extensions and messages of the most recent
+# battle
+def parse_battle_stream(stream):
+    joinbattle = None
+    extensions = []
+    messages = []
+    with stream:
+        for kind, obj in log_parse.iter_battle(stream):
+            if kind == log_parse.EXTENSION and obj['_FROM'] == 'server' and obj['_NAME'] == 'joinbattle':
+                joinbattle = obj
+                extensions.clear()
+                messages.clear()
+            elif joinbattle is None:
+                continue
+            elif kind == log_parse.EXTENSION:
+                extensions.append(obj)
+            else:
+                messages.append(obj)
+
+    return joinbattle, extensions, messages
+
+
+# Extract the events of the most recent battle in an open text or binary stream of log lines, without applying them
+def extract_battle_events(game, stream):
+    joinbattle, extensions, messages = parse_battle_stream(stream)
+    if joinbattle is None:
+        print('Failed to find joinbattle')
+        return None, None
 
     # Load objects into battle
     # TODO: Initial player_turn
-    battle = load_battle_objects(joinbattle['objects'])
+    battle = load_battle_objects(game, joinbattle['objects'])
 
     if not battle.is_described():
         pass  # Battle not completely started
@@ -856,8 +988,149 @@ def load_battle(filename=None):
     # Interpolate and extrapolate to form higher-level events
     events = refine_events(battle, ex_events, msg_events)
 
-    # Use events to update battle state
+    return events, battle
+
+
+# Extract the extension and message events of an indexed battle, from the battle store if this parser has already
+# stored it for this game data
+def extract_indexed_battle_streams(game, filename, indexed_battle):
+    data = index.read(filename, indexed_battle)
+    key = store.key(data)
+
+    stored = store.load(game, key)
+    if stored is not None:
+        objs, user_index, ex_events, msg_events = stored
+        battle = load_battle_objects(game, objs)
+        if user_index is not None:
+            battle.set_user(user_index)
+        return ex_events, msg_events, battle
+
+    joinbattle, extensions, messages = parse_battle_stream(io.BytesIO(data))
+    if joinbattle is None:
+        print('Failed to find joinbattle')
+        return None, None, None
+
+    # Objects are stored as parsed, since loading them into battle is cheap next to parsing
+    battle = load_battle_objects(game, joinbattle['objects'])
+    ex_events = extension_events(battle, extensions)
+    msg_events = message_events(battle, messages)
+    user_index = None if battle.user is None else battle.user.index
+    store.save(game, key, joinbattle['objects'], user_index, ex_events, msg_events)
+
+    return ex_events, msg_events, battle
+
+
+# Extract the events of an indexed battle like extract_battle_events, but from the battle store if possible
+def extract_indexed_battle_events(game, filename, indexed_battle):
+    ex_events, msg_events, battle = extract_indexed_battle_streams(game, filename, indexed_battle)
+    if battle is None:
+        return None, None
+
+    return refine_events(battle, ex_events, msg_events), battle
+
+
+# Construct the events of the most recent battle in an open text or binary stream of log lines
+def load_battle_stream(game, stream):
+    events, battle = extract_battle_events(game, stream)
+    return apply_events(battle, events)
+
+
+# Use events to update battle state
+def apply_events(battle, events):
+    if battle is None:
+        return None, None
+
     for event in events:
         battle.update(event)
 
     return events, battle
+
+
+# Follow a log file as the game appends to it, updating the battle in progress with only the new lines
+class BattleFollower:
+    def __init__(self, game, filename):
+        self.game = game
+        self.filename = filename
+        self.reset()
+
+    def reset(self):
+        # Position after the last line parsed (a line that hasn't been completely written yet is read again next poll)
+        self.offset = 0
+        self.parser = log_parse.BattleParser()
+
+        # Battle in progress (since the most recent joinbattle)
+        self.battle = None
+        self.events = []
+        self.ex_extractor = None
+        self.msg_extractor = None
+
+        # (extension, message or event, exception) of everything that failed to be extracted or applied
+        self.errors = []
+
+    def _fail(self, obj, error):
+        print('Failed to follow {}: {!r}'.format(obj, error))
+        self.errors.append((obj, error))
+
+    def _feed(self, kind, obj):
+        if kind == log_parse.EXTENSION and obj['_FROM'] == 'server' and obj['_NAME'] == 'joinbattle':
+            # TODO: Initial player_turn
+            self.battle = load_battle_objects(self.game, obj['objects'])
+            self.events = []
+            self.ex_extractor = ExtensionEventExtractor(self.battle)
+            self.msg_extractor = MessageEventExtractor(self.battle)
+            return []
+
+        if self.battle is None:
+            return []
+
+        try:
+            if kind == log_parse.EXTENSION:
+                ex_events = self.ex_extractor.feed(obj)
+                msg_events = []
+            else:
+                ex_events = []
+                msg_events = self.msg_extractor.feed(obj)
+
+            events = refine_events(self.battle, ex_events, msg_events)
+        except Exception as e:
+            self._fail(obj, e)
+            return []
+
+        # An event that fails to apply is still kept, and the ones after it are still applied
+        for event in events:
+            try:
+                self.battle.update(event)
+            except Exception as e:
+                self._fail(event, e)
+        self.events.extend(events)
+
+        return events
+
+    def poll(self):
+        """
+        Parse the lines appended to the log since the last poll, and return the new events of the current battle.
+
+        The latest extension is only complete once the next one starts, so its events arrive a poll later. Anything that
+        fails to be extracted or applied is reported and added to errors, without stopping the rest of the poll.
+        """
+
+        with open(self.filename, 'rb') as f:
+            # Start over if the log was truncated (e.g. the game restarted)
+            if os.fstat(f.fileno()).st_size < self.offset:
+                self.reset()
+
+            f.seek(self.offset)
+            data = f.read()
+
+        raw_lines = data.split(b'\n')
+        raw_lines.pop()
+
+        events = []
+        for raw_line, line in zip(raw_lines, log_parse.iter_lines(raw_lines)):
+            for kind, obj in self.parser.feed(line):
+                events.extend(self._feed(kind, obj))
+
+            # Only past the line once everything it completed has been processed
+            self.offset += len(raw_line) + 1
+
+        return events
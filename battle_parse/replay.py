@@ -0,0 +1,55 @@
+# This file replays a battle's events with periodic snapshots, so that the battle can be moved to any event quickly
+
+# Events between snapshots
+CHECKPOINT_INTERVAL = 100
+
+
+class Replay:
+    def __init__(self, battle, events, interval=CHECKPOINT_INTERVAL):
+        """
+        Replay events on a battle in its initial (joinbattle) state.
+        """
+
+        self.battle = battle
+        self.events = events
+        self.interval = interval
+
+        # Number of events applied to battle so far
+        self.position = 0
+
+        # Snapshots of battle by position, taken every interval events as the replay first passes them
+        self.checkpoints = {0: battle.snapshot()}
+
+    def step(self):
+        """
+        Apply the next event.
+        """
+
+        self.battle.update(self.events[self.position])
+        self.position += 1
+
+        if self.position % self.interval == 0 and self.position not in self.checkpoints:
+            self.checkpoints[self.position] = self.battle.snapshot()
+
+    def seek(self, position):
+        """
+        Move battle to its state after the first position events, by restoring the nearest snapshot at or before
+        position and replaying the rest.
+        """
+
+        if not 0 <= position <= len(self.events):
+            raise IndexError(f'Cannot seek to event {position} of {len(self.events)}')
+
+        # Snapshots are taken in order, so the nearest one is the latest taken at or before position
+        checkpoint = min(position, max(self.checkpoints)) // self.interval * self.interval
+
+        # Moving forward from the current position is cheaper when it's past the nearest snapshot
+        if not checkpoint <= self.position <= position:
+            self.battle.restore(self.checkpoints[checkpoint])
+            self.position = checkpoint
+
+        while self.position < position:
+            self.step()
+
+    def __len__(self):
+        return len(self.events)
@@ -0,0 +1,137 @@
+# This file stores the parsed form of battles in a versioned binary format, so a battle is only ever parsed once
+
+import hashlib
+import io
+import os
+import os.path
+import pickle
+import struct
+
+import cache
+import gamedata
+from . import event
+
+
+BASE_DIRPATH = os.path.join(cache.BASE_DIRPATH, 'battles')
+
+# Bump whenever log parsing or event extraction changes, so that battles stored by older parsers are parsed again
+PARSER_VERSION = 2
+
+# File layout: magic, format version, parser version, length of the game data version, the game data version, and a
+# pickle of the battle
+MAGIC = b'CHBE'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHHH')
+
+
+def key(data):
+    """
+    Return the key of a battle in the store from the bytes of its log, which identify both the log and the byte range
+    the battle was read from.
+    """
+
+    return hashlib.sha1(data).hexdigest()
+
+
+def filepath(key):
+    return os.path.join(BASE_DIRPATH, key + '.bin')
+
+
+# Event classes by the name they're defined as in battle_parse.event, and vice versa
+_event_kinds = {
+    name: value for name, value in vars(event).items()
+    if isinstance(value, type) and issubclass(value, (event.Message, event.Extension))
+}
+_event_kind_names = {kind: name for name, kind in _event_kinds.items()}
+
+
+# Pickles card and item types as references to their gamedata IDs
+class _Pickler(pickle.Pickler):
+    def persistent_id(self, obj):
+        if isinstance(obj, gamedata.CardType):
+            return 'card', obj.id
+        if isinstance(obj, gamedata.ItemType):
+            return 'item', obj.id
+        return None
+
+
+class _Unpickler(pickle.Unpickler):
+    def __init__(self, file, game):
+        super().__init__(file)
+        self.game = game
+
+    def persistent_load(self, pid):
+        type_tag, id_ = pid
+        if type_tag == 'card':
+            return self.game.cards_by_id[id_]
+        if type_tag == 'item':
+            return self.game.items_by_id[id_]
+        raise pickle.UnpicklingError(f'Unknown persistent ID {pid!r}')
+
+
+# Events are stored as (kind name, field values)
+def _encode_events(events):
+    return [(_event_kind_names[type(e)], [getattr(e, field) for field in e.fields]) for e in events]
+
+
+def _decode_events(encoded):
+    return [_event_kinds[name](*values) for name, values in encoded]
+
+
+def save(game, key, objs, user_index, ex_events, msg_events):
+    """
+    Store a parsed battle: the objects of its joinbattle, the index of the user (if known), and its extension and
+    message events.
+    """
+
+    buffer = io.BytesIO()
+    _Pickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(
+        (objs, user_index, _encode_events(ex_events), _encode_events(msg_events)),
+    )
+    version = game.version.encode()
+    data = HEADER.pack(MAGIC, FORMAT_VERSION, PARSER_VERSION, len(version)) + version + buffer.getvalue()
+
+    os.makedirs(BASE_DIRPATH, exist_ok=True)
+    path = filepath(key)
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+    except:
+        try:
+            os.remove(tmp_path)
+        except:
+            pass
+        raise
+
+    os.replace(tmp_path, path)
+
+
+def load(game, key):
+    """
+    Return the (objs, user_index, ex_events, msg_events) of a stored battle, or None if it isn't stored or was stored
+    by another parser version or for other game data.
+    """
+
+    try:
+        with open(filepath(key), 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+
+    if len(data) < HEADER.size:
+        return None
+    magic, format_version, parser_version, version_size = HEADER.unpack_from(data)
+    if magic != MAGIC or format_version != FORMAT_VERSION or parser_version != PARSER_VERSION:
+        return None
+
+    start = HEADER.size + version_size
+    if data[HEADER.size:start] != game.version.encode():
+        return None
+
+    try:
+        objs, user_index, ex_events, msg_events = _Unpickler(io.BytesIO(data[start:]), game).load()
+        return objs, user_index, _decode_events(ex_events), _decode_events(msg_events)
+    except (pickle.UnpicklingError, EOFError, KeyError, TypeError):
+        # A corrupt or incompatible entry is just parsed again
+        return None
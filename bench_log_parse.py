@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import os.path
+import random
+import time
+
+from util import log_parse
+
+
+CORPUS_FILEPATH = os.path.join('util', 'info', 'verbose_corpus.log')
+CORPUS_SEED = 0
+CORPUS_EXTENSIONS = 600
+
+# Real logs that the battle log message decoder must agree with the reference on
+EXAMPLE_LOGS_GLOB = os.path.join('battle_parse', 'info', 'example_logs', '*')
+
+NAMES = ['Pyrious', 'Vampyrious', 'rav23', 'drakelione']
+CARDS = ['Walk', 'Run', 'Dash', 'Limited Heal', 'Pressing Bash', "Defender's Block", 'Weakened Armor', 'Rusty Armor']
+
+
+# The verbose line parser before it was rewritten, kept as a reference for equivalence and speed
+def _reference_convert(tag, value):
+    if len(value) == 2 and tag.endswith('array'):
+        return []
+
+    to_str = lambda e: '' if e == '[null]' else e
+    to_bool = lambda e: e == 'true'
+    to_int = to_long = int
+    to_float = to_double = float
+
+    convert = {
+        'utf_string': to_str,
+        'bool': to_bool,
+        'int': to_int,
+        'long': to_int,
+        'double': to_float,
+    }
+
+    to_array = lambda f: lambda v: [f(e) for e in v[1:-1].split(',')]
+    items = list(convert.items())
+    for t, f in items:
+        convert[t + '_array'] = to_array(f)
+
+    try:
+        return convert[tag](value)
+    except KeyError:
+        raise ValueError("Unrecognized tag '{}'".format(tag))
+
+
+def _reference_parse_verbose_line(line):
+    indent = 0
+    while line[indent] == '\t':
+        indent += 1
+
+    line = line.lstrip()
+
+    if line[0] != '(':
+        return -1, None, None
+
+    end_tag_index = line.index(')')
+    tag, line = line[1:end_tag_index], line[end_tag_index+2:]
+
+    delim_index = line.find(':')
+    if delim_index == -1:
+        name, value = '', line
+    else:
+        name, value = line[:delim_index], line[delim_index+2:]
+
+    if tag == 'sfs_array':
+        return indent, name, []
+    elif tag == 'sfs_object':
+        return indent, name, {}
+
+    return indent, name, _reference_convert(tag, value)
+
+
+# The battle log message decoder before it was rewritten, kept as a reference for equivalence and speed
+def _reference_convert_message_value(val):
+    try:
+        return int(val)
+    except ValueError:
+        pass
+
+    try:
+        return float(val)
+    except ValueError:
+        pass
+
+    if val == '[NULL]':
+        return ''
+
+    if len(val) != 0 and val[0] + val[-1] in ('()', '[]', '{}'):
+        return [_reference_convert_message_value(x) for x in val[1:-1].split(', ')]
+    if '|' in val:
+        return val.split('|')
+
+    return val
+
+
+def _reference_parse_battle_log_line(line):
+    if not line.startswith('BATTLE LOG: '):
+        words = line.split()
+        if len(words) == 3:
+            event, player_index, remaining = words
+            if event == 'startTimer' or event == 'stopTimer':
+                player_index = int(player_index)
+                remaining = int(remaining)
+                return {'Event': event, 'PlayerIndex': player_index, 'Remaining': remaining}
+        return None
+
+    line = line[12:]
+
+    values = []
+    names = []
+    parsing_value = True
+    end_index = len(line)
+
+    for i, c in enumerate(line[::-1]):
+        index = len(line) - i - 1
+        if parsing_value:
+            if c == '=':
+                if line[index-1] != ' ':
+                    values.append(_reference_convert_message_value(line[index+1:end_index]))
+                    end_index = index
+                    parsing_value = False
+        elif c == ',':
+            names.append(line[index+1:end_index])
+            end_index = index
+            parsing_value = True
+
+    params = dict()
+    for i, name in enumerate(names):
+        params[name] = values[i]
+
+    return params
+
+
+def _check_battle_log_lines(filename, lines):
+    for line in lines:
+        expected = _reference_parse_battle_log_line(line)
+        actual = log_parse.parse_battle_log_line(line)
+        # Compare reprs too, since 1 == 1.0 and key order matters to anyone printing messages
+        if expected != actual or repr(expected) != repr(actual):
+            raise AssertionError(f'{filename}: parse_battle_log_line({line!r}) is {actual!r}, expected {expected!r}')
+
+
+# Random value line of each tag, as it appears in a verbose log
+def _value_line(rng, indent, name):
+    tag = rng.choice(['int'] * 8 + ['utf_string'] * 4 + ['bool'] * 4 + ['int_array', 'bool_array', 'double', 'long'])
+    if tag == 'int':
+        value = str(rng.randint(-1, 500))
+    elif tag == 'utf_string':
+        value = rng.choice(NAMES + CARDS + ['[null]'])
+    elif tag == 'bool':
+        value = rng.choice(['true', 'false'])
+    elif tag == 'int_array':
+        value = '[' + ','.join(str(rng.randint(0, 9)) for _ in range(rng.randint(0, 4))) + ']'
+    elif tag == 'bool_array':
+        value = '[' + ','.join(rng.choice(['true', 'false']) for _ in range(rng.randint(0, 4))) + ']'
+    elif tag == 'double':
+        value = str(rng.choice([1, 0.5, 1.25]))
+    else:
+        value = str(rng.randint(0, 2**40))
+
+    prefix = '\t' * indent + f'({tag}) '
+    return prefix + (f'{name}: {value}' if name else value)
+
+
+def _object_lines(rng, indent, depth):
+    lines = []
+    for i in range(rng.randint(2, 8)):
+        name = f'key{i}'
+        kind = rng.random()
+        if depth > 0 and kind < 0.1:
+            lines.append('\t' * indent + f'(sfs_object) {name}:')
+            lines.extend(_object_lines(rng, indent + 1, depth - 1))
+        elif depth > 0 and kind < 0.2:
+            lines.append('\t' * indent + f'(sfs_array) {name}:')
+            for _ in range(rng.randint(0, 4)):
+                if rng.random() < 0.5:
+                    lines.append('\t' * (indent + 1) + '(sfs_object)')
+                    lines.extend(_object_lines(rng, indent + 2, depth - 1))
+                else:
+                    lines.append(_value_line(rng, indent + 1, ''))
+            lines.append('')
+        else:
+            lines.append(_value_line(rng, indent, name))
+    return lines
+
+
+def _battle_log_line(rng):
+    if rng.random() < 0.1:
+        return f'{rng.choice(["startTimer", "stopTimer"])} {rng.randint(0, 1)} {rng.randint(0, 1200)}'
+
+    params = "Scenario=MP Fool's Trap,Room=Pyrious's battle vs Vampyrious,RoomID=179995"
+    kind = rng.random()
+    if kind < 0.4:
+        return f'BATTLE LOG: {params},Msg={rng.choice(NAMES)} drew {rng.choice(CARDS)} for Body'
+    elif kind < 0.7:
+        return f'BATTLE LOG: Player={rng.choice(NAMES)},{params},Event=SelectCard,Selection={rng.choice(CARDS)}'
+    return f'BATTLE LOG: {params},Event=Draw Phase Initiated'
+
+
+def generate_corpus(seed=CORPUS_SEED, num_extensions=CORPUS_EXTENSIONS):
+    """
+    Generate the lines of a synthetic verbose log, shaped like a real one: mostly nested battle extensions, with battle
+    log messages and timers in between.
+    """
+
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(num_extensions):
+        if rng.random() < 0.05:
+            lines.append(f'Sending zone extension request: {rng.choice(["viewcard", "battle"])}')
+        else:
+            lines.append(f'Received extension response: {rng.choice(["battle"] * 3 + ["battleTimer"])}')
+        lines.append('Parameters:')
+        lines.extend(_object_lines(rng, 1, 3))
+        lines.append('')
+
+        for _ in range(rng.randint(0, 2)):
+            lines.append(_battle_log_line(rng))
+
+    return lines
+
+
+def _time(f, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - start_time)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the verbose log parser on a synthetic corpus.')
+    parser.add_argument('--generate', action='store_true', help=f'regenerate the corpus at {CORPUS_FILEPATH} and exit')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='runs of each benchmark (the best is reported)')
+    args = parser.parse_args()
+
+    if args.generate:
+        os.makedirs(os.path.dirname(CORPUS_FILEPATH), exist_ok=True)
+        with open(CORPUS_FILEPATH, 'w') as f:
+            f.write('\n'.join(generate_corpus()) + '\n')
+        return
+
+    with open(CORPUS_FILEPATH) as f:
+        raw = f.read()
+    lines = raw.splitlines()
+    value_lines = [line for line in lines if line.startswith('\t')]
+
+    # The rewritten line parser must agree with the reference
+    for line in value_lines:
+        expected = _reference_parse_verbose_line(line)
+        actual = log_parse.parse_verbose_line(line)
+        if expected != actual:
+            raise AssertionError(f'parse_verbose_line({line!r}) is {actual!r}, expected {expected!r}')
+
+    # The rewritten message decoder must agree with the reference on every line of the corpus and the example logs
+    _check_battle_log_lines(CORPUS_FILEPATH, lines)
+    for filename in sorted(glob.glob(EXAMPLE_LOGS_GLOB)):
+        with open(filename) as f:
+            _check_battle_log_lines(filename, f.read().splitlines())
+
+    message_lines = [line for line in lines if log_parse.parse_battle_log_line(line) is not None]
+
+    benchmarks = [
+        ('reference parse_verbose_line', value_lines, lambda: [_reference_parse_verbose_line(line) for line in value_lines]),
+        ('parse_verbose_line', value_lines, lambda: [log_parse.parse_verbose_line(line) for line in value_lines]),
+        ('reference parse_battle_log_line', message_lines, lambda: [_reference_parse_battle_log_line(line) for line in message_lines]),
+        ('parse_battle_log_line', message_lines, lambda: [log_parse.parse_battle_log_line(line) for line in message_lines]),
+        ('reference parse_battle_log', lines, lambda: [_reference_parse_battle_log_line(line) for line in lines]),
+        ('parse_battle_log', lines, lambda: log_parse.parse_battle_log(raw)),
+        ('parse_verbose', lines, lambda: log_parse.parse_verbose(raw)),
+        ('iter_battle', lines, lambda: list(log_parse.iter_battle(lines))),
+    ]
+
+    print(f'Corpus: {len(lines)} lines ({len(value_lines)} value lines, {len(message_lines)} messages), best of {args.repeat} runs')
+    for name, bench_lines, f in benchmarks:
+        seconds = _time(f, args.repeat)
+        print(f'{name:>33}: {len(bench_lines) / seconds:>12,.0f} lines/s')
+
+
+if __name__ == '__main__':
+    main()
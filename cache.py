@@ -1,3 +1,4 @@
+import collections
 import csv
 import enum
 import gzip
@@ -202,3 +203,33 @@ class SplitCache:
 
     def back_up(self):
         shutil.make_archive(self.backup_path, 'gztar', self.path)
+
+
+# In-memory cache that evicts the least recently used entry once full
+class LRUCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+
+        self.data = collections.OrderedDict()
+
+    def get(self, key, default=None):
+        if key not in self.data:
+            return default
+
+        self.data.move_to_end(key)
+        return self.data[key]
+
+    def put(self, key, value):
+        self.data[key] = value
+        self.data.move_to_end(key)
+        while len(self.data) > self.max_size:
+            self.data.popitem(last=False)
+
+    def clear(self):
+        self.data.clear()
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __len__(self):
+        return len(self.data)
@@ -1,2 +1,2 @@
-from .model import CardType, ItemType, CharacterArchetype
+from .model import MAX_LEVEL, CardType, ItemType, CharacterArchetype
 from .manager import download, download_item_image, load, Manager
@@ -2,6 +2,7 @@
 Interface with Card Hunter databases.
 """
 
+import hashlib
 import os
 import os.path
 import re
@@ -290,6 +291,9 @@ class Manager:
         self.adventures_by_display_name = {}
 
         self.slot_types = set()
+
+        # Digest of the cached game data files (changes whenever they do)
+        self.version = None
         
         # Flags
         self.is_loaded = False
@@ -365,6 +369,14 @@ class Manager:
             self.adventures.append(adventure)
             self.adventures_by_display_name[_normalize(adventure.display_name)] = adventure
 
+    def _reload_version(self):
+        digest = hashlib.sha1()
+        for path in (CARDS_FILEPATH, ITEMS_FILEPATH, ARCHETYPES_FILEPATH, ADVENTURES_FILEPATH):
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+
+        self.version = digest.hexdigest()
+
     def load(self):
         """
         Load local game data cache into memory.
@@ -377,6 +389,7 @@ class Manager:
         self._reload_items()
         self._reload_archetypes()
         self._reload_adventures()
+        self._reload_version()
     
         self.is_loaded = True
 
@@ -1,6 +1,9 @@
 # Object model for Card Hunter game data (cards, items, characters)
 
 
+# Highest level a character can reach
+MAX_LEVEL = 18
+
 _EXPANSION_NAME_BY_ID = {
     0: 'Base',
     1: 'AotA',
@@ -473,6 +476,10 @@ class ItemType:
     def is_default_item(self):
         return self.image_name.startswith('Default Item ')
 
+    # Whether a character of the given level can have found this item
+    def is_available_at(self, level):
+        return all(x is None or x <= level for x in (self.level, self.intro_level))
+
 
     #############
     # SLOT TYPE #
@@ -9,19 +9,27 @@ log_filename = 'info/example_logs/log1'
 
 
 def battle_test():
+    game = gamedata.load()
     event_list = []
     scenario = None
+    follower = reconstruct.BattleFollower(game, log_filename)
 
     while True:
         print('Commands: (u)pdate, (r)efresh, (s)how, (d)ownload')
 
         command = input().lower().replace(' ', '')
 
-        if command in "ur":
-            event_list, scenario = reconstruct.load_battle()
+        if command == 'u':
+            # Only read what has been appended to the log since the last update
+            follower.poll()
+            event_list, scenario = follower.events, follower.battle
+        if command == 'r':
+            event_list, scenario = reconstruct.load_battle(game)
             if not event_list:
-                event_list, scenario = reconstruct.load_battle(log_filename)
-        if command in "sr":
+                follower.reset()
+                follower.poll()
+                event_list, scenario = follower.events, follower.battle
+        if command in "sr" and scenario is not None:
             print('> TITLE')
             print(scenario.name, 'aka', scenario.display_name)
             print(scenario.room_name)
@@ -43,7 +51,8 @@ def battle_test():
                 print(i, event)
         if command == 'd':
             gamedata.download()
-            gamedata.load()
+            game = gamedata.load()
+            follower = reconstruct.BattleFollower(game, log_filename)
 
         print()
 
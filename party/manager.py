@@ -1,6 +1,11 @@
+import asyncio
+import hashlib
 import os.path
 
+import numpy as np
+
 import cache
+import gamedata
 from . import model
 from . import optimize
 
@@ -9,6 +14,42 @@ from . import optimize
 BASE_DIRPATH = os.path.join(cache.BASE_DIRPATH, 'party')
 
 CARD_PACKS_FILEPATH = os.path.join(BASE_DIRPATH, 'card_packs.json')
+PRECOMPUTED_BUILDS_FILEPATH = os.path.join(BASE_DIRPATH, 'precomputed_builds')
+
+# Auto-generated card packs
+AUTO_PACKS = (
+    'is trait',
+    'is attached trait',
+    'is attack',
+    'is move',
+    'direct magic damage',
+    'direct magic range',
+    'direct melee damage',
+    'step movement',
+    'step damage',
+    'movement',
+)
+
+# In-memory cache sizes
+RESULT_CACHE_SIZE = 256
+SLOT_TABLE_CACHE_SIZE = 2048
+FRONTIER_CACHE_SIZE = 64
+
+
+# Cache key of card weights, shared by weights that only differ by a positive scale (which doesn't change the optimal
+# builds), along with the scale (the largest magnitude)
+# The weights are normalized only for the key: rounding keeps float noise from splitting equivalent weights into
+# different keys, adding 0 turns -0 into 0, and the key is a digest so that it stays small however many cards there are
+# Results are scored with the exact weights and cached with their scale, so a query with the same weights gets exactly
+# the same scores back, and only equivalent queries with another scale get rescaled ones
+def _canonicalize(card_weights):
+    scale = float(np.abs(card_weights).max(initial=0)) or 1
+    normalized = np.round(card_weights / scale, 12) + 0.0
+    return hashlib.sha1(normalized.tobytes()).digest(), scale
+
+
+def _rescale(builds, scale):
+    return [[score * scale, num_traits, build] for score, num_traits, build in builds]
 
 
 def load(game):
@@ -24,30 +65,38 @@ class Manager:
             CARD_PACKS_FILEPATH,
             format=cache.Format.JSON,
         )
+        self.precomputed_builds_cache = cache.Cache(
+            PRECOMPUTED_BUILDS_FILEPATH,
+            format=cache.Format.PICKLE,
+        )
 
         # In-memory storage
         self._slot_items = {}
+        self._slot_sizes = {}
+        self._slot_columns = {}
+        self._level_tables_version = None
+        self._level_slot_items = {}
+        self._slot_brackets = {}
+        self._archetype_slots = {}
+        self._item_matrix = None
+        self._slot_buckets = {}
+        self._result_cache = cache.LRUCache(RESULT_CACHE_SIZE)
+        self._slot_table_cache = cache.LRUCache(SLOT_TABLE_CACHE_SIZE)
+        self._frontier_cache = cache.LRUCache(FRONTIER_CACHE_SIZE)
+        self._precomputed_builds = {}
 
         self.card_packs = {}
+        self.card_pack_vectors = {}
+        self._card_packs_stamp = None
 
         # Flags
         self.is_loaded = False
 
+        # Whether optimize serves precomputed builds (off while they're being precomputed, so none are served stale)
+        self.use_precomputed_builds = True
+
     def _populate_auto_packs(self, game):
-        # Auto-generated card packs
-        auto_packs = (
-            'is trait',
-            'is attached trait',
-            'is attack',
-            'is move',
-            'direct magic damage',
-            'direct magic range',
-            'direct melee damage',
-            'step movement',
-            'step damage',
-            'movement',
-        )
-        for name in auto_packs:
+        for name in AUTO_PACKS:
             self.card_packs.setdefault(name, {})
     
         # Populate auto-generated card packs
@@ -79,17 +128,136 @@ class Manager:
                 self.card_packs['direct melee damage'][c.name] = c.average_damage
 
     def _reload_card_packs(self, game):
+        # Only re-read and recompile the card packs when the file or the game data changed
+        stamp = (os.path.getmtime(CARD_PACKS_FILEPATH), game.version)
+        if stamp == self._card_packs_stamp:
+            return
+
         self.card_packs_cache.reload()
         self.card_packs = self.card_packs_cache.data
         self._populate_auto_packs(game)
 
+        self.card_pack_vectors = {name: self._compile_card_pack(name, pack) for name, pack in self.card_packs.items()}
+
+        self._card_packs_stamp = stamp
+
+    # Weights that aren't numbers (e.g. stats missing from the game data) are left out, so one bad weight doesn't keep
+    # every card pack from loading
+    def _compile_card_pack(self, name, pack):
+        weights = {}
+        for card_name, weight in pack.items():
+            if isinstance(weight, bool) or not isinstance(weight, (int, float)):
+                print(f'Warning: Ignoring weight {weight!r} of "{card_name}" in card pack "{name}"')
+                continue
+            weights[card_name] = weight
+        return self._item_matrix.vector(weights)
+
+    def _reload_level_tables(self, game):
+        if self._level_tables_version == game.version:
+            return
+
+        # Slot types available to each archetype at each level
+        self._archetype_slots = {}
+        for archetype in game.archetypes:
+            for level in range(1, gamedata.MAX_LEVEL + 1):
+                self._archetype_slots[archetype.name, level] = archetype.slot_types_at_level(level)
+
+        # Items available in each slot at each level, shared across the bracket of levels where they don't change
+        self._level_slot_items = {}
+        self._slot_brackets = {}
+        for slot_type, items in self._slot_items.items():
+            bracket, bracket_items = None, None
+            for level in range(1, gamedata.MAX_LEVEL + 1):
+                level_items = [i for i in items if i.is_available_at(level)]
+                if bracket_items is None or len(level_items) != len(bracket_items):
+                    bracket, bracket_items = level, level_items
+                    self._level_slot_items[slot_type, bracket] = bracket_items
+                self._slot_brackets[slot_type, level] = bracket
+
+        self._level_tables_version = game.version
+
+    def _rows(self, items):
+        return np.array([self._item_matrix.row_by_item_id[i.id] for i in items], dtype=np.intp)
+
+    def _reload_item_matrix(self, game):
+        self._item_matrix = optimize.ItemCardMatrix(game.items, game.cards)
+
+        # Columns of the cards that can appear in each slot
+        self._slot_columns = {}
+        for slot_type, items in self._slot_items.items():
+            columns = {self._item_matrix.column_by_card_id[c.id] for i in items for c in i}
+            self._slot_columns[slot_type] = np.array(sorted(columns), dtype=np.intp)
+
+    def _reload_slot_buckets(self):
+        # Rows of the items in each slot at each level bracket, grouped by token cost and trait count, with one item of
+        # each set of cards
+        traits = self.card_packs['is trait'].keys()
+        self._slot_buckets = {}
+        for (slot_type, bracket), items in self._level_slot_items.items():
+            groups = optimize.ItemFinder.group(items, traits)
+            self._slot_buckets[slot_type, bracket] = {
+                info: self._rows(optimize.ItemFinder.distinct(group)) for info, group in groups.items()
+            }
+
+    def _reload_precomputed_builds(self, game):
+        self._precomputed_builds = {}
+
+        try:
+            self.precomputed_builds_cache.reload()
+        except FileNotFoundError:
+            return
+
+        # Builds precomputed for other game data or traits may no longer be optimal (or exist), since the traits decide
+        # how many cards of a build count towards its average (the card weights are part of each key already)
+        data = self.precomputed_builds_cache.data
+        if data['version'] != game.version or data.get('traits') != sorted(self.card_packs['is trait']):
+            return
+        if 'scales' not in data:
+            return
+
+        for key, builds in data['builds'].items():
+            self._precomputed_builds[key] = data['scales'][key], [
+                [score, num_traits, [game.items_by_id[i] for i in item_ids]]
+                for score, num_traits, item_ids in builds
+            ]
+
+    def save_precomputed_builds(self, game, builds):
+        """
+        Save (scale, builds) keyed by result_key (with the builds as returned by optimize and the scale returned with
+        the key) for later queries.
+        """
+
+        self.precomputed_builds_cache.data = {
+            'version': game.version,
+            'traits': sorted(self.card_packs['is trait']),
+            'scales': {key: scale for key, (scale, _) in builds.items()},
+            'builds': {
+                key: [[score, num_traits, [i.id for i in items]] for score, num_traits, items in key_builds]
+                for key, (_, key_builds) in builds.items()
+            },
+        }
+        os.makedirs(BASE_DIRPATH, exist_ok=True)
+        self.precomputed_builds_cache.save()
+
+        self._reload_precomputed_builds(game)
+
     def load(self, game):
         if self.is_loaded:
             return
 
         self._slot_items = {s: [i for i in game.items if i.slot_type == s] for s in game.slot_types}
+        self._slot_sizes = {s: max((len(i.cards) for i in items), default=0) for s, items in self._slot_items.items()}
+        self._reload_level_tables(game)
+        self._reload_item_matrix(game)
+
+        # Cached results refer to the previous game data
+        self._result_cache.clear()
+        self._slot_table_cache.clear()
+        self._frontier_cache.clear()
 
         self._reload_card_packs(game)
+        self._reload_slot_buckets()
+        self._reload_precomputed_builds(game)
 
         self.is_loaded = True
 
@@ -97,16 +265,152 @@ class Manager:
         self.is_loaded = False
         self.load(game)
 
-    async def optimize(self, archetype, card_weights):
-        slot_items = {s: i for s, i in self._slot_items.items() if s in archetype.slot_types}
+    def card_vector(self, card, weight=1):
+        """
+        Card weights with only card weighted, as a vector like those in card_pack_vectors.
+        """
+
+        return self._item_matrix.vector({card.name: weight})
+
+    def score_packs(self, pack_names):
+        """
+        Score every item under each of the named card packs at once.
+
+        Returns an (items x packs) array whose rows follow game.items.
+        """
+
+        weights = [self.card_pack_vectors[name] for name in pack_names]
+        return self._item_matrix.score_batch(weights).T
 
+    def _find_items(self, slot_types, level, card_weights):
         optimal_items = optimize.ItemFinder()
-        optimal_items.slot_items = slot_items
-        optimal_items.card_weights = card_weights
-        optimal_items.traits = self.card_packs['is trait'].keys()
-        optimal_items.find_all()
+        optimal_items.items = self._item_matrix.items
+        optimal_items.slot_sizes = self._slot_sizes
+
+        # Reuse per-slot tables found for any earlier query with the same weights on that slot's cards
+        for slot_type in set(slot_types):
+            bracket = self._slot_brackets[slot_type, level]
+            optimal_items.slot_buckets[slot_type] = self._slot_buckets.get((slot_type, bracket), {})
+
+            slot_key, slot_scale = _canonicalize(card_weights[self._slot_columns[slot_type]])
+            key = (slot_type, bracket, slot_key)
+
+            cached = self._slot_table_cache.get(key)
+            if cached is None:
+                # Only score the items once some slot actually needs it
+                if optimal_items.item_scores is None:
+                    optimal_items.item_scores = self._item_matrix.score(card_weights)
+                optimal_items.find_slot(slot_type)
+                self._slot_table_cache.put(key, (slot_scale, optimal_items.get_slot_table(slot_type)))
+            else:
+                table_scale, table = cached
+                optimal_items.set_slot_table(slot_type, table, slot_scale / table_scale)
+
+        return optimal_items
+
+    def result_key(self, archetype, card_weights, level=None):
+        """
+        The key of optimize results for archetype, card weights and level, shared by equivalent queries.
+
+        Returns the key along with the scale of the card weights.
+        """
+
+        if level is None:
+            level = gamedata.MAX_LEVEL
+
+        slot_types = self._archetype_slots[archetype.name, level]
+        brackets = tuple(self._slot_brackets[s, level] for s in slot_types)
+
+        weights_key, scale = _canonicalize(card_weights)
+        return (archetype.name, slot_types, brackets, weights_key), scale
+
+    async def _optimize(self, archetype, card_weights, level, on_improve=None, budget=None):
+        if level is None:
+            level = gamedata.MAX_LEVEL
+
+        key, scale = self.result_key(archetype, card_weights, level)
+        _, slot_types, _, _ = key
+        cached = self._result_cache.get(key)
+        if cached is None and self.use_precomputed_builds:
+            cached = self._precomputed_builds.get(key)
+        if cached is not None:
+            builds_scale, builds = cached
+            return _rescale(builds, scale / builds_scale), 0
+
+        optimal_items = self._find_items(slot_types, level, card_weights)
 
         optimal_char = optimize.CharacterFinder(optimal_items)
-        await optimal_char.find(archetype)
+        await optimal_char.find(archetype, slot_types, on_improve, budget)
+
+        # Only complete searches are worth caching
+        builds = optimal_char.optimal[archetype]
+        gap = optimal_char.gaps[archetype]
+        if gap == 0:
+            self._result_cache.put(key, (scale, builds))
+
+        return builds, gap
+
+    async def optimize(self, archetype, card_weights, level=None):
+        """
+        Find the builds for archetype that maximize the average card weight in the deck.
+
+        Card weights are a vector like those in card_pack_vectors. Only the slots and items available at the given
+        level are considered (max level by default). Results are cached by archetype, level bracket and normalized card
+        weights.
+        """
+
+        builds, _ = await self._optimize(archetype, card_weights, level)
+        return builds
+
+    async def optimize_anytime(self, archetype, card_weights, level=None, on_improve=None, budget=None):
+        """
+        Like optimize, but await on_improve with the best builds so far as they improve, and stop after budget seconds.
+
+        Returns the best builds found and a bound on how far their average card weight may be from optimal.
+        """
+
+        return await self._optimize(archetype, card_weights, level, on_improve, budget)
+
+    def _find_frontier(self, archetype, pack_names, slot_types, level, budget):
+        weights = [self.card_pack_vectors[name] for name in pack_names]
+        scores = self._item_matrix.score_batch(weights).T
+
+        # Only the Pareto optimal items of each bucket can be part of a Pareto optimal build
+        slot_tables = {}
+        for slot_type in set(slot_types):
+            bracket = self._slot_brackets[slot_type, level]
+            slot_tables[slot_type] = {}
+            for info, rows in self._slot_buckets.get((slot_type, bracket), {}).items():
+                items = [self._item_matrix.items[row] for row in rows]
+                slot_tables[slot_type][tuple(optimize.ItemFinder.convert(info))] = optimize.FrontierFinder.prune(items, scores[rows])
+
+        frontier = optimize.FrontierFinder(slot_tables, len(pack_names), self._slot_sizes)
+        frontier.find(archetype, slot_types, budget)
+        return frontier.optimal[archetype]
+
+    async def pareto(self, archetype, pack_names, level=None, budget=None):
+        """
+        Find the builds for archetype whose average card weights under the named card packs are Pareto optimal.
+
+        Returns a list of [averages, num_traits, items] with one average per card pack, best first by the first pack.
+        The search runs in an executor so it doesn't hold up the event loop, and if budget is given, raises
+        TimeoutError if it takes more than that many seconds. Results are cached by archetype, level bracket and card
+        packs.
+        """
+
+        if level is None:
+            level = gamedata.MAX_LEVEL
+
+        slot_types = self._archetype_slots[archetype.name, level]
+        brackets = tuple(self._slot_brackets[s, level] for s in slot_types)
+
+        key = (archetype.name, slot_types, brackets, tuple(pack_names))
+        builds = self._frontier_cache.get(key)
+        if builds is not None:
+            return builds
+
+        loop = asyncio.get_running_loop()
+        builds = await loop.run_in_executor(None, self._find_frontier, archetype, pack_names, slot_types, level, budget)
+        self._frontier_cache.put(key, builds)
 
-        return optimal_char.optimal[archetype]
+        return builds
@@ -1,8 +1,55 @@
 import itertools
 import math
 import random
+import time
 
 import asyncio
+import numpy as np
+
+
+# Sparse item x card incidence matrix, stored row-wise (ELLPACK): each row lists the card columns of one item,
+# padded with a column whose weight is always 0
+class ItemCardMatrix:
+    def __init__(self, items, cards):
+        self.items = items
+        self.cards = cards
+
+        self.row_by_item_id = {item.id: i for i, item in enumerate(items)}
+        self.column_by_card_id = {card.id: j for j, card in enumerate(cards)}
+        self.column_by_card_name = {card.name: j for j, card in enumerate(cards)}
+
+        width = max((len(item.cards) for item in items), default=0)
+        self.columns = np.full((len(items), width), len(cards), dtype=np.intp)
+        for i, item in enumerate(items):
+            self.columns[i, :len(item.cards)] = [self.column_by_card_id[card.id] for card in item.cards]
+
+    def vector(self, card_weights):
+        """
+        Convert card weights keyed by card name into a dense vector indexed by card column.
+        Names that aren't cards are ignored.
+        """
+
+        weights = np.zeros(len(self.cards))
+        for name, weight in card_weights.items():
+            if name in self.column_by_card_name:
+                weights[self.column_by_card_name[name]] = weight
+        return weights
+
+    def score(self, weights):
+        """
+        Score every item under one weight vector (a sparse matrix-vector product).
+        """
+
+        return np.append(weights, 0)[self.columns].sum(axis=-1)
+
+    def score_batch(self, weights):
+        """
+        Score every item under each row of a weight matrix (a sparse matrix-matrix product).
+        """
+
+        weights = np.asarray(weights, dtype=float).reshape(-1, len(self.cards))
+        padding = np.zeros((len(weights), 1))
+        return np.hstack((weights, padding))[:, self.columns].sum(axis=-1)
 
 
 class ItemFinder:
@@ -28,11 +75,14 @@ class ItemFinder:
 
     def __init__(self):
         self.fail_cache = set()
-        self.card_weights = {}
-        self.slot_items = {}
-        self.traits = {}
+        self.items = []
+        self.item_scores = None
+        self.slot_buckets = {}
         self.optimal = {}
 
+        # Slot type => number of cards its items add to the deck
+        self.slot_sizes = {}
+
     @staticmethod
     def convert(info):
         return [0 if val == -1 else val for val in info]
@@ -52,39 +102,83 @@ class ItemFinder:
             for trait_count in range(4):
                 yield major, minor, trait_count
 
+    @staticmethod
+    def group(items, traits):
+        """
+        Group items by token cost and trait count, i.e. by the info of the slot they fit.
+        """
+
+        groups = {}
+        for item in items:
+            trait_count = sum(card.name in traits for card in item)
+            groups.setdefault((*item.token_cost, trait_count), []).append(item)
+        return groups
+
+    @staticmethod
+    def distinct(items):
+        """
+        Keep the first of the items with the same cards, since they score the same under any card weights.
+        """
+
+        seen = set()
+        result = []
+        for item in items:
+            cards = tuple(sorted(card.id for card in item))
+            if cards not in seen:
+                seen.add(cards)
+                result.append(item)
+        return result
+
     def find(self, slot_type, info):
         hash_slot = ItemFinder.hash(slot_type, ItemFinder.convert(info))
-        best_score = -math.inf
-        best_items = []
-        for item in self.slot_items[slot_type]:
-            if item.token_cost != info[:2]:
-                continue
-            if sum(card.name in self.traits for card in item) != info[2]:
-                continue
-            score = sum(self.card_weights.get(card.name, 0) for card in item)
-            if score == best_score:
-                best_items.append(item)
-            elif score > best_score:
-                best_items = [item]
-                best_score = score
-        self.optimal[hash_slot] = [best_score, best_items]
+        rows = self.slot_buckets[slot_type].get(tuple(info))
+        if rows is None:
+            self.optimal[hash_slot] = [-math.inf, []]
+            return
+
+        scores = self.item_scores[rows]
+        best_score = scores.max()
+        best_items = [self.items[row] for row in rows[scores == best_score]]
+        self.optimal[hash_slot] = [float(best_score), best_items]
+
+    def find_slot(self, slot_type):
+        for info in ItemFinder.infos(slot_type):
+            self.find(slot_type, info)
+        self.update_slot_cache(slot_type)
 
     def find_all(self):
-        for slot_type in self.slot_items:
-            for info in ItemFinder.infos(slot_type):
-                self.find(slot_type, info)
-        self.update_cache()
+        for slot_type in self.slot_buckets:
+            self.find_slot(slot_type)
+
+    def update_slot_cache(self, slot_type):
+        for info in ItemFinder.infos(slot_type):
+            info = ItemFinder.convert(info)
+            hash_ = ItemFinder.hash(slot_type, info)
+            score, options = self.optimal[hash_]
+            not_found = not options
+            outdone = any(score <= self.get(slot_type, (info[0], info[1], t))[0] and self.get(slot_type, (info[0], info[1], t))[1] for t in range(info[2] + 1, 4))
+            if not_found or outdone:
+                self.fail_cache.add(hash_)
 
     def update_cache(self):
-        for slot_type in self.slot_items:
-            for info in ItemFinder.infos(slot_type):
-                info = ItemFinder.convert(info)
-                hash_ = ItemFinder.hash(slot_type, info)
-                score, options = self.optimal[hash_]
-                not_found = not options
-                outdone = any(score <= self.get(slot_type, (info[0], info[1], t))[0] and self.get(slot_type, (info[0], info[1], t))[1] for t in range(info[2] + 1, 4))
-                if not_found or outdone:
-                    self.fail_cache.add(hash_)
+        for slot_type in self.slot_buckets:
+            self.update_slot_cache(slot_type)
+
+    # Export the optimal items found for a slot, with scores divided by scale
+    def get_slot_table(self, slot_type, scale=1):
+        table = {}
+        for info in ItemFinder.infos(slot_type):
+            hash_ = ItemFinder.hash(slot_type, ItemFinder.convert(info))
+            score, options = self.optimal[hash_]
+            table[hash_] = [score / scale, options, hash_ in self.fail_cache]
+        return table
+
+    # Import the optimal items for a slot, with scores multiplied by scale
+    def set_slot_table(self, slot_type, table, scale=1):
+        for hash_, (score, options, failed) in table.items():
+            self.optimal[hash_] = [score * scale, options]
+            if failed:
+                self.fail_cache.add(hash_)
 
     def get(self, slot_type, info):
         hash_slot = ItemFinder.hash(slot_type, info)
@@ -94,9 +188,47 @@ class ItemFinder:
 
 
 class CharacterFinder:
+    _MAIN_SLOTS = 'Weapon', 'Divine Weapon', 'Staff'
+
+    # Major and minor tokens a build can spend
+    TOKEN_BUDGET = 4, 4
+
     def __init__(self, optimal_items):
         self.optimal_items = optimal_items
         self.optimal = {}
+        self.gaps = {}
+
+    @staticmethod
+    def deck_size(slot_types, slot_sizes):
+        return sum(slot_sizes[slot_type] for slot_type in slot_types)
+
+    @staticmethod
+    def token_slots(slot_types):
+        return [2 if slot_type in CharacterFinder._MAIN_SLOTS else 1 for slot_type in slot_types]
+
+    @staticmethod
+    def token_budgets(token_slots):
+        """
+        List the (major, minor) tokens a build with these token slots spends: the whole budget if its slots can hold
+        it, and otherwise any part of the budget that they can.
+        """
+
+        max_major, max_minor = CharacterFinder.TOKEN_BUDGET
+        capacity = sum(token_slots)
+        if capacity >= max_major + max_minor:
+            return [CharacterFinder.TOKEN_BUDGET]
+        return [
+            (major, minor) for major in range(max_major + 1) for minor in range(max_minor + 1)
+            if major + minor <= capacity
+        ]
+
+    # Token costs of the items that fit a slot, with the major and minor tokens of the budget they use up
+    @staticmethod
+    def token_options(token_slot):
+        if token_slot == 1:
+            return (2, 0, 1, 0), (1, 0, 0, 1), (0, 0, 0, 0)
+        else:  # token_slot == 2:
+            return (2, 2, 2, 0), (2, 1, 1, 1), (1, 1, 0, 2), (1, 0, 0, 1), (0, 0, 0, 0)
 
     def distrib(self, slot_types, token_slots, total_major, total_minor):
         if sum(token_slots) < total_major + total_minor:
@@ -108,11 +240,7 @@ class CharacterFinder:
                 yield tuple((0, 0, t) for t in trait_dis)
             if len(token_slots) == 0:
                 return
-        if token_slots[0] == 1:
-            token_options = (2, 0, 1, 0), (1, 0, 0, 1), (0, 0, 0, 0)
-        else:  # token_slots[0] == 2:
-            token_options = (2, 2, 2, 0), (2, 1, 1, 1), (1, 1, 0, 2), (1, 0, 0, 1), (0, 0, 0, 0)
-        for major, minor, new_major, new_minor in token_options:
+        for major, minor, new_major, new_minor in CharacterFinder.token_options(token_slots[0]):
             net_major = total_major - new_major
             net_minor = total_minor - new_minor
             if net_major < 0 or net_minor < 0:
@@ -123,17 +251,59 @@ class CharacterFinder:
                 for distrib in self.distrib(slot_types[1:], token_slots[1:], net_major, net_minor):
                     yield ((major, minor, trait_count),) + distrib
 
-    async def find(self, archetype):
-        main_slot = 'Weapon', 'Divine Weapon', 'Staff'
-        total_major, total_minor = 4, 4
-        token_slots = [2 if slot_type in main_slot else 1 for slot_type in archetype.slot_types]
+    def upper_bound(self, slot_types):
+        """
+        An upper bound on the average card weight of any build, from the best items of each slot on their own.
+        """
+
+        best_scores = []
+        max_traits = 0
+        for slot_type in slot_types:
+            found = []
+            for info in ItemFinder.infos(slot_type):
+                score, options = self.optimal_items.get(slot_type, ItemFinder.convert(info))
+                if options:
+                    found.append((score, info[2]))
+            if not found:
+                return -math.inf
+            best_scores.append(max(score for score, _ in found))
+            max_traits += max(trait_count for _, trait_count in found)
+
+        # A positive total is largest over the fewest non-trait cards, a negative one over the most
+        score = sum(best_scores)
+        deck_size = CharacterFinder.deck_size(slot_types, self.optimal_items.slot_sizes)
+        if score < 0:
+            return score / deck_size
+        if deck_size - max_traits <= 0:
+            return math.inf
+        return score / (deck_size - max_traits)
+
+    async def find(self, archetype, slot_types=None, on_improve=None, budget=None):
+        """
+        Find the builds with the best average card weight.
+
+        If on_improve is given, it's awaited with the best builds so far every time they improve. If budget is given,
+        the search stops after that many seconds, and gaps[archetype] bounds how far the builds found may be from
+        optimal (0 once the search completes).
+        """
+
+        if slot_types is None:
+            slot_types = archetype.slot_types
+        start_time = time.monotonic()
+
+        deck_size = CharacterFinder.deck_size(slot_types, self.optimal_items.slot_sizes)
+        token_slots = CharacterFinder.token_slots(slot_types)
+        distribs = itertools.chain.from_iterable(
+            self.distrib(slot_types, token_slots, total_major, total_minor)
+            for total_major, total_minor in CharacterFinder.token_budgets(token_slots)
+        )
         best_builds = []
         best_avg = -math.inf
-        for distrib in self.distrib(archetype.slot_types, token_slots, total_major, total_minor):
+        for distrib in distribs:
             build = []
             score = 0
             num_traits = 0
-            for slot_type, info in zip(archetype.slot_types, distrib):
+            for slot_type, info in zip(slot_types, distrib):
                 major, minor, trait_count = info
                 add_score, options = self.optimal_items.get(slot_type, (major, minor, trait_count))
                 if not options:
@@ -142,18 +312,130 @@ class CharacterFinder:
                 score += add_score
                 num_traits += trait_count
             else:
-                avg = score / (36 - num_traits)
+                avg = score / (deck_size - num_traits)
                 if avg == best_avg:
-                    print(avg, score, num_traits)
                     best_builds.append([score, num_traits, build])
                 elif avg > best_avg:
-                    print(avg, score, num_traits)
                     best_builds = [[score, num_traits, build]]
                     best_avg = avg
+                    if on_improve is not None:
+                        await on_improve(best_builds)
             await asyncio.sleep(0)
+
+            if budget is not None and time.monotonic() - start_time > budget:
+                self.optimal[archetype] = best_builds
+                self.gaps[archetype] = max(0, self.upper_bound(slot_types) - best_avg)
+                return
+
         self.optimal[archetype] = best_builds
+        self.gaps[archetype] = 0
 
     def get(self, archetype):
         if archetype in self.optimal:
             return self.optimal[archetype]
         raise KeyError('Cannot get optimal builds without finding them first.')
+
+
+# Indices of the points (rows) that no other point is at least as good as in every objective, keeping one of equal points
+# Raises TimeoutError once time.monotonic() passes deadline, if given
+def pareto(points, deadline=None):
+    order = np.lexsort(points.T[::-1])[::-1]
+    frontier = []
+    for i in order:
+        if deadline is not None and time.monotonic() > deadline:
+            raise TimeoutError('Stopped finding the Pareto frontier at its deadline.')
+        if not frontier or not (points[frontier] >= points[i]).all(axis=1).any():
+            frontier.append(i)
+    return np.array(frontier, dtype=np.intp)
+
+
+class FrontierFinder:
+    """
+    Find the builds whose average card weights under several objectives are Pareto optimal.
+
+    Each slot table maps an item info (converted, as in ItemFinder) to the items that fit it and their scores under
+    each objective, and slot sizes map each slot type to the number of cards its items add to the deck. Builds are
+    combined slot by slot, keeping only the Pareto optimal partial builds for each remaining token budget and trait
+    count.
+    """
+
+    def __init__(self, slot_tables, num_objectives, slot_sizes):
+        self.slot_tables = slot_tables
+        self.num_objectives = num_objectives
+        self.slot_sizes = slot_sizes
+        self.optimal = {}
+
+        # time.monotonic() after which find gives up, if any
+        self.deadline = None
+
+    @staticmethod
+    def prune(items, scores, deadline=None):
+        frontier = pareto(scores, deadline)
+        return [items[i] for i in frontier], scores[frontier]
+
+    # Pareto optimal (scores, builds) of the slots from index on, for each trait count, using up exactly the budget
+    def suffix(self, memo, slot_types, token_slots, index, major, minor):
+        key = index, major, minor
+        if key in memo:
+            return memo[key]
+
+        if index == len(slot_types):
+            result = {0: ([()], np.zeros((1, self.num_objectives)))} if major == minor == 0 else {}
+            memo[key] = result
+            return result
+
+        combined = {}
+        slot_table = self.slot_tables[slot_types[index]]
+        for item_major, item_minor, new_major, new_minor in CharacterFinder.token_options(token_slots[index]):
+            if new_major > major or new_minor > minor:
+                continue
+            rest = self.suffix(memo, slot_types, token_slots, index + 1, major - new_major, minor - new_minor)
+            for trait_count in range(4):
+                if (item_major, item_minor, trait_count) not in slot_table:
+                    continue
+                items, scores = slot_table[item_major, item_minor, trait_count]
+
+                # Minkowski sum of this slot's items and the builds of the remaining slots
+                for rest_traits, (builds, rest_scores) in rest.items():
+                    sums = (scores[:, None, :] + rest_scores[None, :, :]).reshape(-1, self.num_objectives)
+                    builds = [(item,) + build for item in items for build in builds]
+                    combined.setdefault(trait_count + rest_traits, []).append((builds, sums))
+
+        result = {}
+        for num_traits, parts in combined.items():
+            builds = [build for part_builds, _ in parts for build in part_builds]
+            result[num_traits] = FrontierFinder.prune(builds, np.vstack([sums for _, sums in parts]), self.deadline)
+        memo[key] = result
+        return result
+
+    def find(self, archetype, slot_types=None, budget=None):
+        """
+        Find the Pareto optimal builds. If budget is given, raise TimeoutError if the search takes more than that many
+        seconds (a partial frontier could hold builds that the rest of the search would beat).
+        """
+
+        if slot_types is None:
+            slot_types = archetype.slot_types
+        if budget is not None:
+            self.deadline = time.monotonic() + budget
+
+        deck_size = CharacterFinder.deck_size(slot_types, self.slot_sizes)
+        token_slots = CharacterFinder.token_slots(slot_types)
+
+        # Compare builds by average card weight, which depends on their trait count
+        memo = {}
+        builds = []
+        averages = []
+        for major, minor in CharacterFinder.token_budgets(token_slots):
+            for num_traits, (part_builds, sums) in self.suffix(memo, slot_types, token_slots, 0, major, minor).items():
+                if deck_size - num_traits <= 0:
+                    continue
+                builds.extend([sums[i] / (deck_size - num_traits), num_traits, list(build)] for i, build in enumerate(part_builds))
+                averages.append(sums / (deck_size - num_traits))
+
+        if not builds:
+            self.optimal[archetype] = []
+            return
+
+        frontier = pareto(np.vstack(averages), self.deadline)
+        self.optimal[archetype] = sorted((builds[i] for i in frontier), key=lambda x: tuple(-x[0]))
@@ -0,0 +1,81 @@
+# Batch job that precomputes optimal builds for every archetype, level bracket and auto-generated card pack
+
+import asyncio
+import multiprocessing
+import time
+
+import gamedata
+from . import manager
+
+
+# Game data and party manager of each worker process
+_game = None
+_party = None
+
+
+def _init_worker():
+    global _game, _party
+    _game = gamedata.load()
+    _party = manager.load(_game)
+    _party.use_precomputed_builds = False
+
+
+def jobs(game, party):
+    """
+    List (archetype name, level, card pack name) for every distinct optimize query over the auto-generated card packs.
+
+    Levels with the same slots and item brackets share a query, so only the lowest of them is listed.
+    """
+
+    keys = set()
+    result = []
+    for archetype in game.archetypes:
+        for level in range(1, gamedata.MAX_LEVEL + 1):
+            for name in manager.AUTO_PACKS:
+                key, _ = party.result_key(archetype, party.card_pack_vectors[name], level)
+                if key in keys:
+                    continue
+                keys.add(key)
+                result.append((archetype.name, level, name))
+    return result
+
+
+def _run_job(job):
+    archetype_name, level, name = job
+    archetype = _game.get_archetype(archetype_name)
+    card_weights = _party.card_pack_vectors[name]
+
+    start_time = time.monotonic()
+    key, scale = _party.result_key(archetype, card_weights, level)
+    builds = asyncio.run(_party.optimize(archetype, card_weights, level))
+
+    # Store items by ID to keep the result small to send back
+    builds = [[score, num_traits, [i.id for i in items]] for score, num_traits, items in builds]
+    return job, key, scale, builds, time.monotonic() - start_time
+
+
+def precompute(game, party, processes=None):
+    """
+    Optimize every job in parallel, ignoring any builds precomputed before, and save the results for party.optimize to
+    serve.
+    """
+
+    all_jobs = jobs(game, party)
+    print(f'Precomputing {len(all_jobs)} optimize queries for game data version {game.version}')
+
+    # Slow jobs (archetypes with more slots) go first so that they don't hold up the end
+    all_jobs.sort(key=lambda job: -len(game.get_archetype(job[0]).slot_types_at_level(job[1])))
+
+    start_time = time.monotonic()
+    results = {}
+    with multiprocessing.Pool(processes, initializer=_init_worker) as pool:
+        for i, (job, key, scale, builds, seconds) in enumerate(pool.imap_unordered(_run_job, all_jobs), 1):
+            archetype_name, level, name = job
+            print(f'[{i}/{len(all_jobs)}] {archetype_name} L{level} {name}: {len(builds)} builds in {seconds:.1f}s')
+            results[key] = scale, [
+                [score, num_traits, [game.items_by_id[i] for i in item_ids]]
+                for score, num_traits, item_ids in builds
+            ]
+
+    party.save_precomputed_builds(game, results)
+    print(f'Precomputed {len(results)} queries in {time.monotonic() - start_time:.1f}s')
@@ -0,0 +1,98 @@
+# Exact draw probabilities, by dynamic programming over where the copies of a card are in the deck
+# (same rules as the simulation in party.simulate)
+
+import collections
+import functools
+import math
+
+from . import simulate
+from .simulate import DRAW_COUNT, FIRST_DRAW_COUNT, RETAIN_COUNT, ROUNDS
+
+
+def _hypergeometric(population, successes, draws):
+    """
+    Distribution of the number of successes in draws without replacement, as {count: probability}.
+    """
+
+    total = math.comb(population, draws)
+    low = max(0, draws - (population - successes))
+    high = min(successes, draws)
+    return {k: math.comb(successes, k) * math.comb(population - successes, draws - k) / total for k in range(low, high + 1)}
+
+
+@functools.lru_cache(maxsize=4096)
+def odds(deck_size, copies, rounds=ROUNDS):
+    """
+    Return a (holding, seen) pair of probabilities for each round: the chance to hold at least one of copies in that
+    round, and the chance to have held one by that round.
+
+    The state after each round is the number of copies left in the draw pile, the number retained in hand, and
+    whether any has been held yet. The draw pile and hand sizes are the same in every trial.
+    """
+
+    if deck_size <= FIRST_DRAW_COUNT + RETAIN_COUNT:
+        raise ValueError(f'Deck of {deck_size} cards is too small to calculate odds.')
+
+    states = {(copies, 0, False): 1.0}
+    pile_size = deck_size
+    retained = 0
+    result = []
+    for round_ in range(rounds):
+        draw_count = FIRST_DRAW_COUNT if round_ == 0 else DRAW_COUNT
+
+        # Draw what's left of the pile, then reshuffle everything not in hand for the rest
+        first_count = min(pile_size, draw_count)
+        second_count = draw_count - first_count
+        reshuffled_size = deck_size - retained - first_count
+
+        # The newest cards are retained, starting from the end of the second draw
+        second_kept = min(second_count, RETAIN_COUNT)
+        first_kept = RETAIN_COUNT - second_kept
+
+        next_states = collections.defaultdict(float)
+        holding = 0.0
+        for (pile_copies, retained_copies, seen), p in states.items():
+            for first_copies, p_first in _hypergeometric(pile_size, pile_copies, first_count).items():
+                if second_count:
+                    left_copies = copies - retained_copies - first_copies
+                    second_draws = _hypergeometric(reshuffled_size, left_copies, second_count)
+                else:
+                    left_copies = pile_copies - first_copies
+                    second_draws = {0: 1.0}
+
+                for second_copies, p_second in second_draws.items():
+                    q = p * p_first * p_second
+                    held = retained_copies + first_copies + second_copies > 0
+                    if held:
+                        holding += q
+
+                    for kept_second, p_kept_second in _hypergeometric(second_count, second_copies, second_kept).items():
+                        for kept_first, p_kept_first in _hypergeometric(first_count, first_copies, first_kept).items():
+                            state = (left_copies - second_copies, kept_first + kept_second, seen or held)
+                            next_states[state] += q * p_kept_second * p_kept_first
+
+        states = next_states
+        pile_size = reshuffled_size - second_count if second_count else pile_size - first_count
+        retained = RETAIN_COUNT
+
+        seen = sum(p for (_, _, seen), p in states.items() if seen)
+        result.append((holding, seen))
+
+    return tuple(result)
+
+
+def card_odds(character, card, rounds=ROUNDS):
+    # The racial move card is handed out every round
+    if card.name == character.archetype.default_move:
+        return ((1.0, 1.0),) * rounds
+
+    cards = simulate.deck(character)
+    return odds(len(cards), sum(c == card for c in cards), rounds)
+
+
+def card_pack_odds(character, card_pack, rounds=ROUNDS):
+    if card_pack.get(character.archetype.default_move):
+        return ((1.0, 1.0),) * rounds
+
+    cards = simulate.deck(character)
+    return odds(len(cards), sum(bool(card_pack.get(c.name)) for c in cards), rounds)
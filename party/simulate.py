@@ -0,0 +1,89 @@
+# Monte Carlo simulation of a character's draws, many trials at a time
+
+import math
+
+import numpy as np
+
+
+TRIALS = 100_000
+ROUNDS = 5
+
+# Cards drawn from the deck each round, on top of the racial move card
+FIRST_DRAW_COUNT = 3
+DRAW_COUNT = 2
+
+# Cards kept in hand at the end of each round (the most recently drawn)
+RETAIN_COUNT = 2
+
+# z-score of a 95% confidence interval
+Z_95 = 1.96
+
+
+def deck(character):
+    return [card for item in character.items for card in item.cards]
+
+
+# New draw orders made of every card in the deck except those in hand
+def _reshuffle(hand, deck_size, rng):
+    keys = rng.random((len(hand), deck_size))
+    np.put_along_axis(keys, hand, np.inf, axis=1)
+    return keys.argsort(axis=1)[:, :deck_size - hand.shape[1]]
+
+
+def simulate(cards, card, rounds=ROUNDS, trials=TRIALS, rng=None):
+    """
+    Simulate drawing from a deck of cards, and return a (trials x rounds) boolean array of whether card is in hand
+    during each round.
+
+    The draw pile is reshuffled from the discard pile as soon as it runs out. Every card is drawn and discarded like
+    any other: traits don't stay in play, and attachments, mandatory cards and retention modifiers aren't modeled.
+    """
+
+    deck_size = len(cards)
+    if deck_size <= FIRST_DRAW_COUNT + RETAIN_COUNT:
+        raise ValueError(f'Deck of {deck_size} cards is too small to simulate.')
+
+    if rng is None:
+        rng = np.random.default_rng()
+
+    # Physical cards are indices into the deck
+    is_card = np.array([c == card for c in cards])
+
+    order = rng.random((trials, deck_size)).argsort(axis=1)
+    position = 0
+    hand = np.empty((trials, 0), dtype=np.intp)
+    held = np.empty((trials, rounds), dtype=bool)
+    for round_ in range(rounds):
+        draw_count = FIRST_DRAW_COUNT if round_ == 0 else DRAW_COUNT
+        for _ in range(draw_count):
+            if position == order.shape[1]:
+                order = _reshuffle(hand, deck_size, rng)
+                position = 0
+
+            hand = np.hstack((hand, order[:, position:position + 1]))
+            position += 1
+
+        held[:, round_] = is_card[hand].any(axis=1)
+
+        # Discard all but the newest cards at end of round
+        hand = hand[:, -RETAIN_COUNT:]
+
+    return held
+
+
+def holding_odds(character, card, rounds=ROUNDS, trials=TRIALS, rng=None):
+    """
+    Estimate the probability that character holds card in each round, as a list of (probability, error) pairs where
+    error is the half-width of the 95% confidence interval.
+    """
+
+    # The racial move card is handed out every round
+    if card.name == character.archetype.default_move:
+        return [(1.0, 0.0)] * rounds
+
+    held = simulate(deck(character), card, rounds, trials, rng)
+
+    odds = []
+    for p in held.mean(axis=0):
+        odds.append((float(p), Z_95 * math.sqrt(p * (1 - p) / trials)))
+    return odds
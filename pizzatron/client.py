@@ -90,13 +90,35 @@ class Client(discord.Client):
         return message
 
     async def reply(self, message, text):
+        replies = await self.reply_split(message, text)
+        return replies[0]
+
+    # Reply to a message, and return every message the reply was split into
+    async def reply_split(self, message, text):
         chunks = _chunkify(text)
         async with self._message_locks.setdefault(message.channel.id, asyncio.Lock()):
-            reply = await message.reply(chunks[0])
+            replies = [await message.reply(chunks[0])]
             for chunk in chunks[1:]:
-                await message.channel.send(chunk)
+                replies.append(await message.channel.send(chunk))
+
+        return replies
 
-        return reply
+    # Replace the text of the messages a reply was split into, sending more messages if it no longer fits in them and
+    # deleting the ones it no longer needs, and return the messages it's now split into
+    async def edit(self, messages, text):
+        chunks = _chunkify(text)
+        channel = messages[0].channel
+        async with self._message_locks.setdefault(channel.id, asyncio.Lock()):
+            for message, chunk in zip(messages, chunks):
+                await message.edit(content=chunk)
+            for message in messages[len(chunks):]:
+                await message.delete()
+
+            edited = messages[:len(chunks)]
+            for chunk in chunks[len(messages):]:
+                edited.append(await channel.send(chunk))
+
+        return edited
 
     async def pin(self, message):
         async with self._message_locks.setdefault(message.channel.id, asyncio.Lock()):
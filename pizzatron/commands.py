@@ -6,6 +6,8 @@ from . import parse
 from . import parse_util
 from gamedata import CardType, ItemType
 from party import Party
+from party import probability
+from party import simulate
 
 
 HELP = """\
@@ -15,6 +17,9 @@ help        Display this help.
 info        Display information about a card or item.
 items       List items containing a given card.
 optimize    Calculate an optimal deck from card weights.
+simulate    Estimate the chance to hold a card each round.
+odds        Calculate the exact chance to hold a card or card pack.
+pareto      Find the builds that best trade off several card packs.
 wishlist    Display your Daily Deal wishlist.
 party       Display a party from a `partydiscordcode`.
 ```
@@ -24,11 +29,21 @@ pt raging battler
 pt bless
 pt help optimize
 pt optimize dwarf priest greater heal
+pt optimize elf wizard L8 direct magic damage
 pt wishlist add asmod's telekinetic chain
 ```\
 """
 
 
+# Seconds to search for optimal builds, and between edits showing the best build so far
+OPTIMIZE_TIME_BUDGET = 60
+OPTIMIZE_EDIT_INTERVAL = 2
+
+# Seconds to search for a Pareto frontier, and builds to show from it
+PARETO_TIME_BUDGET = 60
+PARETO_DISPLAY_COUNT = 10
+
+
 ##################
 # ADMIN COMMANDS #
 ##################
@@ -417,58 +432,29 @@ async def cmd_party_remove(ctx, msg, parser):
 
 async def cmd_simulate(ctx, msg, parser):
     card = parser.card()
-    level, archetype, items = parser.character()
-    cards = [c for i in items for c in i.cards]
-    racial_move = archetype.default_move
-
-    draw_deck = cards
-    random.shuffle(draw_deck)
-    discard_deck = []
-    attachments = []
-    hand = []
-    for round_ in range(1, 4):
-        # Draw cards at start of round
-        # TODO: Unholy energy / etc.?
-        draws = [racial_move]
-        draw_count = 3 if round_ == 1 else 2
-        for _ in range(draw_count):
-            if not draw_deck:
-                draw_deck = discard_deck
-                random.shuffle(draw_deck)
-                discard_deck = []
-
-            draws.append(draw_deck[0])
-            del draw_deck[0]
-        hand.extend(draws)
-        print(round_, hand)
-
-        # Play cards during round
-        # TODO: Attachments, duration; mandatory cards
-        # TODO: Inspiration / etc.?
-        # TODO: Trait: card.is_trait()
-        # TODO: Mandatory: card.is_mandatory()
-        
-        # Discard cards at end of round
-        # TODO: Discard low quality cards?
-        # TODO: Forward Thinking: card.retain_count_modifier() == 1
-        # TODO: Vow of Poverty: card.retain_card_name_filter() == 'Empty'
-        # TODO: Free card: card.end_round_count() == 0
-        hand_size = sum(not card.is_free_card for card in hand)
-        discard_deck.extend(hand[:-2])
-        del hand[:-2]
-    
-    
-    await ctx.reply(msg, f'Card: {card}, deck: {cards}')
+    characters = parser.party(max_chars=2).characters
+
+    # Columns of (probability, error) per round, one per character
+    columns = []
+    for character in characters:
+        try:
+            columns.append(simulate.holding_odds(character, card))
+        except ValueError as e:
+            raise parse.ParseError(str(e))
 
+    lines = []
+    for round_, odds in enumerate(zip(*columns), 1):
+        cells = '   '.join(f'{p:7.2%} ± {error:.2%}' for p, error in odds)
+        lines.append(f'Round {round_}   {cells}')
 
-async def cmd_optimize(ctx, msg, parser):
-    if not parser.args:
-        # TODO: Give example
-        raise parse.ParseError('Please specify a character archetype and card weights to optimize for.')
+    header = f'Chance to hold **{card.name}** ({simulate.TRIALS:,} trials, 95% confidence):'
+    if len(characters) > 1:
+        header += '\n' + '\n'.join(f'{i}. {ctx.display.archetype_long(character.archetype)} (level {character.level})' for i, character in enumerate(characters, 1))
+    await ctx.reply(msg, header + '\n```\n' + '\n'.join(lines) + '\n```')
 
-    archetype = parser.archetype()
 
-    card_pack_matcher = parse_util.Matcher(
+def build_card_pack_matcher(ctx):
+    return parse_util.Matcher(
         ctx.party.card_packs,
 
         allow_typo=True,
@@ -481,16 +467,62 @@ async def cmd_optimize(ctx, msg, parser):
         prefix_allow_typo=True,
         prefix_typo_cutoff=0.95,
     )
-    card_pack_combo = {}
+
+
+async def cmd_odds(ctx, msg, parser):
+    if not parser.args:
+        raise parse.ParseError('Please specify a card or card pack and a character code.')
+
+    index, key = build_card_pack_matcher(ctx).longest_match(parser.args)
+    if index is not None:
+        name = key
+        card_pack = ctx.party.card_packs[key]
+        del parser.args[:index]
+        del parser.raw_args[:index]
+    else:
+        card = parser.card()
+        name = card.name
+        card_pack = {card.name: 1}
+    characters = parser.party(max_chars=2).characters
+
+    # Columns of (holding, seen) per round, one per character
+    columns = []
+    for character in characters:
+        try:
+            columns.append(probability.card_pack_odds(character, card_pack))
+        except ValueError as e:
+            raise parse.ParseError(str(e))
+
+    lines = []
+    for round_, odds in enumerate(zip(*columns), 1):
+        cells = '   '.join(f'{holding:7.2%} {seen:7.2%}' for holding, seen in odds)
+        lines.append(f'Round {round_}   {cells}')
+
+    header = f'Chance to hold **{name}** in each round, and to have held it by then:'
+    if len(characters) > 1:
+        header += '\n' + '\n'.join(f'{i}. {ctx.display.archetype_long(character.archetype)} (level {character.level})' for i, character in enumerate(characters, 1))
+    await ctx.reply(msg, header + '\n```\n' + '\n'.join(lines) + '\n```')
+
+
+async def cmd_optimize(ctx, msg, parser):
+    if not parser.args:
+        # TODO: Give example
+        raise parse.ParseError('Please specify a character archetype and card weights to optimize for.')
+
+    archetype = parser.archetype()
+    level = parser.level()
+
+    card_pack_matcher = build_card_pack_matcher(ctx)
+    card_pack_combo = None
     while parser.args:
         index, key = card_pack_matcher.longest_match(parser.args)
         if index is not None:
-            card_pack = ctx.party.card_packs[key]
+            card_pack = ctx.party.card_pack_vectors[key]
             del parser.args[:index]
             del parser.raw_args[:index]
         else:
             card = parser.card()
-            card_pack = {card.name: 1}
+            card_pack = ctx.party.card_vector(card)
 
         weight = 1
         if parser.raw_args:
@@ -500,21 +532,92 @@ async def cmd_optimize(ctx, msg, parser):
                 del parser.raw_args[0]
             except ValueError:
                 pass
-        for card, value in card_pack.items():
-            card_pack_combo.setdefault(card, 0)
-            card_pack_combo[card] += value * weight
+        if card_pack_combo is None:
+            card_pack_combo = weight * card_pack
+        else:
+            card_pack_combo += weight * card_pack
 
-    if not card_pack_combo:
+    if card_pack_combo is None or not card_pack_combo.any():
         raise parse.ParseError('Please specify card weights to optimize for.')
 
-    optimal = await ctx.party.optimize(archetype, card_pack_combo)
-    score, num_traits, items = optimal[0]
+    def build_text(optimal, note=''):
+        score, num_traits, items = optimal[0]
+        deck_size = sum(len(i.cards) for i in items)
+
+        stats = f'**Total value:** {score}\n**Number of traits:** {num_traits}\n**Average value:** {score / (deck_size - num_traits)}'
+        items = ctx.display.items_long(items)
+
+        # TODO: Could create Character from items and display a party code
+        return f'{stats}{note}\n\n{items}'
+
+    # Show the best build so far while the search runs, without editing too often (replies holds every message the
+    # build is split into, so none is left behind when it changes)
+    replies = None
+    last_edit_time = 0
+    async def on_improve(optimal):
+        nonlocal replies, last_edit_time
+        if time.monotonic() - last_edit_time < OPTIMIZE_EDIT_INTERVAL:
+            return
+
+        text = build_text(optimal, '\n*(Still searching...)*')
+        if replies is None:
+            replies = await ctx.reply_split(msg, text)
+        else:
+            replies = await ctx.edit(replies, text)
+        last_edit_time = time.monotonic()
+
+    optimal, gap = await ctx.party.optimize_anytime(archetype, card_pack_combo, level, on_improve, OPTIMIZE_TIME_BUDGET)
+    if not optimal:
+        text = f'No valid build found for {ctx.display.archetype_long(archetype)}.'
+    elif gap:
+        text = build_text(optimal, f'\n*(Stopped searching after {OPTIMIZE_TIME_BUDGET} seconds, at most {gap:.3g} below the best average value)*')
+    else:
+        text = build_text(optimal)
+
+    if replies is None:
+        await ctx.reply(msg, text)
+    else:
+        await ctx.edit(replies, text)
+
+
+async def cmd_pareto(ctx, msg, parser):
+    if not parser.args:
+        raise parse.ParseError('Please specify a character archetype and card packs to trade off.')
+
+    archetype = parser.archetype()
+    level = parser.level()
+
+    card_pack_matcher = build_card_pack_matcher(ctx)
+    pack_names = []
+    while parser.args:
+        index, key = card_pack_matcher.longest_match(parser.args)
+        if index is None:
+            raise parse.ParseError(f'Unknown card pack "{" ".join(parser.raw_args)}".')
+        pack_names.append(key)
+        del parser.args[:index]
+        del parser.raw_args[:index]
+
+    if len(pack_names) < 2:
+        raise parse.ParseError('Please specify at least two card packs to trade off.')
+
+    try:
+        frontier = await ctx.party.pareto(archetype, pack_names, level, PARETO_TIME_BUDGET)
+    except TimeoutError:
+        await ctx.reply(msg, f'Stopped searching after {PARETO_TIME_BUDGET} seconds. Please try fewer card packs or a lower level.')
+        return
+
+    if not frontier:
+        await ctx.reply(msg, f'No valid build found for {ctx.display.archetype_long(archetype)}.')
+        return
 
-    stats = f'**Total value:** {score}\n**Number of traits:** {num_traits}\n**Average value:** {score / (36 - num_traits)}'
-    items = ctx.display.items_long(items)
+    lines = [f'**Average value** ({" / ".join(pack_names)}) of the {len(frontier)} builds that no other build beats in every card pack:']
+    for averages, num_traits, items in frontier[:PARETO_DISPLAY_COUNT]:
+        values = ' / '.join(f'{x:.2f}' for x in averages)
+        lines.append(f'**{values}:** ' + ', '.join(ctx.display.item_short(i) for i in items))
+    if len(frontier) > PARETO_DISPLAY_COUNT:
+        lines.append(f'*({len(frontier) - PARETO_DISPLAY_COUNT} more builds not shown)*')
 
-    # TODO: Could create Character from items and display a party code
-    await ctx.reply(msg, f'{stats}\n\n{items}')
+    await ctx.reply(msg, '\n'.join(lines))
 
 
 #######################
@@ -980,9 +1083,11 @@ COMMAND_MAP = {
     'remove party': cmd_party_remove,
 
     'simulate': cmd_simulate,
+    'odds': cmd_odds,
 
     'optimize': cmd_optimize,
     'optimise': cmd_optimize,
+    'pareto': cmd_pareto,
 
     # Daily deal commands
     'daily deal wishlist': cmd_daily_deal_list,
@@ -1,12 +1,14 @@
 import re
 
 from . import parse_util
+import gamedata
 import party
 
 
 NAME = 'pizzatron'
 MENTION = '@' + NAME
 TRIGGER = re.compile(r'^\W?[Pp][Tt]([^-\w].*)?$', flags=re.DOTALL)
+LEVEL = re.compile(r'(?:l|lvl|level) ?(\d+)')
 
 ITEM_ALIAS_MAP = {
     'bjss': 'bejeweled shortsword',
@@ -326,6 +328,24 @@ class Parser:
 
         return match
 
+    def level(self, default=None):
+        # Optional, e.g. "L12", "lvl 12" or "level 12"
+        for count in (1, 2):
+            match = LEVEL.fullmatch(' '.join(self.args[:count]))
+            if match is not None:
+                break
+        else:
+            return default
+
+        level = int(match.group(1))
+        if not 1 <= level <= gamedata.MAX_LEVEL:
+            raise ParseError(f'Invalid level "{level}" (must be between 1 and {gamedata.MAX_LEVEL}).')
+
+        del self.args[:count]
+        del self.raw_args[:count]
+
+        return level
+
     def any(self):
         if not self.args:
             raise ParseError('Please specify something.')
@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+
+import argparse
+
+import gamedata
+import party
+from party import precompute
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute optimal builds for every archetype, level bracket and auto-generated card pack.')
+    parser.add_argument('-j', '--processes', type=int, default=None, help='number of worker processes (default: one per core)')
+    args = parser.parse_args()
+
+    game = gamedata.load()
+    precompute.precompute(game, party.load(game), args.processes)
+
+
+if __name__ == '__main__':
+    main()
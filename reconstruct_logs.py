@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+
+import argparse
+import sys
+
+from battle_parse import batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reconstruct the battle events of many verbose logs in parallel.')
+    parser.add_argument('paths', nargs='+', help='log files, directories of logs, or glob patterns')
+    parser.add_argument('-o', '--output', default='events', help='directory to write battle events to (default: events)')
+    parser.add_argument('-j', '--processes', type=int, default=None, help='number of worker processes (default: one per core)')
+    args = parser.parse_args()
+
+    failed = batch.run(batch.find_logs(args.paths, exclude=[args.output]), args.output, args.processes)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+# Game data and logs for the tests, which run without the downloaded game data cache
+
+import json
+import os.path
+import random
+import shutil
+
+import pytest
+
+import gamedata
+from battle_parse import reconstruct
+from party import manager
+
+
+EXAMPLE_LOGS_DIRPATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'battle_parse', 'info', 'example_logs')
+
+# Example logs of battles the user played (spectated battles are left out, since their objects aren't loaded yet)
+EXAMPLE_LOGS = ('log1', 'log2', 'log3', 'log4')
+
+# Slots of every archetype (as many as any group of the example logs holds items)
+SLOT_TYPES = ('Any',) * 16
+
+# Copies of each card in an item
+COPIES = 3
+
+
+def _card_type(id, name, types=(), attack_type=None, damage=None, max_range=None, move_points=None, params=None):
+    card = gamedata.CardType.__new__(gamedata.CardType)
+    card.id = id
+    card.name = name
+    card.short_name = ''
+    card.types = types
+    card.attack_type = attack_type
+    card.damage = damage
+    card.max_range = max_range
+    card.move_points = move_points
+    card.params = params if params is not None else {}
+    card.components = {}
+    return card
+
+
+# Game data made up from the logs: each card named in a log is a card type, and each item cards came from holds COPIES
+# of every card seen coming from it
+class FakeGame(gamedata.Manager):
+    def __init__(self, item_cards, version='test'):
+        super().__init__()
+        self.version = version
+        self.is_loaded = True
+
+        for item_name, card_names in sorted(item_cards.items()):
+            cards = [self.get_card(card_name) for card_name in sorted(card_names) for _ in range(COPIES)]
+            item = gamedata.ItemType(
+                len(self.items), item_name, '', 'Common', 1, 1, 0, 0, cards, 'Any', 'Any', '', (), 0, None, None,
+            )
+            self.items.append(item)
+            self.items_by_id[item.id] = item
+            self.items_by_name[gamedata.manager._normalize(item_name)] = item
+
+    def get_card(self, name):
+        key = gamedata.manager._normalize(name)
+        if key not in self.cards_by_name:
+            card = _card_type(len(self.cards), name)
+            self.cards.append(card)
+            self.cards_by_id[card.id] = card
+            self.cards_by_name[key] = card
+        return self.cards_by_name[key]
+
+    def get_archetype(self, name):
+        key = gamedata.manager._normalize(name)
+        if key not in self.archetypes_by_name:
+            self.archetypes_by_name[key] = gamedata.CharacterArchetype(
+                name, 'Player', '?', '?', '', None, None, (), SLOT_TYPES, (None,) * len(SLOT_TYPES),
+            )
+        return self.archetypes_by_name[key]
+
+
+# Item name => names of the cards seen coming from it in the example logs
+def _item_cards():
+    item_cards = {}
+    for log_name in EXAMPLE_LOGS:
+        with open(os.path.join(EXAMPLE_LOGS_DIRPATH, log_name), 'rb') as f:
+            joinbattle, extensions, _ = reconstruct.parse_battle_stream(f)
+
+        for obj in joinbattle['objects']:
+            if obj.get('_class_', '').endswith('CardInstance') and 'owner' in obj:
+                item_cards.setdefault(obj['origin'], set()).add(obj['type'])
+
+        for ex in extensions:
+            for peeks_name in ('DP', 'HP'):
+                for peek in ex.get(peeks_name, {}).get('peeks', ()):
+                    if peek.get('cownerp', -1) != -1:
+                        item_cards.setdefault(peek['origin'], set()).add(peek['type'])
+
+    return item_cards
+
+
+@pytest.fixture(scope='session')
+def item_cards():
+    return _item_cards()
+
+
+@pytest.fixture
+def game(item_cards):
+    return FakeGame(item_cards)
+
+
+# Copies of the example logs, so indexing them writes next to the copies
+@pytest.fixture
+def logs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for log_name in EXAMPLE_LOGS:
+        shutil.copy(os.path.join(EXAMPLE_LOGS_DIRPATH, log_name), tmp_path / log_name)
+    return {log_name: str(tmp_path / log_name) for log_name in EXAMPLE_LOGS}
+
+
+# Slots of the party game's archetype, the level its last slot opens at, and the card packs in its card_packs.json
+PARTY_SLOT_TYPES = ('Weapon', 'Helmet', 'Boots')
+PARTY_BOOTS_LEVEL = 5
+PARTY_CARD_PACKS = {
+    'healing': {'Heal': 2, 'Mend': 1},
+    'mixed': {'Chop': 1, 'Junk': -1, 'Heal': 0.5},
+}
+
+
+# Game data for the party optimizer: a few cards, and items of every slot at a few levels and token costs, with some
+# items holding the same cards as others
+class PartyGame(gamedata.Manager):
+    def __init__(self, version='party-test', seed=0):
+        super().__init__()
+        self.version = version
+        self.is_loaded = True
+
+        for args in (
+            ('Chop', ('Attack',), 'Melee', 3, 1, None),
+            ('Zap', ('Attack',), 'Magic', 2, 5, None),
+            ('Walk', ('Move',), None, None, None, 2),
+            ('Heal', (), None, None, None, None),
+            ('Mend', (), None, None, None, None),
+            ('Junk', (), None, None, None, None),
+        ):
+            self._add_card(_card_type(len(self.cards), *args))
+        self._add_card(_card_type(len(self.cards), 'Tough Hide', ('Armor',), params={'trait': 1}))
+
+        rng = random.Random(seed)
+        names = [card.name for card in self.cards]
+        for slot_type in PARTY_SLOT_TYPES:
+            is_main = slot_type == 'Weapon'
+            token_costs = ((2, 2), (2, 1), (1, 1), (1, 0), (0, 0)) if is_main else ((2, -1), (1, -1), (0, -1))
+            for token_cost in token_costs:
+                for level, intro_level in ((1, None), (1, 8), (4, None), (12, None)):
+                    cards = rng.choices(names, k=6 if is_main else 3)
+                    self._add_item(slot_type, token_cost, level, intro_level, cards)
+                    if level == 1 and intro_level is None:
+                        self._add_item(slot_type, token_cost, level, intro_level, list(reversed(cards)))
+
+        self.archetypes.append(gamedata.CharacterArchetype(
+            'Test Warrior', 'Player', 'Warrior', 'Dwarf', '', 'Walk', None, (), PARTY_SLOT_TYPES,
+            (None, None, PARTY_BOOTS_LEVEL),
+        ))
+        self.archetypes_by_name['test warrior'] = self.archetypes[0]
+        self.slot_types = set(PARTY_SLOT_TYPES)
+
+    def _add_card(self, card):
+        self.cards.append(card)
+        self.cards_by_id[card.id] = card
+        self.cards_by_name[gamedata.manager._normalize(card.name)] = card
+
+    def _add_item(self, slot_type, token_cost, level, intro_level, card_names):
+        name = f'{slot_type} {len(self.items)}'
+        cards = [self.cards_by_name[gamedata.manager._normalize(card_name)] for card_name in card_names]
+        item = gamedata.ItemType(
+            len(self.items), name, '', 'Common', level, intro_level, 0, token_cost, cards, slot_type, slot_type, '', (),
+            0, None, None,
+        )
+        self.items.append(item)
+        self.items_by_id[item.id] = item
+        self.items_by_name[gamedata.manager._normalize(name)] = item
+
+
+@pytest.fixture
+def party_game():
+    return PartyGame()
+
+
+# Party manager of the party game, with its caches in a temporary directory
+@pytest.fixture
+def party(party_game, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(manager.BASE_DIRPATH)
+    with open(manager.CARD_PACKS_FILEPATH, 'w') as f:
+        json.dump(PARTY_CARD_PACKS, f)
+    return manager.load(party_game)
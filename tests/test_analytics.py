@@ -0,0 +1,78 @@
+import shutil
+
+from battle_parse import analytics
+from battle_parse import event
+from battle_parse import reconstruct
+
+
+def _battle(game, log_path):
+    with open(log_path, 'rb') as f:
+        joinbattle, _, _ = reconstruct.parse_battle_stream(f)
+    return reconstruct.load_battle_objects(game, joinbattle['objects'])
+
+
+def test_damage_is_about_card_played_or_trait_triggered(game, logs):
+    battle = _battle(game, logs['log1'])
+    actor_name = battle.players[0].groups[0].actors[0].name
+    player_name = battle.players[0].name
+    ouch, fiery_stab, armor = game.get_card('Ouch!'), game.get_card('Fiery Stab'), game.get_card('Mail')
+
+    events = [
+        event.MsgCardPlay(actor_name, ouch, []),
+        event.MsgTriggerTrait(actor_name, armor, '', True, 'PreDamage'),
+        event.MsgDamage(actor_name, 1),
+        event.MsgPlayerTurn(player_name),
+        event.MsgDamage(actor_name, 2),
+        event.MsgTriggerTrait(actor_name, fiery_stab, '', True, 'StartTurn'),
+        event.MsgDamage(actor_name, 3),
+        event.MsgStartRound(2),
+        event.MsgDamage(actor_name, 4),
+    ]
+
+    data = analytics.Analytics()
+    data.add_battle(battle, events)
+
+    table = data.table(event.MsgDamage)
+    assert list(table.cards) == [ouch.id, analytics.NO_CARD, fiery_stab.id, analytics.NO_CARD]
+    assert list(table.column('hp')) == [1, 2, 3, 4]
+    assert data.average_damage(ouch.id) == 1
+    assert set(table.players) == {player_name}
+
+
+def test_add_log_once(game, logs):
+    data = analytics.Analytics()
+    assert data.add_log(game, logs['log1']) == 1
+    assert data.add_log(game, logs['log1']) == 0
+    assert sum(data.play_counts().values()) == len(data.rows(event.MsgCardPlay)) > 0
+
+
+def test_add_rewritten_log(game, logs):
+    data = analytics.Analytics()
+    assert data.add_log(game, logs['log1']) == 1
+
+    # The game rewrites its log at the same path every session
+    shutil.copy(logs['log2'], logs['log1'])
+    assert data.add_log(game, logs['log1']) == 1
+    assert len(data.sources) == 2
+
+
+def test_add_log_replaces_battle_in_progress(game, logs):
+    with open(logs['log1'], 'rb') as f:
+        raw = f.read()
+    expected = analytics.Analytics()
+    expected.add_log(game, logs['log1'])
+
+    # Add the log as it was two thirds of the way through the battle, then once it's over
+    with open(logs['log1'], 'wb') as f:
+        f.write(raw[:raw.index(b'\n', len(raw) * 2 // 3) + 1])
+    data = analytics.Analytics()
+    assert data.add_log(game, logs['log1']) == 1
+    assert data.play_counts() != expected.play_counts()
+
+    with open(logs['log1'], 'wb') as f:
+        f.write(raw)
+    assert data.add_log(game, logs['log1']) == 1
+    assert len(data.sources) == 1
+    assert data.play_counts() == expected.play_counts()
+    assert data.battles[0] is None
+    assert data.rows(event.MsgCardPlay, scenario=data.battles[1][0]) == list(expected.rows(event.MsgCardPlay))
@@ -0,0 +1,30 @@
+import os
+import shutil
+
+from battle_parse import batch
+from battle_parse import index
+
+from conftest import EXAMPLE_LOGS_DIRPATH
+
+
+def test_find_logs(tmp_path):
+    logs_dirpath = tmp_path / 'logs'
+    output_dirpath = logs_dirpath / 'events'
+    os.makedirs(logs_dirpath / 'old')
+    os.makedirs(output_dirpath)
+
+    shutil.copy(os.path.join(EXAMPLE_LOGS_DIRPATH, 'log1'), logs_dirpath / 'log1')
+    shutil.copy(os.path.join(EXAMPLE_LOGS_DIRPATH, 'log2'), logs_dirpath / 'old' / 'log2')
+    index.load(str(logs_dirpath / 'log1'))
+
+    # Neither other files nor anything in the output directory (even a log) are taken for logs
+    shutil.copy(os.path.join(EXAMPLE_LOGS_DIRPATH, 'battlelog1'), logs_dirpath / 'battlelog1')
+    (logs_dirpath / 'notes.txt').write_text('Not a log\n')
+    (logs_dirpath / 'empty').write_bytes(b'')
+    (output_dirpath / 'log1.0.txt').write_text('# Scenario: MP Celestial Lions\n')
+    shutil.copy(os.path.join(EXAMPLE_LOGS_DIRPATH, 'log3'), output_dirpath / 'log3')
+
+    expected = [str(logs_dirpath / 'log1'), str(logs_dirpath / 'old' / 'log2')]
+    assert batch.find_logs([str(logs_dirpath)], exclude=[str(output_dirpath)]) == expected
+    assert batch.find_logs([str(logs_dirpath / '**' / '*')], exclude=[str(output_dirpath)]) == expected
+    assert batch.find_logs([str(logs_dirpath)]) == sorted(expected + [str(output_dirpath / 'log3')])
@@ -0,0 +1,36 @@
+from battle_parse import board
+from battle_parse import model
+
+
+def _open_board(w, h):
+    b = model.Board()
+    b.w, b.h = w, h
+    for y in range(h):
+        for x in range(w):
+            b.square_at[x, y] = b.add_square(model.Square(x, y, terrain='Open'))
+    return b
+
+
+def test_distance_maps_are_bounded(monkeypatch):
+    monkeypatch.setattr(board, 'DISTANCE_MAP_CACHE_SIZE', 4)
+    board_map = board.BoardMap(_open_board(5, 1))
+
+    # Blocking each square in turn gives a new map each time, but only the most recent few are kept
+    for i in range(1, 5):
+        distances = board_map.distance_map(0, 0, frozenset([i]))
+        assert list(distances) == list(range(i)) + [board.UNREACHABLE] * (5 - i)
+    board_map.distance_map(0, 0)
+    assert len(board_map._distance_maps) == 4
+    assert board_map.distance(0, 0, 4, 0, frozenset([1])) == board.UNREACHABLE
+    assert board_map.distance(0, 0, 4, 0) == 4
+
+
+def test_board_maps_are_bounded():
+    boards = [_open_board(2, 2) for _ in range(board.BOARD_MAP_CACHE_SIZE + 1)]
+    first = board.board_map(boards[0])
+    assert board.board_map(boards[0]) is first
+
+    for b in boards[1:]:
+        board.board_map(b)
+    assert len(board._board_maps) == board.BOARD_MAP_CACHE_SIZE
+    assert board.board_map(boards[0]) is not first
@@ -0,0 +1,24 @@
+import cache
+
+
+def test_lru_cache_evicts_least_recently_used():
+    lru = cache.LRUCache(2)
+    lru.put('a', 1)
+    lru.put('b', 2)
+    assert lru.get('a') == 1
+
+    # b was used less recently than a
+    lru.put('c', 3)
+    assert 'b' not in lru
+    assert lru.get('a') == 1 and lru.get('c') == 3
+
+    # Putting an existing key refreshes it too
+    lru.put('a', 4)
+    lru.put('d', 5)
+    assert 'c' not in lru
+    assert lru.get('a') == 4 and lru.get('d') == 5
+    assert lru.get('b', 'missing') == 'missing'
+    assert len(lru) == 2
+
+    lru.clear()
+    assert len(lru) == 0
@@ -0,0 +1,52 @@
+import pytest
+
+from battle_parse import deck
+from battle_parse import reconstruct
+
+from conftest import EXAMPLE_LOGS
+
+
+def _track(game, log_path):
+    with open(log_path, 'rb') as f:
+        joinbattle, extensions, messages = reconstruct.parse_battle_stream(f)
+
+    battle = reconstruct.load_battle_objects(game, joinbattle['objects'])
+    ex_events = reconstruct.extension_events(battle, extensions)
+    msg_events = reconstruct.message_events(battle, messages)
+
+    tracker = deck.DeckTracker(battle)
+    for e in ex_events:
+        battle.update(e)
+        tracker.update(e)
+    for m in msg_events:
+        tracker.update(m)
+
+    return tracker
+
+
+@pytest.mark.parametrize('log_name', EXAMPLE_LOGS)
+def test_track_log(game, logs, item_cards, log_name):
+    tracker = _track(game, logs[log_name])
+    assert tracker.decks
+
+    # Only cards from items are counted (the move cards drawn every round were created during the battle)
+    item_card_ids = {game.get_card(name).id for names in item_cards.values() for name in names}
+    for group_deck in tracker.decks.values():
+        assert group_deck.draw_size >= 0
+        assert set(group_deck.known_hand) <= item_card_ids
+        assert set(group_deck.discarded) <= item_card_ids
+        assert all(0 < p <= 1 for p in group_deck.probabilities().values())
+
+
+def test_created_cards_leave_deck_alone(game, logs):
+    tracker = _track(game, logs['log1'])
+    group_deck = next(iter(tracker.decks.values()))
+    draw_size = group_deck.draw_size
+    known_hand = dict(group_deck.known_hand)
+
+    walk = game.get_card('Walk')
+    assert not group_deck.holds(walk)
+    group_deck.draw(walk)
+    group_deck.discard(walk)
+    assert group_deck.draw_size == draw_size
+    assert dict(group_deck.known_hand) == known_hand
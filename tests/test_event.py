@@ -0,0 +1,61 @@
+import pytest
+
+from battle_parse import index
+from battle_parse import reconstruct
+from battle_parse.event import *
+
+from conftest import EXAMPLE_LOGS
+
+
+def _fields(event):
+    return [getattr(event, field) for field in event.fields]
+
+
+def test_event_str():
+    assert str(MsgEndRound()) == '[End Round]'
+    assert str(MsgStartRound(3)) == '[Start Round] Round 3'
+    assert str(MsgDamage(actor_name='Bob', hp=4)) == '[Damage] Bob took 4 damage'
+    assert str(ExPass(2)) == '2 [Pass]'
+    assert str(ExNoTraits(-1)) == '  [No Traits]'
+
+    # A trigger succeeds when its roll, plus easy to block and minus hard to block, reaches the required roll
+    trigger = ExTriggerTrait(-1, 3, 5, 0, 2, player_index=1, group_index=2)
+    assert trigger.success
+    assert str(trigger) == '  [Trigger Trait] Successfully triggered card attached to group 2 of player 1'
+    trigger = ExTriggerTrait(0, 3, 5, 1, 2, 1, 2)
+    assert not trigger.success
+    assert str(trigger) == '0 [Trigger Trait] Failed to trigger card attached to group 2 of player 1'
+
+
+def test_event_arguments():
+    with pytest.raises(TypeError):
+        MsgStartRound()
+    with pytest.raises(TypeError):
+        MsgStartRound(1, 2)
+    with pytest.raises(TypeError):
+        MsgStartRound(round=1)
+    with pytest.raises(AttributeError):
+        MsgStartRound(1).extra = None
+
+
+@pytest.mark.parametrize('log_name', EXAMPLE_LOGS)
+def test_event_table_round_trip(game, logs, log_name):
+    for indexed_battle in index.load(logs[log_name]):
+        ex_events, msg_events, _ = reconstruct.extract_indexed_battle_streams(game, logs[log_name], indexed_battle)
+        events = ex_events + msg_events
+        table = EventTable(events)
+        assert len(table) == len(events)
+
+        # Every row comes back as the same kind of event, with the same fields and the same description
+        for event, row_event in zip(events, table):
+            assert type(row_event) is type(event)
+            assert _fields(row_event) == _fields(event)
+            assert str(row_event) == str(event)
+
+        for kind in table.kinds:
+            assert table.rows(kind) == [i for i, event in enumerate(events) if type(event) is kind]
+        assert table.rows(build_msg('Unseen')) == []
+
+        # Columns hold None for the rows whose kind doesn't have the field
+        for field in table.columns:
+            assert table.column(field) == [getattr(event, field) if field in event.fields else None for event in events]
@@ -0,0 +1,54 @@
+from battle_parse import model
+from battle_parse import reconstruct
+from battle_parse.event import ExCardPlay
+
+
+def _describe(events):
+    return [(type(e).__name__, str(e)) for e in events]
+
+
+# Append a log to a followed file a chunk at a time (cutting lines in half), polling after each chunk
+def _follow_in_chunks(game, log_path, followed_path, chunk_size):
+    with open(log_path, 'rb') as f:
+        data = f.read()
+
+    follower = reconstruct.BattleFollower(game, followed_path)
+    open(followed_path, 'wb').close()
+    for start in range(0, len(data), chunk_size):
+        with open(followed_path, 'ab') as f:
+            f.write(data[start:start + chunk_size])
+        follower.poll()
+
+    # Flush the last extension, which is only complete once another starts
+    with open(followed_path, 'ab') as f:
+        f.write(b'\nReceived extension response: end\nParameters:\n\n')
+    follower.poll()
+    return follower
+
+
+def test_follow_matches_load(game, logs, tmp_path):
+    with open(logs['log1'], 'rb') as f:
+        events, _ = reconstruct.load_battle_stream(game, f)
+
+    follower = _follow_in_chunks(game, logs['log1'], str(tmp_path / 'followed'), 65537)
+    assert not follower.errors
+    assert _describe(follower.events) == _describe(events)
+
+
+def test_follow_reports_failures_and_keeps_going(game, logs, tmp_path, monkeypatch):
+    update = model.Battle.update
+
+    def failing_update(self, event):
+        if type(event) is ExCardPlay:
+            raise ValueError('Cannot play')
+        update(self, event)
+
+    monkeypatch.setattr(model.Battle, 'update', failing_update)
+    with open(logs['log1'], 'rb') as f:
+        events, _ = reconstruct.extract_battle_events(game, f)
+
+    follower = _follow_in_chunks(game, logs['log1'], str(tmp_path / 'followed'), 65537)
+    num_plays = sum(1 for e in events if type(e) is ExCardPlay)
+    assert num_plays > 0
+    assert len(follower.errors) == num_plays
+    assert _describe(follower.events) == _describe(events)
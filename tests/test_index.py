@@ -0,0 +1,38 @@
+import io
+import os
+
+from battle_parse import index
+from battle_parse import reconstruct
+
+from conftest import EXAMPLE_LOGS
+
+
+def test_index_ranges_hold_battles(logs):
+    for log_name in EXAMPLE_LOGS:
+        battles = index.scan(logs[log_name])
+        assert battles
+        assert battles[0]['start'] < battles[0]['end']
+        assert all(a['end'] == b['start'] for a, b in zip(battles, battles[1:]))
+        assert battles[-1]['end'] == os.path.getsize(logs[log_name])
+        assert all(battle['scenario'] and battle['players'] for battle in battles)
+
+        # The last battle read by range parses to the same joinbattle as the whole log
+        data = index.read(logs[log_name], battles[-1])
+        assert data.startswith(index.JOINBATTLE_MARKER)
+        with open(logs[log_name], 'rb') as f:
+            expected, _, _ = reconstruct.parse_battle_stream(f)
+        joinbattle, _, _ = reconstruct.parse_battle_stream(io.BytesIO(data))
+        assert joinbattle == expected
+
+
+def test_index_is_saved_until_log_changes(logs):
+    filename = logs['log1']
+    battles = index.load(filename)
+    assert os.path.exists(index.index_filepath(filename))
+    assert index.load(filename) == battles
+
+    # A saved index of a log that has since grown is scanned again
+    with open(filename, 'ab') as f:
+        f.write(b'\n')
+    battles[-1]['end'] += 1
+    assert index.load(filename) == battles
@@ -0,0 +1,90 @@
+import pytest
+
+from battle_parse import infer
+from battle_parse import model
+from battle_parse import reconstruct
+from battle_parse.event import ExCardReveal
+
+from conftest import COPIES, EXAMPLE_LOGS, SLOT_TYPES, FakeGame
+
+
+@pytest.fixture
+def sword_frame():
+    game = FakeGame({'Sword': {'Chop'}, 'Shield': {'Block'}})
+    frame = infer.FrameInference(infer.ItemIndex(game), SLOT_TYPES[:3])
+    return game, frame
+
+
+
+def test_item_index_follows_reload():
+    game = FakeGame({'Sword': {'Chop'}}, version='old')
+    old_index = infer.item_index(game)
+    assert infer.item_index(game) is old_index
+
+    # Reloading the game data in place changes its version, and the index is built again from the new items
+    reloaded = FakeGame({'Sword': {'Chop'}, 'Shield': {'Block'}}, version='new')
+    game.__dict__.update(reloaded.__dict__)
+    new_index = infer.item_index(game)
+    assert new_index is not old_index
+    assert [item.name for item in new_index.items(new_index.card_masks[game.get_card('Block').id])] == ['Shield']
+
+def test_same_card_revealed_again_narrows_nothing_more(sword_frame):
+    game, frame = sword_frame
+    chop, sword = game.get_card('Chop'), game.get_item('Sword')
+    card = model.Card()
+    for _ in range(7):
+        assert frame.reveal(chop, sword, card) == 0
+
+    assert frame.item(0) is sword
+    assert not frame.is_known(1) and not frame.is_known(2)
+
+
+def test_more_copies_than_one_item_holds_fill_another_slot(sword_frame):
+    game, frame = sword_frame
+    chop, sword = game.get_card('Chop'), game.get_item('Sword')
+    slot_indices = [frame.reveal(chop, sword, model.Card()) for _ in range(COPIES + 1)]
+
+    assert slot_indices == [0] * COPIES + [1]
+    assert frame.item(1) is sword
+
+
+def test_reveal_without_card_only_places_item(sword_frame):
+    game, frame = sword_frame
+    chop, sword = game.get_card('Chop'), game.get_item('Sword')
+    for _ in range(COPIES + 1):
+        assert frame.reveal(chop, sword) == 0
+    assert not frame.is_known(1)
+
+
+@pytest.mark.parametrize('log_name', EXAMPLE_LOGS)
+def test_reveals_of_log(game, logs, log_name):
+    with open(logs[log_name], 'rb') as f:
+        events, battle = reconstruct.extract_battle_events(game, f)
+
+    # (player index, group index, item name) => distinct battle cards revealed from the group's copies of the item
+    cards_revealed = {}
+
+    inference = infer.ItemInference(battle)
+    for e in events:
+        battle.update(e)
+        inference.update(e)
+
+        if type(e) is ExCardReveal and e.original_player_index not in (None, -1):
+            card = battle.players[e.player_index].groups[e.group_index].hand[e.card_index]
+            key = e.original_player_index, e.original_group_index, e.origin
+            cards_revealed.setdefault(key, {}).setdefault(card.type.id, set()).add(card)
+
+    # Cards are revealed again and again (drawn, peeked at, played, drawn again after a reshuffle), but a group only
+    # holds an item more than once if more distinct cards came from it than one copy holds
+    for (player_index, group_index, item_name), cards in cards_revealed.items():
+        frame = inference.frame(player_index, group_index)
+        item_type = game.get_item(item_name)
+        num_slots = sum(1 for i in range(len(SLOT_TYPES)) if frame.item(i) is item_type)
+        assert num_slots == max(-(-len(same_type) // COPIES) for same_type in cards.values())
+
+    # Every item a card was revealed from is in a slot of its group's frame
+    for e in events:
+        if type(e) is ExCardReveal and e.original_player_index not in (None, -1):
+            frame = inference.frame(e.original_player_index, e.original_group_index)
+            item_type = game.get_item(e.origin)
+            assert any(frame.item(i) is item_type for i in range(len(SLOT_TYPES)))
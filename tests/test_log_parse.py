@@ -0,0 +1,60 @@
+import io
+import os.path
+
+import pytest
+
+import bench_log_parse
+from util import log_parse
+
+from conftest import EXAMPLE_LOGS, EXAMPLE_LOGS_DIRPATH
+
+
+CORPUS_FILEPATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), bench_log_parse.CORPUS_FILEPATH)
+
+
+def _read_lines(filename):
+    with open(filename) as f:
+        return f.read().splitlines()
+
+
+@pytest.fixture(scope='module')
+def corpus_lines():
+    return _read_lines(CORPUS_FILEPATH)
+
+
+@pytest.mark.parametrize('log_name', EXAMPLE_LOGS)
+def test_stream_matches_whole_log(log_name):
+    filename = os.path.join(EXAMPLE_LOGS_DIRPATH, log_name)
+    with open(filename) as f:
+        raw = f.read()
+    expected_extensions, expected_messages = log_parse.parse_battle(raw)
+
+    # Text and binary streams give the same extensions and messages as parsing the whole log at once
+    for stream in (open(filename), open(filename, 'rb'), io.BytesIO(raw.encode())):
+        with stream:
+            parsed = list(log_parse.iter_battle(stream))
+        assert [obj for kind, obj in parsed if kind == log_parse.EXTENSION] == expected_extensions
+        assert [obj for kind, obj in parsed if kind == log_parse.MESSAGE] == expected_messages
+
+
+def test_corpus_is_generated(corpus_lines):
+    assert bench_log_parse.generate_corpus() == corpus_lines
+
+
+# The rewritten parsers against the reference parsers kept in bench_log_parse.py, on the corpus (None) and every
+# example log
+@pytest.mark.parametrize('log_name', (None,) + EXAMPLE_LOGS)
+def test_verbose_lines_match_reference(corpus_lines, log_name):
+    lines = corpus_lines if log_name is None else _read_lines(os.path.join(EXAMPLE_LOGS_DIRPATH, log_name))
+    for line in lines:
+        if line.startswith('\t') and line.strip():
+            assert log_parse.parse_verbose_line(line) == bench_log_parse._reference_parse_verbose_line(line)
+
+
+@pytest.mark.parametrize('log_name', (None,) + EXAMPLE_LOGS)
+def test_battle_log_lines_match_reference(corpus_lines, log_name):
+    if log_name is None:
+        bench_log_parse._check_battle_log_lines(CORPUS_FILEPATH, corpus_lines)
+    else:
+        filename = os.path.join(EXAMPLE_LOGS_DIRPATH, log_name)
+        bench_log_parse._check_battle_log_lines(filename, _read_lines(filename))
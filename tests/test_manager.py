@@ -0,0 +1,130 @@
+import asyncio
+import json
+
+import pytest
+
+from party import manager
+
+from conftest import PARTY_BOOTS_LEVEL, PARTY_CARD_PACKS
+
+
+def _weights(party, card_weights):
+    return sum(party.card_vector(card, weight) for card, weight in card_weights)
+
+
+def _card_weights(party_game, **weights):
+    return [(party_game.cards_by_name[name.lower()], weight) for name, weight in weights.items()]
+
+
+def _optimize(party, archetype, weights, level=None):
+    return asyncio.run(party.optimize(archetype, weights, level))
+
+
+def test_scores_use_exact_weights(party, party_game):
+    archetype = party_game.archetypes[0]
+    card_weights = _card_weights(party_game, Chop=1, Zap=2, Heal=7)
+    weight_of = {card.id: weight for card, weight in card_weights}
+
+    builds = _optimize(party, archetype, _weights(party, card_weights))
+    assert builds
+    for score, num_traits, items in builds:
+        assert score == sum(weight_of.get(card.id, 0) for item in items for card in item)
+
+
+def test_result_cache_hits(party, party_game, monkeypatch):
+    archetype = party_game.archetypes[0]
+    weights = _weights(party, _card_weights(party_game, Chop=1, Zap=2, Heal=3))
+    builds = _optimize(party, archetype, weights)
+
+    def find_items(*args):
+        raise AssertionError('Cached query searched again')
+
+    # The same weights, or the same weights scaled, are served from the cache
+    monkeypatch.setattr(party, '_find_items', find_items)
+    assert _optimize(party, archetype, weights) == builds
+    assert _optimize(party, archetype, 2 * weights) == [[2 * score, n, items] for score, n, items in builds]
+
+
+def test_slot_table_cache_hits(party, party_game):
+    archetype = party_game.archetypes[0]
+    weights = _weights(party, _card_weights(party_game, Chop=1, Zap=2, Heal=3))
+
+    # The level before the boots slot opens has the same item brackets in the other slots, so only boots are new
+    _optimize(party, archetype, weights, PARTY_BOOTS_LEVEL - 1)
+    num_tables = len(party._slot_table_cache)
+    builds = _optimize(party, archetype, weights, PARTY_BOOTS_LEVEL)
+    assert len(party._slot_table_cache) == num_tables + 1
+
+    assert builds == _optimize(manager.load(party_game), archetype, weights, PARTY_BOOTS_LEVEL)
+
+
+def test_reload_invalidates_caches(party, party_game):
+    archetype = party_game.archetypes[0]
+    weights = _weights(party, _card_weights(party_game, Heal=1))
+    (_, _, best_items), *_ = _optimize(party, archetype, weights)
+
+    # Game data changed in place: the best weapon lost its healing
+    weapon = next(item for item in best_items if item.slot_type == 'Weapon')
+    weapon.cards = [party_game.cards_by_name['junk']] * len(weapon.cards)
+    party.reload(party_game)
+    assert len(party._result_cache) == len(party._slot_table_cache) == 0
+
+    for _, _, items in _optimize(party, archetype, weights):
+        assert weapon not in items
+
+
+def test_card_pack_vectors(party, party_game):
+    def vector(pack):
+        return [pack.get(card.name, 0) for card in party_game.cards]
+
+    assert party.card_pack_vectors['healing'].tolist() == vector(PARTY_CARD_PACKS['healing'])
+    assert party.card_pack_vectors['mixed'].tolist() == vector(PARTY_CARD_PACKS['mixed'])
+    assert party.card_pack_vectors['is attack'].tolist() == vector({'Chop': 1, 'Zap': 1})
+    assert party.card_pack_vectors['is trait'].tolist() == vector({'Tough Hide': 1})
+    assert party.card_pack_vectors['direct magic range'].tolist() == vector({'Zap': 5})
+
+    # Packs combine as vectors
+    combo = 2 * party.card_pack_vectors['healing'] - party.card_pack_vectors['mixed']
+    assert combo.tolist() == [2 * h - m for h, m in zip(vector(PARTY_CARD_PACKS['healing']), vector(PARTY_CARD_PACKS['mixed']))]
+
+
+def test_card_pack_weights_that_arent_numbers_are_ignored(party, party_game, capsys):
+    with open(manager.CARD_PACKS_FILEPATH, 'w') as f:
+        json.dump({'broken': {'Heal': None, 'Mend': 'lots', 'Chop': 2}}, f)
+    party.reload(party_game)
+
+    assert party.card_pack_vectors['broken'].tolist() == [2 if card.name == 'Chop' else 0 for card in party_game.cards]
+    assert 'Heal' in capsys.readouterr().out
+
+
+def test_precomputed_builds_only_for_matching_game_data(party, party_game):
+    archetype = party_game.archetypes[0]
+    weights = party.card_pack_vectors['healing']
+    key, scale = party.result_key(archetype, weights)
+    precomputed = [[123.0, 0, [party_game.items[0]]]]
+    party.save_precomputed_builds(party_game, {key: (scale, precomputed)})
+    assert _optimize(party, archetype, weights) == precomputed
+
+    party.reload(party_game)
+    assert _optimize(party, archetype, weights) == precomputed
+
+    # Other traits change which cards count towards the averages
+    with open(manager.CARD_PACKS_FILEPATH, 'w') as f:
+        json.dump({**PARTY_CARD_PACKS, 'is trait': {'Heal': 1}}, f)
+    party.reload(party_game)
+    assert _optimize(party, archetype, weights) != precomputed
+
+    with open(manager.CARD_PACKS_FILEPATH, 'w') as f:
+        json.dump(PARTY_CARD_PACKS, f)
+    party.reload(party_game)
+    assert _optimize(party, archetype, weights) == precomputed
+
+    # Precomputing ignores what was precomputed before
+    fresh = manager.load(party_game)
+    fresh.use_precomputed_builds = False
+    assert _optimize(fresh, archetype, weights) != precomputed
+
+    # So does other game data
+    party_game.version = 'other'
+    party.reload(party_game)
+    assert _optimize(party, archetype, weights) != precomputed
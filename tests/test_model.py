@@ -0,0 +1,56 @@
+import pytest
+
+from battle_parse import reconstruct
+from battle_parse.event import ExCardDiscard, ExCardDraw, ExCardReveal
+
+from conftest import EXAMPLE_LOGS
+
+
+@pytest.mark.parametrize('log_name', EXAMPLE_LOGS)
+def test_load_battle_applies_every_event(game, logs, log_name, capsys):
+    with open(logs[log_name], 'rb') as f:
+        events, battle = reconstruct.load_battle_stream(game, f)
+
+    assert events
+    assert battle.user is not None
+    assert 'Ignored component' not in capsys.readouterr().out
+
+
+def test_draw_moves_card_from_draw_deck_into_hand(game, logs):
+    with open(logs['log1'], 'rb') as f:
+        events, battle = reconstruct.extract_battle_events(game, f)
+
+    draw_index = next(i for i, e in enumerate(events) if type(e) is ExCardDraw)
+    for e in events[:draw_index]:
+        battle.update(e)
+
+    draw = events[draw_index]
+    group = battle.players[draw.player_index].groups[draw.group_index]
+    num_draw_deck = len(group.draw_deck)
+    card = group.draw_deck[-1]
+
+    battle.update(draw)
+    assert len(group.draw_deck) == num_draw_deck - 1
+    assert group.hand[0] is card
+
+    reveal = events[draw_index + 1]
+    assert type(reveal) is ExCardReveal and reveal.card_index == 0
+    battle.update(reveal)
+    assert group.hand[0] is card
+    assert card.type is reveal.card_type
+
+
+def test_discarding_hidden_card_leaves_hand(game, logs):
+    with open(logs['log1'], 'rb') as f:
+        _, battle = reconstruct.load_battle_stream(game, f)
+
+    group = battle.enemy.groups[0]
+    hidden = battle.new_card()
+    group.hand.insert(0, hidden)
+    hand = group.hand[1:]
+    num_discard_deck = len(group.discard_deck)
+
+    battle.update(ExCardDiscard(-1, battle.enemy.index, group.index, 0, None, None))
+    assert group.hand == hand
+    assert len(group.discard_deck) == num_discard_deck + 1
+    assert group.discard_deck[-1] is hidden
@@ -0,0 +1,173 @@
+import asyncio
+import itertools
+import math
+
+import numpy as np
+import pytest
+
+import gamedata
+from party import optimize
+
+from conftest import PARTY_BOOTS_LEVEL, PARTY_SLOT_TYPES
+
+
+def _optimize(party, archetype, weights, level=None):
+    return asyncio.run(party.optimize(archetype, weights, level))
+
+
+# Every build of items available at a level whose token costs fit a token budget, as (items, score vector, num traits)
+def _brute_force_builds(party, party_game, weights, level):
+    slot_types = party_game.archetypes[0].slot_types_at_level(level)
+    token_slots = optimize.CharacterFinder.token_slots(slot_types)
+    budgets = optimize.CharacterFinder.token_budgets(token_slots)
+    traits = party.card_packs['is trait']
+
+    slot_items = []
+    for slot_type, token_slot in zip(slot_types, token_slots):
+        spends = {(major, minor): (new_major, new_minor) for major, minor, new_major, new_minor in optimize.CharacterFinder.token_options(token_slot)}
+        slot_items.append([
+            (item, spends[tuple(optimize.ItemFinder.convert(item.token_cost))]) for item in party_game.items
+            if item.slot_type == slot_type and item.is_available_at(level)
+        ])
+
+    builds = []
+    for build in itertools.product(*slot_items):
+        spent = tuple(map(sum, zip(*(spend for _, spend in build))))
+        if spent not in budgets:
+            continue
+        items = [item for item, _ in build]
+        cards = [card for item in items for card in item]
+        score = sum(weights[:, card.id] for card in cards)
+        builds.append((items, score, sum(card.name in traits for card in cards)))
+    return builds
+
+
+def _average(items, score, num_traits):
+    return score / (sum(len(item.cards) for item in items) - num_traits)
+
+
+def test_level_filters_slots_and_items(party, party_game):
+    archetype = party_game.archetypes[0]
+    for level in range(1, gamedata.MAX_LEVEL + 1):
+        slot_types = archetype.slot_types_at_level(level)
+        assert slot_types == PARTY_SLOT_TYPES[:2 if level < PARTY_BOOTS_LEVEL else 3]
+        for slot_type in slot_types:
+            items = party._level_slot_items[slot_type, party._slot_brackets[slot_type, level]]
+            assert {item.id for item in items} == {
+                item.id for item in party_game.items
+                if item.slot_type == slot_type and item.level <= level and (item.intro_level or 0) <= level
+            }
+
+
+@pytest.mark.parametrize('level', [1, PARTY_BOOTS_LEVEL, 8, gamedata.MAX_LEVEL])
+def test_optimize_matches_brute_force(party, party_game, level):
+    archetype = party_game.archetypes[0]
+    weights = party.card_pack_vectors['healing']
+
+    builds = _brute_force_builds(party, party_game, weights[None, :], level)
+    best = max(_average(items, score[0], num_traits) for items, score, num_traits in builds)
+
+    optimal = _optimize(party, archetype, weights, level)
+    assert optimal
+    for score, num_traits, items in optimal:
+        assert all(item.is_available_at(level) for item in items)
+        assert [item.slot_type for item in items] == list(archetype.slot_types_at_level(level))
+        assert _average(items, score, num_traits) == pytest.approx(best)
+
+
+def test_deck_size_follows_item_cards(party, party_game):
+    slot_sizes = {slot_type: len(next(i for i in party_game.items if i.slot_type == slot_type).cards) for slot_type in PARTY_SLOT_TYPES}
+    assert optimize.CharacterFinder.deck_size(PARTY_SLOT_TYPES, party._slot_sizes) == sum(slot_sizes.values())
+
+
+def test_token_budgets():
+    assert optimize.CharacterFinder.token_budgets([2, 1, 1, 1, 1, 1, 1]) == [optimize.CharacterFinder.TOKEN_BUDGET]
+    budgets = optimize.CharacterFinder.token_budgets([2, 1])
+    assert (0, 0) in budgets and (2, 1) in budgets and (3, 1) not in budgets
+    assert all(major <= 4 and minor <= 4 for major, minor in budgets)
+
+
+def test_matrix_scores_match_item_loop(party, party_game):
+    matrix = optimize.ItemCardMatrix(party_game.items, party_game.cards)
+    card_weights = {'Chop': 1.5, 'Heal': -2, 'Tough Hide': 0.25, 'Not A Card': 7}
+    expected = [sum(card_weights.get(card.name, 0) for card in item) for item in party_game.items]
+
+    weights = matrix.vector(card_weights)
+    assert matrix.score(weights).tolist() == pytest.approx(expected)
+
+    # Each row of a batch scores like a vector on its own
+    batch = [weights, party.card_pack_vectors['healing'], party.card_pack_vectors['is attack']]
+    scores = matrix.score_batch(batch)
+    assert scores.shape == (len(batch), len(party_game.items))
+    for row, w in zip(scores, batch):
+        assert row.tolist() == pytest.approx(matrix.score(w).tolist())
+
+
+def _card_set(item):
+    return tuple(sorted(card.id for card in item))
+
+
+def test_distinct_keeps_one_item_per_card_set(party, party_game):
+    weapons = [item for item in party_game.items if item.slot_type == 'Weapon']
+    distinct = optimize.ItemFinder.distinct(weapons)
+    assert len(distinct) < len(weapons)
+
+    # The first item of each set of cards is kept, in order
+    assert distinct == [item for i, item in enumerate(weapons) if _card_set(item) not in map(_card_set, weapons[:i])]
+
+    # The search only sees distinct items
+    for buckets in party._slot_buckets.values():
+        for rows in buckets.values():
+            card_sets = [_card_set(party_game.items[row]) for row in rows]
+            assert len(set(card_sets)) == len(card_sets)
+
+
+def test_anytime_gap_converges(party, party_game):
+    archetype = party_game.archetypes[0]
+    weights = party.card_pack_vectors['healing']
+    builds = _brute_force_builds(party, party_game, weights[None, :], gamedata.MAX_LEVEL)
+    best = max(_average(items, score[0], num_traits) for items, score, num_traits in builds)
+
+    # However early the search stops, its builds only ever improve, and the gap bounds how far they are from the best
+    gaps = []
+    for budget in (0, 1e-4, None):
+        averages = []
+        async def on_improve(optimal):
+            averages.append(_average(optimal[0][2], optimal[0][0], optimal[0][1]))
+
+        optimal, gap = asyncio.run(party.optimize_anytime(archetype, weights, None, on_improve, budget))
+        average = _average(optimal[0][2], optimal[0][0], optimal[0][1]) if optimal else -math.inf
+        assert averages == sorted(averages)
+        assert average <= best + 1e-9 <= average + gap + 2e-9
+        gaps.append(gap)
+
+    assert gaps[0] > 0 and gaps[-1] == 0
+    assert average == pytest.approx(best)
+    assert optimal == _optimize(party, archetype, weights)
+
+
+def test_pareto_matches_brute_force(party, party_game):
+    archetype = party_game.archetypes[0]
+    pack_names = ['healing', 'is attack']
+    weights = np.array([party.card_pack_vectors[name] for name in pack_names])
+
+    averages = np.array([
+        _average(items, score, num_traits)
+        for items, score, num_traits in _brute_force_builds(party, party_game, weights, gamedata.MAX_LEVEL)
+    ])
+    expected = {tuple(averages[i].round(9)) for i in optimize.pareto(averages)}
+
+    frontier = asyncio.run(party.pareto(archetype, pack_names))
+    found = [tuple(np.round(build_averages, 9)) for build_averages, _, _ in frontier]
+    assert set(found) == expected and len(found) == len(expected)
+
+    # No build beats a build on the frontier in every card pack
+    for build_averages, num_traits, items in frontier:
+        assert np.allclose(_average(items, weights[:, [card.id for item in items for card in item]].sum(axis=1), num_traits), build_averages)
+        assert not ((averages >= build_averages - 1e-9).all(axis=1) & (averages > build_averages + 1e-9).any(axis=1)).any()
+
+
+def test_pareto_time_budget(party, party_game):
+    with pytest.raises(TimeoutError):
+        asyncio.run(party.pareto(party_game.archetypes[0], ['healing', 'is attack', 'mixed'], budget=0))
+    assert len(party._frontier_cache) == 0
@@ -0,0 +1,36 @@
+# The exact draw odds against the Monte Carlo simulation they follow the rules of
+
+import math
+
+import numpy as np
+import pytest
+
+from party import probability
+from party import simulate
+
+
+TRIALS = 20_000
+
+# Standard errors a simulated probability may be from the exact one
+TOLERANCE = 5
+
+
+@pytest.mark.parametrize('deck_size, copies', [(36, 3), (18, 1), (12, 4), (7, 2), (6, 0), (6, 6)])
+def test_odds_match_simulation(deck_size, copies):
+    cards = ['card'] * copies + ['other'] * (deck_size - copies)
+    held = simulate.simulate(cards, 'card', rounds=8, trials=TRIALS, rng=np.random.default_rng(0))
+    seen = np.logical_or.accumulate(held, axis=1)
+
+    odds = probability.odds(deck_size, copies, rounds=8)
+    for (holding, ever_held), p_holding, p_seen in zip(odds, held.mean(axis=0), seen.mean(axis=0)):
+        for exact, simulated in ((holding, p_holding), (ever_held, p_seen)):
+            error = math.sqrt(max(exact * (1 - exact), 1 / TRIALS) / TRIALS)
+            assert abs(exact - simulated) <= TOLERANCE * error
+
+
+def test_small_decks_are_rejected():
+    size = simulate.FIRST_DRAW_COUNT + simulate.RETAIN_COUNT
+    with pytest.raises(ValueError):
+        probability.odds(size, 1)
+    with pytest.raises(ValueError):
+        simulate.simulate(['card'] * size, 'card')
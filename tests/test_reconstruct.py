@@ -0,0 +1,106 @@
+import io
+import os
+import re
+
+import pytest
+
+from battle_parse import index
+from battle_parse import reconstruct
+
+from conftest import EXAMPLE_LOGS_DIRPATH, FakeGame
+
+
+# Logs in the example directory that hold battles
+VERBOSE_LOGS = tuple(
+    name for name in sorted(os.listdir(EXAMPLE_LOGS_DIRPATH))
+    if index.scan(os.path.join(EXAMPLE_LOGS_DIRPATH, name))
+)
+
+
+# The if/elif chain message_events used before MessageClassifier, as (kind, pattern) pairs tried in order, with the
+# trait and terrain attachments it told apart by pattern
+def _reference_patterns(player_names, group_names, actor_names):
+    player_name = '({})'.format('|'.join(re.escape(name) for name in player_names))
+    group_name = '({})'.format('|'.join(re.escape(name) for name in group_names))
+    actor_name = '({})'.format('|'.join(re.escape(name) for name in actor_names))
+    return [(kind, re.compile(pattern)) for kind, pattern in (
+        ('start_round', r'Starting round (\d+)'),
+        ('end_round', r'Turn Complete'),
+        ('scoring_phase', r'Scoring Phase: initiated'),
+        ('discard_phase', r'Discard Phase: initiated'),
+        ('defeat', r'{} was defeated'.format(player_name)),
+        ('draw', r'{} drew (.+) for {}'.format(player_name, group_name)),
+        ('reshuffle', r"Re-shuffling (\d+) cards from {}'s discard into deck\.".format(group_name)),
+        ('failed_draw', r"Can not draw for {}\. Deck is empty even after discard reshuffle\.".format(group_name)),
+        ('must_trait', r'{} must play a Trait'.format(player_name)),
+        ('must_target', r'Participant {} must select targets'.format(player_name)),
+        ('attach_trait', r'Attaching (.+) to {}'.format(actor_name)),
+        ('detach_trait', r'Detaching and discarding (.+) from {}'.format(actor_name)),
+        ('attach_terrain', r'Attaching (.+) to \((\d+), (\d+)\)'),
+        ('active_player', r'The active player is now {}'.format(player_name)),
+        ('passed', r'{} passed\.'.format(player_name)),
+        ('ended_round', r'{} ended the round.'.format(player_name)),
+        ('cancelling', r'Action: (.+) is invalid - cancelling'),
+        ('cancelled', r'(.+) was cancelled\.'),
+        ('damage', r'{} took (\d+) damage'.format(actor_name)),
+        ('heal', r'{} healed (\d+)'.format(actor_name)),
+        ('die', r'{} died'.format(actor_name)),
+        ('block', r'{}, health = (\d+) \(pi:(\d+), gi:(\d+), ai:(\d+)\)  blocks (.+)'.format(actor_name)),
+        ('autoselect', r'SeeverSelectCardsCommand:: selected card (.+)'),
+    )]
+
+
+# Game data holding just the items a battle shows cards coming from, so any example battle loads
+def _battle_game(joinbattle, extensions):
+    item_cards = {}
+    for obj in joinbattle['objects']:
+        if obj.get('_class_', '').endswith('CardInstance') and 'owner' in obj:
+            item_cards.setdefault(obj['origin'], set()).add(obj['type'])
+
+    for ex in extensions:
+        for peeks_name in ('DP', 'HP'):
+            for peek in ex.get(peeks_name, {}).get('peeks', ()):
+                if peek.get('cownerp', -1) != -1:
+                    item_cards.setdefault(peek['origin'], set()).add(peek['type'])
+
+    return FakeGame(item_cards)
+
+
+def _reference_classify(patterns, msg):
+    for kind, pattern in patterns:
+        match = pattern.fullmatch(msg)
+        if match is None:
+            continue
+
+        # The classifier shares one pattern between trait and terrain attachments
+        if kind == 'attach_trait':
+            return 'attach', match.groups() + (None, None)
+        if kind == 'attach_terrain':
+            card_name, x, y = match.groups()
+            return 'attach', (card_name, None, x, y)
+        return kind, match.groups()
+
+    return None
+
+
+@pytest.mark.parametrize('log_name', VERBOSE_LOGS)
+def test_classifier_matches_reference(log_name):
+    filename = os.path.join(EXAMPLE_LOGS_DIRPATH, log_name)
+    for indexed_battle in index.scan(filename):
+        data = index.read(filename, indexed_battle)
+        joinbattle, extensions, messages = reconstruct.parse_battle_stream(io.BytesIO(data))
+        battle = reconstruct.load_battle_objects(_battle_game(joinbattle, extensions), joinbattle['objects'])
+
+        players = battle.players
+        groups = [g for p in players for g in p.groups]
+        actors = [a for g in groups for a in g.actors]
+        names = tuple(p.name for p in players), tuple(g.name for g in groups), tuple(a.name for a in actors)
+        classifier = reconstruct.MessageClassifier(*names)
+        patterns = _reference_patterns(*names)
+
+        for m in messages:
+            msg = m.get('Msg')
+            if m.get('Event') is not None or msg is None:
+                continue
+
+            assert classifier.classify(msg) == _reference_classify(patterns, msg), msg
@@ -0,0 +1,63 @@
+import random
+
+import pytest
+
+from battle_parse import reconstruct
+from battle_parse import replay
+
+from conftest import EXAMPLE_LOGS
+
+
+def _cards(cards):
+    return [(card.type, card.origin, card.created) for card in cards]
+
+
+# State of a battle by value (cards created while replaying are new objects each time)
+def _state(battle):
+    return [
+        (
+            _cards(group.hand), _cards(group.draw_deck), _cards(group.discard_deck),
+            [(slot.item.type, slot.item.marked and tuple(slot.item.marked)) for slot in group.item_frame.slots],
+            [(actor.hp, actor.x, actor.y) for actor in group.actors],
+        )
+        for player in battle.players for group in player.groups
+    ]
+
+
+def _extract(game, log_path):
+    with open(log_path, 'rb') as f:
+        return reconstruct.extract_battle_events(game, f)
+
+
+@pytest.mark.parametrize('log_name', EXAMPLE_LOGS)
+def test_replay_steps_through_log(game, logs, log_name):
+    events, battle = _extract(game, logs[log_name])
+    rp = replay.Replay(battle, events)
+    while rp.position < len(rp):
+        rp.step()
+
+    assert len(rp.checkpoints) == len(events) // replay.CHECKPOINT_INTERVAL + 1
+
+
+@pytest.mark.parametrize('log_name', EXAMPLE_LOGS)
+def test_seek_matches_straight_replay(game, logs, log_name):
+    events, battle = _extract(game, logs[log_name])
+    rp = replay.Replay(battle, events, interval=50)
+
+    rng = random.Random(log_name)
+    positions = [rng.randrange(len(events) + 1) for _ in range(20)] + [0, len(events)]
+    for position in positions:
+        rp.seek(position)
+        actual = _state(battle)
+
+        straight_events, straight_battle = _extract(game, logs[log_name])
+        for event in straight_events[:position]:
+            straight_battle.update(event)
+        assert actual == _state(straight_battle), position
+
+
+def test_seek_out_of_range(game, logs):
+    events, battle = _extract(game, logs['log1'])
+    rp = replay.Replay(battle, events)
+    with pytest.raises(IndexError):
+        rp.seek(len(events) + 1)
@@ -0,0 +1,47 @@
+import os
+
+from battle_parse import index
+from battle_parse import reconstruct
+from battle_parse import store
+
+from conftest import EXAMPLE_LOGS, FakeGame
+
+
+def _fields(events):
+    return [(type(e).__name__, [getattr(e, field) for field in e.fields]) for e in events]
+
+
+def test_store_round_trip(game, logs):
+    for log_name in EXAMPLE_LOGS:
+        for indexed_battle in index.load(logs[log_name]):
+            ex_events, msg_events, battle = reconstruct.extract_indexed_battle_streams(game, logs[log_name], indexed_battle)
+            key = store.key(index.read(logs[log_name], indexed_battle))
+            assert os.path.exists(store.filepath(key))
+
+            stored_ex_events, stored_msg_events, stored_battle = reconstruct.extract_indexed_battle_streams(
+                game, logs[log_name], indexed_battle,
+            )
+            assert _fields(stored_ex_events) == _fields(ex_events)
+            assert _fields(stored_msg_events) == _fields(msg_events)
+            assert stored_battle.scenario_name == battle.scenario_name
+            assert stored_battle.user.index == battle.user.index
+
+
+def test_store_invalidation(game, item_cards, logs, monkeypatch):
+    indexed_battle = index.load(logs['log1'])[0]
+    key = store.key(index.read(logs['log1'], indexed_battle))
+    reconstruct.extract_indexed_battle_streams(game, logs['log1'], indexed_battle)
+    assert store.load(game, key) is not None
+
+    # Battles stored for other game data or by another parser are parsed again
+    assert store.load(FakeGame(item_cards, version='other'), key) is None
+    parser_version = store.PARSER_VERSION
+    monkeypatch.setattr(store, 'PARSER_VERSION', parser_version + 1)
+    assert store.load(game, key) is None
+    monkeypatch.setattr(store, 'PARSER_VERSION', parser_version)
+    assert store.load(game, key) is not None
+
+    # So are corrupt ones
+    with open(store.filepath(key), 'r+b') as f:
+        f.truncate(store.HEADER.size + len(game.version) + 10)
+    assert store.load(game, key) is None
@@ -1,58 +1,68 @@
 # Parse verbose logs
 
+import re
+
+
+def _to_str(value):
+    return '' if value == '[null]' else value
+
+
+def _to_bool(value):
+    return value == 'true'
+
+
+def _to_array(convert_element):
+    def to_array(value):
+        if len(value) == 2:
+            return []
+        return [convert_element(e) for e in value[1:-1].split(',')]
+
+    return to_array
+
+
+# Converters from a value string, by tag (built once rather than on every call)
+CONVERTERS = {
+    'utf_string': _to_str,
+    'bool': _to_bool,
+    'int': int,
+    'long': int,
+    'double': float,
+}
+CONVERTERS.update({tag + '_array': _to_array(f) for tag, f in CONVERTERS.items()})
+
 
 # Convert string to type specified by tag
 def convert(tag, value):
-    if len(value) == 2 and tag.endswith('array'):
-        return []
-
-    to_str = lambda e: '' if e == '[null]' else e
-    to_bool = lambda e: e == 'true'
-    to_int = to_long = int
-    to_float = to_double = float
-
-    convert = {
-        'utf_string': to_str,
-        'bool': to_bool,
-        'int': to_int,
-        'long': to_int,
-        'double': to_float,
-    }
-
-    to_array = lambda f: lambda v: [f(e) for e in v[1:-1].split(',')]
-    items = list(convert.items())
-    for t, f in items:
-        convert[t + '_array'] = to_array(f)
-
     try:
-        return convert[tag](value)
+        converter = CONVERTERS[tag]
     except KeyError:
         raise ValueError("Unrecognized tag '{}'".format(tag))
 
+    return converter(value)
+
 
 # Parse a verbose log line into its indent level, name, and value
 def parse_verbose_line(line):
-    # Count tabs at start of line
-    indent = 0
-    while line[indent] == '\t':
-        indent += 1
+    # Strip and count tabs at start of line in one go
+    body = line.lstrip('\t')
+    indent = len(line) - len(body)
 
-    # Remove leading whitespace from the line (should just strip away tabs)
-    line = line.lstrip()
-
-    if line[0] != '(':
-        return -1, None, None
+    if body[:1] != '(':
+        # Should just be tabs, but strip any other leading whitespace too
+        body = body.lstrip()
+        if body[:1] != '(':
+            return -1, None, None
 
     # Split off the tag value between ( and )
-    end_tag_index = line.index(')')
-    tag, line = line[1:end_tag_index], line[end_tag_index+2:]
+    end_tag_index = body.index(')')
+    tag = body[1:end_tag_index]
 
     # If there is a : character, this line has a name; otherwise it's just a value. Get the name and value
-    delim_index = line.find(':')
-    if delim_index == -1:
-        name, value = '', line
+    name, delim, value = body[end_tag_index+2:].partition(':')
+    if delim:
+        value = value[1:]
     else:
-        name, value = line[:delim_index], line[delim_index+2:]
+        name, value = '', name
 
     # Create the corresponding object from tag, name, and value
     if tag == 'sfs_array':
@@ -63,53 +73,103 @@ def parse_verbose_line(line):
     return indent, name, convert(tag, value)
 
 
-def parse_verbose(raw):
-    # List of parsed extension responses
-    extensions = []
+# Kinds of objects yielded by iter_battle
+EXTENSION = 'extension'
+MESSAGE = 'message'
+
+
+# Incrementally parse verbose log lines into extensions
+class VerboseParser:
+    def __init__(self):
+        # Extension being constructed, and the current object or array within it
+        self.extension = None
+        self.layer_stack = []
+
+    def feed(self, line):
+        """
+        Parse one line, and return the previous extension if this line started a new one.
+        """
 
-    # Keep track of the current object or array being constructed
-    layer_stack = []
-    for line in raw.splitlines():
         # Ignore whitespace and empty lines
         if not line or line.isspace():
-            continue
-
-        # If this is a new extension, append it to the list and set it as the current layer
-        if 'Received extension response:' in line:
-            name = line.split(': ')[1]
-            extensions.append({'_FROM': 'server', '_NAME': name})
-            layer_stack = [extensions[-1]]
-        elif 'Sending zone extension request:' in line:
-            name = line.split(': ')[1]
-            extensions.append({'_FROM': 'client', '_NAME': name})
-            layer_stack = [extensions[-1]]
+            return None
+
+        # If this is a new extension, finish the previous one and set the new one as the current layer
+        # (lines within extensions are indented, so only unindented lines need checking)
+        finished = None
+        if line[0] != '\t':
+            if 'Received extension response:' in line:
+                finished = self.flush()
+                name = line.split(': ')[1]
+                self.extension = {'_FROM': 'server', '_NAME': name}
+                self.layer_stack = [self.extension]
+            elif 'Sending zone extension request:' in line:
+                finished = self.flush()
+                name = line.split(': ')[1]
+                self.extension = {'_FROM': 'client', '_NAME': name}
+                self.layer_stack = [self.extension]
 
         # Parse current line
         indent, name, line_obj = parse_verbose_line(line)
 
-        # If this line is invalid, ignore it
-        if indent == -1:
-            continue
+        # If this line is invalid or outside of any extension, ignore it
+        if indent == -1 or not self.layer_stack:
+            return finished
 
         # Adjust to an older layer if this line de-indented
-        layer_stack = layer_stack[:indent]
+        del self.layer_stack[indent:]
 
         # Add the line's object to the growing structure
-        if isinstance(layer_stack[-1], list):
-            layer_stack[-1].append(line_obj)
+        if isinstance(self.layer_stack[-1], list):
+            self.layer_stack[-1].append(line_obj)
         else:
-            layer_stack[-1][name] = line_obj
+            self.layer_stack[-1][name] = line_obj
 
         if isinstance(line_obj, list) or isinstance(line_obj, dict):
-            layer_stack.append(line_obj)
+            self.layer_stack.append(line_obj)
+
+        return finished
+
+    def flush(self):
+        """
+        Finish and return the current extension, if any.
+        """
+
+        extension = self.extension
+        self.extension = None
+        self.layer_stack = []
+        return extension
+
+
+def parse_verbose(raw):
+    # List of parsed extension responses
+    extensions = []
+
+    parser = VerboseParser()
+    for line in raw.splitlines():
+        extension = parser.feed(line)
+        if extension is not None:
+            extensions.append(extension)
+
+    extension = parser.flush()
+    if extension is not None:
+        extensions.append(extension)
 
     return extensions
 
 
-def parse_battle_log(raw):
-    messages = []
+# First characters of values that int() or float() might accept: digits, signs, decimal points, whitespace, and
+# inf/nan (values starting with any non-ASCII character are tried too)
+_NUMBER_STARTS = frozenset('0123456789+-. \t\n\r\x0b\x0c\x1c\x1d\x1e\x1fiInN')
+
+
+def _convert_message_value(val):
+    # Classify by first character so that most strings skip the failed int() and float() calls
+    first = val[:1]
+    if first in _NUMBER_STARTS or not first.isascii():
+        if val.isascii() and val.isdigit():
+            return int(val)
 
-    def convert(val):
         try:
             return int(val)
         except ValueError:
@@ -119,58 +179,127 @@ def parse_battle_log(raw):
             return float(val)
         except ValueError:
             pass
+    elif first == '[' and val == '[NULL]':
+        return ''
 
-        if val == '[NULL]':
-            return ''
+    if len(val) != 0 and first + val[-1] in ('()', '[]', '{}'):
+        return [_convert_message_value(x) for x in val[1:-1].split(', ')]
+    if '|' in val:
+        return val.split('|')
 
-        if len(val) != 0 and val[0] + val[-1] in ('()', '[]', '{}'):
-            return [convert(x) for x in val[1:-1].split(', ')]
-        if '|' in val:
-            return val.split('|')
+    return val
 
-        return val
 
-    for line in raw.splitlines():
-        # Ignore non-message lines
-        if not line.startswith('BATTLE LOG: '):
+# Matches a name=value pair at the start of a reversed battle log line, up to and including the comma before it. The
+# value runs until an = that doesn't have a space before it, and the name until the comma. The first pair in the line
+# has no comma before it, so it never matches
+_REVERSED_PAIR_REGEX = re.compile(r'([^=]*(?:= [^=]*)*)=(?! )([^,]*),')
+
+
+# Parse a battle log line into a message, or None if it isn't one
+def parse_battle_log_line(line):
+    # Ignore non-message lines
+    if not line.startswith('BATTLE LOG: '):
+        if 'Timer' in line:
             words = line.split()
             if len(words) == 3:
                 event, player_index, remaining = words
                 if event == 'startTimer' or event == 'stopTimer':
                     player_index = int(player_index)
                     remaining = int(remaining)
-                    messages.append({'Event': event, 'PlayerIndex': player_index, 'Remaining': remaining})
-            continue
-
-        line = line[12:]
-
-        values = []
-        names = []
-        parsing_value = True
-        end_index = len(line)
-
-        for i, c in enumerate(line[::-1]):
-            index = len(line) - i - 1
-            if parsing_value:
-                if c == '=':
-                    if line[index-1] != ' ':
-                        values.append(convert(line[index+1:end_index]))
-                        end_index = index
-                        parsing_value = False
-            elif c == ',':
-                names.append(line[index+1:end_index])
-                end_index = index
-                parsing_value = True
-
-        params = dict()
-        for i, name in enumerate(names):
-            params[name] = values[i]
-
-        messages.append(params)
+                    return {'Event': event, 'PlayerIndex': player_index, 'Remaining': remaining}
+        return None
+
+    # Split pairs from the end, since only values can contain commas
+    line = line[:11:-1]
+    params = dict()
+    match = _REVERSED_PAIR_REGEX.match(line)
+    while match is not None:
+        value, name = match.groups()
+        params[name[::-1]] = _convert_message_value(value[::-1])
+        match = _REVERSED_PAIR_REGEX.match(line, match.end())
+
+    return params
+
+
+def parse_battle_log(raw):
+    messages = []
+    for line in raw.splitlines():
+        message = parse_battle_log_line(line)
+        if message is not None:
+            messages.append(message)
 
     return messages
 
 
+# Lines of a text or binary stream, without line endings
+def iter_lines(stream):
+    for line in stream:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        yield line.rstrip('\r\n')
+
+
+# Incrementally parse verbose log lines into extensions and battle log messages
+class BattleParser:
+    def __init__(self):
+        self.verbose_parser = VerboseParser()
+        self.pending_messages = []
+
+    def feed(self, line):
+        """
+        Parse one line, and return the (EXTENSION, extension) and (MESSAGE, message) pairs it completes, in the order
+        they start in the log.
+
+        An extension is only complete once the next one starts, so the messages logged in the meantime are held back
+        until it's returned.
+        """
+
+        parsed = []
+
+        extension = self.verbose_parser.feed(line)
+        if extension is not None:
+            parsed.append((EXTENSION, extension))
+            parsed.extend((MESSAGE, message) for message in self.pending_messages)
+            self.pending_messages.clear()
+
+        message = parse_battle_log_line(line)
+        if message is not None:
+            if self.verbose_parser.extension is None:
+                parsed.append((MESSAGE, message))
+            else:
+                self.pending_messages.append(message)
+
+        return parsed
+
+    def flush(self):
+        """
+        Return the pairs held back for the current extension, which is assumed complete.
+        """
+
+        parsed = []
+
+        extension = self.verbose_parser.flush()
+        if extension is not None:
+            parsed.append((EXTENSION, extension))
+        parsed.extend((MESSAGE, message) for message in self.pending_messages)
+        self.pending_messages.clear()
+
+        return parsed
+
+
+def iter_battle(stream):
+    """
+    Parse an open text or binary stream line by line in a single pass, yielding (EXTENSION, extension) and
+    (MESSAGE, message) pairs in the order they start in the log.
+    """
+
+    parser = BattleParser()
+    for line in iter_lines(stream):
+        yield from parser.feed(line)
+    yield from parser.flush()
+
+
 def parse_battle(raw):
     # TODO: Crop raw to just battle start and end?
     return parse_verbose(raw), parse_battle_log(raw)